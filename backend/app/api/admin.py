@@ -0,0 +1,160 @@
+import hmac
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.api.compression import compress_chunks, negotiate_encoding
+from app.api.schemas import ReprocessJobResponse, ReprocessRequest
+from app.api.serialization import DOCUMENT_FIELDS, EXPORT_FIELDS, dump_ndjson
+from app.core.config import settings
+from app.db.database import SessionLocal, get_db
+from app.db.repositories import DocumentRepository, ReprocessJobRepository
+from app.utils.profiling import ProfilerBusy, profile_to_file, slow_operations
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Allow the request only with the configured admin token
+
+    The admin API is disabled entirely when ADMIN_API_TOKEN is not set.
+    """
+    if not settings.admin_api_token:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.admin_api_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+router = APIRouter(prefix="/api/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+@router.post("/reprocess", response_model=ReprocessJobResponse, status_code=202)
+def create_reprocess_job(reprocess_request: ReprocessRequest, db: Session = Depends(get_db)):
+    """Queue a bulk reprocessing job; the worker runs it in the background"""
+    filters = reprocess_request.model_dump(
+        mode="json",
+        include={"statuses", "created_after", "created_before", "document_ids"},
+        exclude_none=True
+    )
+    return ReprocessJobRepository(db).create_job(
+        filters,
+        re_extract=reprocess_request.re_extract,
+        custom_prompt=reprocess_request.custom_prompt,
+        concurrency=reprocess_request.concurrency
+    )
+
+@router.get("/reprocess", response_model=List[ReprocessJobResponse])
+def list_reprocess_jobs(db: Session = Depends(get_db)):
+    """List recent reprocessing jobs with their progress"""
+    return ReprocessJobRepository(db).get_jobs()
+
+@router.get("/reprocess/{job_id}", response_model=ReprocessJobResponse)
+def get_reprocess_job(job_id: UUID, db: Session = Depends(get_db)):
+    """Get a reprocessing job's progress, throughput and ETA"""
+    job = ReprocessJobRepository(db).get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/reprocess/{job_id}/cancel", response_model=ReprocessJobResponse)
+def cancel_reprocess_job(job_id: UUID, db: Session = Depends(get_db)):
+    """Stop a job after its current batch; it can be resumed later"""
+    job = ReprocessJobRepository(db).cancel_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/reprocess/{job_id}/resume", response_model=ReprocessJobResponse)
+def resume_reprocess_job(job_id: UUID, db: Session = Depends(get_db)):
+    """Queue a cancelled or failed job to continue from its checkpoint"""
+    job = ReprocessJobRepository(db).resume_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "pending":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status} and can't be resumed")
+    return job
+
+def export_chunks(filters, fields, encoding=None):
+    """Yield NDJSON for the matching documents, one chunk per batch
+    
+    Uses its own session, held for the life of the stream, so the
+    server-side cursor stays open between batches.
+    
+    Args:
+        filters: Document filters, see DocumentRepository.filter_documents
+        fields: The columns to export
+        encoding: "zstd" or "gzip" to compress the output
+    """
+    db = SessionLocal()
+    try:
+        batches = DocumentRepository(db).iter_document_rows(filters, fields, settings.export_batch_size)
+        chunks = (dump_ndjson(batch, fields) for batch in batches)
+        if encoding:
+            chunks = compress_chunks(chunks, encoding)
+        yield from chunks
+    finally:
+        db.close()
+
+@router.get("/documents/export")
+def export_documents(
+    request: Request,
+    status: Optional[List[str]] = Query(None, description="Only documents with these statuses"),
+    created_after: Optional[datetime] = Query(None, description="Only documents created at or after this time"),
+    created_before: Optional[datetime] = Query(None, description="Only documents created before this time"),
+    fields: str = Query(",".join(DOCUMENT_FIELDS), description="Comma-separated fields to include")
+):
+    """Stream matching documents as newline-delimited JSON
+    
+    Rows are read in batches from a server-side cursor and sent as they
+    are serialized, so memory use stays flat however many documents match.
+    The output is compressed when the client accepts zstd or gzip.
+    """
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in EXPORT_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Available fields: {', '.join(EXPORT_FIELDS)}"
+        )
+    if not selected:
+        raise HTTPException(status_code=400, detail="No fields selected")
+    
+    filters = {
+        "statuses": status,
+        "created_after": created_after.isoformat() if created_after else None,
+        "created_before": created_before.isoformat() if created_before else None,
+    }
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    # CompressionMiddleware adds Vary and leaves streamed bodies alone
+    headers = {"Content-Disposition": 'attachment; filename="documents.ndjson"'}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    
+    return StreamingResponse(
+        iterate_in_threadpool(export_chunks(filters, selected, encoding)),
+        media_type="application/x-ndjson",
+        headers=headers
+    )
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10, gt=0, le=300, description="How long to sample"),
+    interval_ms: Optional[float] = Query(None, ge=1, le=1000, description="Milliseconds between samples")
+):
+    """Sample this API process and return folded stacks for a flame graph
+
+    The output can be rendered with flamegraph.pl or loaded into
+    speedscope; a copy is kept in the profile directory.
+    """
+    try:
+        folded, path, samples = await run_in_threadpool(
+            profile_to_file, seconds, "api", interval_ms / 1000 if interval_ms else None
+        )
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(folded, headers={"X-Profile-Path": path, "X-Profile-Samples": str(samples)})
+
+@router.get("/slow-operations")
+def slow_operation_history():
+    """Recent slow requests in this API process, newest first"""
+    return list(reversed(slow_operations.recent))
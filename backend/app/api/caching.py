@@ -0,0 +1,83 @@
+import hashlib
+from collections import namedtuple
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+# A serialized response body with the validators derived from it
+CachedPayload = namedtuple("CachedPayload", ["body", "etag", "last_modified"])
+
+CACHE_CONTROL = "private, no-cache"
+
+def build_payload(body, versions):
+    """Build a cacheable payload with ETag and Last-Modified validators
+
+    Args:
+        body: The serialized JSON body
+        versions: (id, updated_at) pairs for every document in the body
+
+    Returns:
+        A CachedPayload
+    """
+    digest = hashlib.sha1()
+    last_modified = None
+    for document_id, updated_at in versions:
+        digest.update(f"{document_id}:{updated_at.isoformat()};".encode())
+        if last_modified is None or updated_at > last_modified:
+            last_modified = updated_at
+    # Weak, because the same tag covers every content-coding of the body
+    return CachedPayload(body, f'W/"{digest.hexdigest()}"', last_modified)
+
+def _http_date(value):
+    """Format a naive UTC datetime as an HTTP date"""
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+def _etag_matches(header, etag):
+    """Check an If-None-Match header using weak comparison"""
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    candidates = (tag.strip() for tag in header.split(","))
+    return any(tag.removeprefix("W/") == opaque for tag in candidates)
+
+def _not_modified_since(header, last_modified):
+    """Check an If-Modified-Since header against Last-Modified"""
+    if last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+def conditional_response(request: Request, payload, media_type="application/json"):
+    """Return the payload, or 304 Not Modified if the client's copy is current
+
+    If-None-Match takes precedence over If-Modified-Since, as in RFC 9110.
+
+    Args:
+        request: The incoming request
+        payload: The CachedPayload to send
+        media_type: Media type of the body
+
+    Returns:
+        A Response
+    """
+    headers = {"ETag": payload.etag, "Cache-Control": CACHE_CONTROL}
+    if payload.last_modified is not None:
+        headers["Last-Modified"] = _http_date(payload.last_modified)
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, payload.etag)
+    else:
+        not_modified = if_modified_since is not None and _not_modified_since(if_modified_since, payload.last_modified)
+
+    if not_modified:
+        # CompressionMiddleware only adds Vary to responses with a body
+        return Response(status_code=304, headers={**headers, "Vary": "Accept-Encoding"})
+    return Response(content=payload.body, media_type=media_type, headers=headers)
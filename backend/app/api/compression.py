@@ -0,0 +1,159 @@
+import gzip
+import zlib
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
+
+# Encodings in server preference order
+SUPPORTED_ENCODINGS = ("zstd", "gzip") if zstandard else ("gzip",)
+
+# Bodies larger than this are compressed off the event loop
+THREADPOOL_THRESHOLD = 64 * 1024
+
+def negotiate_encoding(accept_encoding):
+    """Pick the best supported encoding from an Accept-Encoding header
+
+    Args:
+        accept_encoding: The header value
+
+    Returns:
+        "zstd", "gzip" or None if the client accepts neither
+    """
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+def compress(body, encoding, gzip_level=6, zstd_level=3):
+    """Compress a body with the given encoding
+
+    Args:
+        body: The bytes to compress
+        encoding: "zstd" or "gzip"
+        gzip_level: gzip compression level
+        zstd_level: zstd compression level
+
+    Returns:
+        The compressed bytes
+    """
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=zstd_level).compress(body)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+def compress_chunks(chunks, encoding, gzip_level=6, zstd_level=3):
+    """Compress a stream of byte chunks as a single zstd or gzip body
+
+    Args:
+        chunks: Iterable of bytes
+        encoding: "zstd" or "gzip"
+        gzip_level: gzip compression level
+        zstd_level: zstd compression level
+
+    Yields:
+        Compressed bytes
+    """
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=zstd_level).compressobj()
+    else:
+        # wbits=31 writes a gzip header and trailer
+        compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+class CompressionMiddleware:
+    """Compress complete text and JSON responses with zstd or gzip
+
+    Streamed responses (server-sent events, exports) pass through
+    unchanged, since buffering them would defeat streaming.
+    """
+
+    def __init__(self, app, minimum_size=1024, gzip_level=6, zstd_level=3):
+        """Initialize the middleware
+
+        Args:
+            app: The ASGI app to wrap
+            minimum_size: Bodies smaller than this are sent uncompressed
+            gzip_level: gzip compression level
+            zstd_level: zstd compression level
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                # Hold the headers until we know whether the body will be compressed
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            content_type = headers.get("content-type", "")
+            compressible = "json" in content_type or (
+                content_type.startswith("text/") and not content_type.startswith("text/event-stream")
+            )
+            if compressible:
+                headers.add_vary_header("Accept-Encoding")
+
+            body = message.get("body", b"")
+            if (
+                not compressible
+                or encoding is None
+                or message.get("more_body", False)
+                or "content-encoding" in headers
+                or len(body) < self.minimum_size
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) > THREADPOOL_THRESHOLD:
+                body = await run_in_threadpool(compress, body, encoding, self.gzip_level, self.zstd_level)
+            else:
+                body = compress(body, encoding, self.gzip_level, self.zstd_level)
+
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,50 @@
+from starlette.datastructures import Headers
+
+from app.core.config import settings
+from app.utils.profiling import reset_current_operation, set_current_operation, slow_operations
+
+# Requests that are slow by design
+EXCLUDED_PATHS = ("/api/admin/profile",)
+
+class SlowRequestMiddleware:
+    """Capture timing and stacks for requests slower than SLOW_REQUEST_THRESHOLD_MS
+
+    A request is timed until its first body chunk, so long-lived streams
+    (exports) count their time to first byte rather than their whole
+    lifetime. Server-sent event streams are timed only until their headers:
+    an idle stream can go a long time before its first event.
+    """
+
+    def __init__(self, app, threshold_ms=None):
+        """Initialize the middleware
+
+        Args:
+            app: The ASGI app to wrap
+            threshold_ms: Requests slower than this are captured; 0 disables
+        """
+        self.app = app
+        threshold_ms = settings.slow_request_threshold_ms if threshold_ms is None else threshold_ms
+        self.threshold = threshold_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.threshold or scope["path"] in EXCLUDED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        operation = slow_operations.start("request", f"{scope['method']} {scope['path']}", self.threshold)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.body" or (
+                message["type"] == "http.response.start"
+                and Headers(raw=message["headers"]).get("content-type", "").startswith("text/event-stream")
+            ):
+                slow_operations.finish(operation)
+            await send(message)
+
+        token = set_current_operation(operation)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            reset_current_operation(token)
+            # No-op if the body was already sent
+            slow_operations.finish(operation)
@@ -0,0 +1,79 @@
+from pydantic import BaseModel, ConfigDict, Field, computed_field
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from app.core.config import settings
+
+# Document model for API responses
+class DocumentResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: UUID
+    original_filename: str
+    status: str
+    stage: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    summary: Optional[str] = None
+
+class SummaryRequest(BaseModel):
+    custom_prompt: str
+
+class SemanticSearchResult(BaseModel):
+    document: DocumentResponse
+    score: float
+    snippet: Optional[str] = None
+
+
+class ReprocessRequest(BaseModel):
+    statuses: List[str] = ["completed"]
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    document_ids: Optional[List[UUID]] = None
+    re_extract: bool = False
+    custom_prompt: Optional[str] = None
+    concurrency: int = Field(default=settings.reprocess_concurrency, ge=1, le=32)
+
+class ReprocessJobResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: UUID
+    status: str
+    filters: dict
+    re_extract: bool
+    custom_prompt: Optional[str] = None
+    concurrency: int
+    total: int
+    succeeded: int
+    failed: int
+    checkpoint_id: Optional[UUID] = None
+    worker_id: Optional[str] = None
+    heartbeat_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    run_started_at: Optional[datetime] = None
+    run_start_done: int
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+    
+    @computed_field
+    def done(self) -> int:
+        """Documents finished so far, successfully or not"""
+        return self.succeeded + self.failed
+    
+    @computed_field
+    def docs_per_second(self) -> Optional[float]:
+        """Throughput of the current run, measured up to its last batch"""
+        if not self.run_started_at:
+            return None
+        elapsed = (self.updated_at - self.run_started_at).total_seconds()
+        done = self.done - self.run_start_done
+        return round(done / elapsed, 3) if elapsed > 0 and done > 0 else None
+    
+    @computed_field
+    def eta_seconds(self) -> Optional[int]:
+        """Estimated seconds until a running job finishes"""
+        if self.status != "running" or not self.docs_per_second:
+            return None
+        return round(max(self.total - self.done, 0) / self.docs_per_second)
\ No newline at end of file
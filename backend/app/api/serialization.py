@@ -0,0 +1,59 @@
+import orjson
+
+from app.api.schemas import DocumentResponse
+
+# Attributes copied from Document rows, in DocumentResponse field order
+DOCUMENT_FIELDS = tuple(DocumentResponse.model_fields)
+
+# Columns that can be exported, beyond the DocumentResponse fields
+EXPORT_FIELDS = DOCUMENT_FIELDS + (
+    "filename", "content_type", "extracted_text", "attempts", "last_error"
+)
+
+def document_to_dict(document):
+    """Project a Document row onto the DocumentResponse fields
+
+    Skips Pydantic validation: the values come straight from the database
+    and orjson serializes UUIDs and datetimes the same way Pydantic does.
+
+    Args:
+        document: A Document (or any object with the same attributes)
+
+    Returns:
+        A dictionary ready for orjson
+    """
+    return {field: getattr(document, field) for field in DOCUMENT_FIELDS}
+
+def dump_document(document):
+    """Serialize a document as DocumentResponse JSON
+
+    Args:
+        document: The document to serialize
+
+    Returns:
+        The JSON body as bytes
+    """
+    return orjson.dumps(document_to_dict(document))
+
+def dump_documents(documents):
+    """Serialize a list of documents as DocumentResponse JSON
+
+    Args:
+        documents: The documents to serialize
+
+    Returns:
+        The JSON body as bytes
+    """
+    return orjson.dumps([document_to_dict(document) for document in documents])
+
+def dump_ndjson(rows, fields):
+    """Serialize rows as newline-delimited JSON
+
+    Args:
+        rows: Tuples of column values
+        fields: The field name for each column
+
+    Returns:
+        One JSON object per line, as bytes
+    """
+    return b"".join(orjson.dumps(dict(zip(fields, row)), option=orjson.OPT_APPEND_NEWLINE) for row in rows)
@@ -45,6 +45,15 @@ class Settings(BaseModel):
     azure_document_intelligence_key: str = Field(
         default=os.getenv("AZURE_DOCUMENT_INTELLIGENCE_KEY", "")
     )
+    document_intelligence_pages_per_range: int = Field(
+        default=int(os.getenv("DOCUMENT_INTELLIGENCE_PAGES_PER_RANGE", "25"))
+    )
+    document_intelligence_max_concurrency: int = Field(
+        default=int(os.getenv("DOCUMENT_INTELLIGENCE_MAX_CONCURRENCY", "4"))
+    )
+    document_intelligence_range_attempts: int = Field(
+        default=int(os.getenv("DOCUMENT_INTELLIGENCE_RANGE_ATTEMPTS", "3"))
+    )
     
     # OpenAI
     azure_openai_api_key: str = Field(
@@ -82,10 +91,106 @@ class Settings(BaseModel):
             return match.group(1)
         return "2023-05-15"  # Default API version
     
+    # Semantic search
+    azure_openai_embedding_deployment: str = Field(
+        default=os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-small")
+    )
+    embedding_batch_size: int = Field(
+        default=int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    )
+    embedding_chunk_size: int = Field(
+        default=int(os.getenv("EMBEDDING_CHUNK_SIZE", "1500"))
+    )
+    embedding_chunk_overlap: int = Field(
+        default=int(os.getenv("EMBEDDING_CHUNK_OVERLAP", "200"))
+    )
+    embedding_index_path: str = Field(
+        default=os.getenv("EMBEDDING_INDEX_PATH", "data/embedding_index")
+    )
+    
     # App settings
     poll_interval_seconds: int = Field(
         default=int(os.getenv("POLL_INTERVAL_SECONDS", "15"))
     )
+    
+    # Blob partitioning across worker replicas
+    blob_partition_prefixes: str = Field(
+        default=os.getenv("BLOB_PARTITION_PREFIXES", "0123456789abcdef")  # Comma-separated, or one character per partition
+    )
+    worker_heartbeat_ttl_seconds: int = Field(
+        default=int(os.getenv("WORKER_HEARTBEAT_TTL_SECONDS", "60"))
+    )
+    blob_catchall_every_polls: int = Field(
+        default=int(os.getenv("BLOB_CATCHALL_EVERY_POLLS", "20"))
+    )
+    
+    # Retry settings
+    max_processing_attempts: int = Field(
+        default=int(os.getenv("MAX_PROCESSING_ATTEMPTS", "5"))
+    )
+    retry_base_delay_seconds: int = Field(
+        default=int(os.getenv("RETRY_BASE_DELAY_SECONDS", "30"))
+    )
+    retry_max_delay_seconds: int = Field(
+        default=int(os.getenv("RETRY_MAX_DELAY_SECONDS", "3600"))
+    )
+    processing_timeout_seconds: int = Field(
+        default=int(os.getenv("PROCESSING_TIMEOUT_SECONDS", "1800"))
+    )
+    
+    # Bulk reprocessing
+    reprocess_concurrency: int = Field(
+        default=int(os.getenv("REPROCESS_CONCURRENCY", "4"))
+    )
+    reprocess_batch_size: int = Field(
+        default=int(os.getenv("REPROCESS_BATCH_SIZE", "100"))
+    )
+    
+    # Document export
+    export_batch_size: int = Field(
+        default=int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+    )
+    
+    # Admin API (disabled unless a token is set)
+    admin_api_token: str = Field(
+        default=os.getenv("ADMIN_API_TOKEN", "")
+    )
+    
+    # Profiling (thresholds of 0 disable slow-path capture)
+    profile_output_dir: str = Field(
+        default=os.getenv("PROFILE_OUTPUT_DIR", "data/profiles")
+    )
+    profile_max_files: int = Field(
+        default=int(os.getenv("PROFILE_MAX_FILES", "200"))
+    )
+    profile_signal_seconds: int = Field(
+        default=int(os.getenv("PROFILE_SIGNAL_SECONDS", "30"))
+    )
+    profile_sample_interval_ms: int = Field(
+        default=int(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "10"))
+    )
+    slow_request_threshold_ms: int = Field(
+        default=int(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "2000"))
+    )
+    slow_document_threshold_seconds: int = Field(
+        default=int(os.getenv("SLOW_DOCUMENT_THRESHOLD_SECONDS", "300"))
+    )
+    event_loop_lag_threshold_ms: int = Field(
+        default=int(os.getenv("EVENT_LOOP_LAG_THRESHOLD_MS", "500"))
+    )
+    
+    # Cache settings
+    document_cache_ttl_seconds: int = Field(
+        default=int(os.getenv("DOCUMENT_CACHE_TTL_SECONDS", "5"))
+    )
+    
+    # Event settings
+    event_broker: str = Field(
+        default=os.getenv("EVENT_BROKER", "")  # "postgres" or "local"; inferred from DATABASE_URL when empty
+    )
+    sse_heartbeat_seconds: int = Field(
+        default=int(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+    )
 
 # Create global settings object
 settings = Settings() 
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""Remove duplicate document rows left from before blob names were unique
+
+Before documents.filename was unique, the API and the blob poller could
+each create a row for the same upload. For every blob name with more
+than one row, the row that got furthest (then the oldest) is kept. The
+others are written to a JSON lines archive, logged, removed from the
+embedding index and deleted, so init_db can create the unique index.
+
+Run it once, checking what it would remove first:
+
+    python -m app.db.dedupe_documents --dry-run
+    python -m app.db.dedupe_documents --archive duplicate_documents.jsonl
+"""
+import argparse
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy import func, inspect
+from sqlalchemy.orm import Session
+
+from app.db.database import engine
+from app.models.document import Document
+from app.utils.vector_index import get_embedding_index
+
+logger = logging.getLogger(__name__)
+
+# Which duplicate row survives: furthest along first, then oldest
+STATUS_RANK = {"completed": 0, "processing": 1, "pending": 2, "error": 3}
+
+def count_duplicated_filenames(bind=engine):
+    """Count the blob names that have more than one document row
+
+    Args:
+        bind: The engine to check
+
+    Returns:
+        The number of duplicated blob names
+    """
+    if not inspect(bind).has_table(Document.__tablename__):
+        return 0
+
+    with Session(bind) as db:
+        return len(_duplicated_filenames(db))
+
+def _duplicated_filenames(db):
+    rows = (
+        db.query(Document.filename)
+        .group_by(Document.filename)
+        .having(func.count(Document.id) > 1)
+        .all()
+    )
+    return [filename for (filename,) in rows]
+
+def _archive_row(document):
+    return {column.name: getattr(document, column.key) for column in Document.__table__.columns}
+
+def remove_duplicate_documents(archive_path, bind=engine, index=None, dry_run=False):
+    """Archive and delete all but one document row per blob name
+
+    Args:
+        archive_path: JSON lines file the removed rows are appended to
+        bind: The engine to clean up
+        index: EmbeddingIndex to remove the deleted documents from, if any
+        dry_run: Only log what would be removed
+
+    Returns:
+        The number of removed (or, for a dry run, removable) rows
+    """
+    if not inspect(bind).has_table(Document.__tablename__):
+        return 0
+
+    removed = []
+    with Session(bind) as db:
+        for filename in _duplicated_filenames(db):
+            rows = db.query(Document).filter(Document.filename == filename).all()
+            rows.sort(key=lambda row: (STATUS_RANK.get(row.status, 4), row.created_at))
+            kept = rows[0]
+            for duplicate in rows[1:]:
+                logger.info(
+                    f"{'Would remove' if dry_run else 'Removing'} document {duplicate.id} "
+                    f"({filename}, {duplicate.status}); keeping {kept.id} ({kept.status})"
+                )
+                removed.append(duplicate)
+
+        if dry_run or not removed:
+            return len(removed)
+
+        # Archive before deleting, so nothing is lost if the delete fails
+        with open(archive_path, "a") as f:
+            for duplicate in removed:
+                f.write(json.dumps(_archive_row(duplicate), default=str) + "\n")
+
+        removed_ids = [duplicate.id for duplicate in removed]
+        for duplicate in removed:
+            db.delete(duplicate)
+        db.commit()
+
+    if index is not None:
+        for document_id in removed_ids:
+            index.delete_document(document_id)
+    return len(removed_ids)
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    parser = argparse.ArgumentParser(description="Archive and delete duplicate document rows")
+    parser.add_argument("--dry-run", action="store_true", help="Only log the rows that would be removed")
+    parser.add_argument(
+        "--archive",
+        default=f"duplicate_documents_{datetime.utcnow():%Y%m%d%H%M%S}.jsonl",
+        help="JSON lines file the removed rows are appended to",
+    )
+    args = parser.parse_args()
+
+    removed = remove_duplicate_documents(args.archive, index=get_embedding_index(), dry_run=args.dry_run)
+    if args.dry_run:
+        logger.info(f"Dry run: {removed} duplicate document rows would be removed")
+    elif removed:
+        logger.info(f"Removed {removed} duplicate document rows, archived to {args.archive}")
+    else:
+        logger.info("No duplicate document rows found")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+from sqlalchemy import DateTime
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+class seconds_from_now(FunctionElement):
+    """The database's current time plus a number of seconds
+
+    Use a negative number for a time in the past. Evaluated by the
+    database, like func.now(), so every replica shares one clock.
+    """
+    type = DateTime()
+    name = "seconds_from_now"
+    inherit_cache = True
+
+@compiles(seconds_from_now)
+def compile_seconds_from_now(element, compiler, **kw):
+    return f"now() + ({compiler.process(element.clauses, **kw)} * interval '1 second')"
+
+@compiles(seconds_from_now, "sqlite")
+def compile_seconds_from_now_sqlite(element, compiler, **kw):
+    # SQLite has no interval type; datetime() takes the offset as a modifier
+    return f"datetime('now', ({compiler.process(element.clauses, **kw)}) || ' seconds')"
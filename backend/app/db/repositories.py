@@ -1,6 +1,14 @@
+from sqlalchemy import func, or_, and_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from datetime import datetime
+from itertools import islice
 import uuid
+from app.db.expressions import seconds_from_now
 from app.models.document import Document
+from app.models.reprocess_job import ReprocessJob
+from app.utils.cache import invalidate_document
+from app.utils.events import publish_status
 
 class DocumentRepository:
     """Repository for document database operations"""
@@ -8,7 +16,7 @@ class DocumentRepository:
     def __init__(self, db: Session):
         self.db = db
     
-    def create_document(self, filename, original_filename, blob_url, content_type):
+    def create_document(self, filename, original_filename, blob_url, content_type, etag=None):
         """Create a new document
         
         Args:
@@ -16,6 +24,7 @@ class DocumentRepository:
             original_filename: The original name of the file
             blob_url: The URL of the blob
             content_type: The content type of the file
+            etag: Optional ETag of the blob
             
         Returns:
             The created document
@@ -25,13 +34,58 @@ class DocumentRepository:
             original_filename=original_filename,
             blob_url=blob_url,
             content_type=content_type,
+            etag=etag,
             status="pending"
         )
         self.db.add(document)
+        self.db.flush()
+        publish_status(self.db, document.id, document.status)
         self.db.commit()
         self.db.refresh(document)
+        invalidate_document(document.id)
         return document
     
+    def get_or_create_document(self, filename, original_filename, blob_url, content_type, etag=None):
+        """Register a blob as a document, exactly once per blob name
+        
+        This is the single ingestion path: the API upload and the blob
+        poller both call it, and the unique index on filename makes the
+        second caller get the first caller's row.
+        
+        Args:
+            filename: The name of the file in blob storage
+            original_filename: The original name of the file
+            blob_url: The URL of the blob
+            content_type: The content type of the file
+            etag: Optional ETag of the blob
+            
+        Returns:
+            A (document, created) tuple
+        """
+        document = self.get_document_by_filename(filename)
+        if document is None:
+            try:
+                return self.create_document(filename, original_filename, blob_url, content_type, etag), True
+            except IntegrityError:
+                # Another process registered the blob between our check and insert
+                self.db.rollback()
+                document = self.get_document_by_filename(filename)
+        
+        if etag and not document.etag:
+            # Rows registered without an ETag learn it the first time the poller sees the blob
+            document.etag = etag
+            self.db.commit()
+            self.db.refresh(document)
+        return document, False
+    
+    def get_document_etags(self):
+        """Get the ETags of all registered blobs
+        
+        Returns:
+            A set of ETag strings
+        """
+        return {row.etag for row in self.db.query(Document.etag).filter(Document.etag.isnot(None))}
+    
     def get_document_by_id(self, document_id):
         """Get a document by ID
         
@@ -54,6 +108,82 @@ class DocumentRepository:
         """
         return self.db.query(Document).filter(Document.filename == filename).first()
     
+    def get_documents_by_ids(self, document_ids):
+        """Get documents by ID
+        
+        Args:
+            document_ids: The IDs of the documents
+            
+        Returns:
+            A list of the documents that exist, in no particular order
+        """
+        if not document_ids:
+            return []
+        return self.db.query(Document).filter(Document.id.in_(document_ids)).all()
+    
+    def filter_documents(self, filters):
+        """Build a query for the documents matching reprocess filters
+        
+        Args:
+            filters: Dict with optional "statuses" (list), "created_after"
+                and "created_before" (ISO timestamps) and "document_ids"
+            
+        Returns:
+            A query over the matching documents
+        """
+        query = self.db.query(Document)
+        if filters.get("statuses"):
+            query = query.filter(Document.status.in_(filters["statuses"]))
+        if filters.get("created_after"):
+            query = query.filter(Document.created_at >= datetime.fromisoformat(filters["created_after"]))
+        if filters.get("created_before"):
+            query = query.filter(Document.created_at < datetime.fromisoformat(filters["created_before"]))
+        if filters.get("document_ids"):
+            query = query.filter(Document.id.in_([uuid.UUID(str(value)) for value in filters["document_ids"]]))
+        return query
+    
+    def get_document_ids_after(self, filters, after_id=None, limit=100):
+        """Page through matching document IDs in ID order
+        
+        Args:
+            filters: Reprocess filters, see filter_documents
+            after_id: Only return IDs greater than this one
+            limit: Maximum number of IDs to return
+            
+        Returns:
+            A list of document IDs
+        """
+        query = self.filter_documents(filters).with_entities(Document.id)
+        if after_id is not None:
+            query = query.filter(Document.id > after_id)
+        return [row.id for row in query.order_by(Document.id).limit(limit)]
+    
+    def iter_document_rows(self, filters, fields, batch_size=1000):
+        """Stream selected columns of matching documents in ID order
+        
+        Rows are fetched through a server-side cursor batch_size at a time,
+        so memory use doesn't grow with the number of documents.
+        
+        Args:
+            filters: Document filters, see filter_documents
+            fields: Names of the Document columns to select
+            batch_size: Rows fetched per round trip
+            
+        Yields:
+            Lists of up to batch_size rows
+        """
+        rows = iter(
+            self.filter_documents(filters)
+            .with_entities(*[getattr(Document, field) for field in fields])
+            .order_by(Document.id)
+            .yield_per(batch_size)
+        )
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
+    
     def get_all_documents(self):
         """Get all documents
         
@@ -63,12 +193,224 @@ class DocumentRepository:
         return self.db.query(Document).order_by(Document.created_at.desc()).all()
     
     def get_pending_documents(self):
-        """Get all pending documents
+        """Get all pending documents that are due for processing
+        
+        Documents waiting out a retry backoff are skipped until their
+        next_attempt_at has passed.
         
         Returns:
             A list of pending documents
         """
-        return self.db.query(Document).filter(Document.status == "pending").all()
+        return (
+            self.db.query(Document)
+            .filter(
+                Document.status == "pending",
+                or_(Document.next_attempt_at.is_(None), Document.next_attempt_at <= func.now())
+            )
+            .order_by(Document.created_at)
+            .all()
+        )
+    
+    def claim_document(self, document_id, worker_id=None):
+        """Atomically move a pending document to processing
+        
+        The status check is part of the UPDATE so only one worker can claim
+        a given document. Each successful claim counts as one attempt.
+        
+        Args:
+            document_id: The ID of the document
+            worker_id: ID of the claiming worker, which fences its later writes
+            
+        Returns:
+            The claimed document or None if it was not pending
+        """
+        claimed = (
+            self.db.query(Document)
+            .filter(Document.id == document_id, Document.status == "pending")
+            .update(
+                {
+                    Document.status: "processing",
+                    Document.attempts: Document.attempts + 1,
+                    Document.processing_started_at: func.now(),
+                    Document.heartbeat_at: func.now(),
+                    Document.worker_id: worker_id,
+                    Document.next_attempt_at: None,
+                },
+                synchronize_session=False
+            )
+        )
+        if claimed:
+            publish_status(self.db, document_id, "processing")
+        self.db.commit()
+        if not claimed:
+            return None
+        invalidate_document(document_id)
+        document = self.get_document_by_id(document_id)
+        self.db.refresh(document)
+        return document
+    
+    def get_claimed_document(self, document_id, worker_id=None):
+        """Get a document, if the given worker still holds its processing claim
+        
+        A worker whose document was requeued as stale and claimed by
+        another worker must not record results over the new claim. The row
+        stays locked until the caller commits, so the claim can't change
+        between the check and the write.
+        
+        Args:
+            document_id: The ID of the document
+            worker_id: ID of the claiming worker, or None to skip the check
+            
+        Returns:
+            The document, or None if not found or claimed by someone else
+        """
+        if worker_id is None:
+            return self.get_document_by_id(document_id)
+        document = (
+            self.db.query(Document)
+            .filter(Document.id == document_id)
+            .with_for_update()
+            .populate_existing()
+            .first()
+        )
+        if document and (document.status != "processing" or document.worker_id != worker_id):
+            self.db.rollback()
+            return None
+        return document
+    
+    def heartbeat_document(self, document_id, worker_id):
+        """Record that a document's worker is still processing it
+        
+        Args:
+            document_id: The ID of the document
+            worker_id: ID of the claiming worker
+            
+        Returns:
+            False if the document is no longer claimed by this worker
+        """
+        updated = self.db.query(Document).filter(
+            Document.id == document_id,
+            Document.status == "processing",
+            Document.worker_id == worker_id
+        ).update({Document.heartbeat_at: func.now()}, synchronize_session=False)
+        self.db.commit()
+        return bool(updated)
+    
+    def schedule_document_retry(self, document_id, error, delay_seconds, worker_id=None):
+        """Return a failed document to the queue after a backoff delay
+        
+        Args:
+            document_id: The ID of the document
+            error: Description of the failure
+            delay_seconds: Seconds to wait before the next attempt
+            worker_id: ID of the claiming worker; the write is skipped if its claim was lost
+            
+        Returns:
+            The updated document, or None if not found or the claim was lost
+        """
+        document = self.get_claimed_document(document_id, worker_id)
+        if document:
+            document.status = "pending"
+            document.last_error = error
+            document.next_attempt_at = seconds_from_now(delay_seconds)
+            document.processing_started_at = None
+            document.worker_id = None
+            publish_status(self.db, document_id, document.status)
+            self.db.commit()
+            self.db.refresh(document)
+            invalidate_document(document_id)
+        return document
+    
+    def dead_letter_document(self, document_id, error, worker_id=None):
+        """Mark a document as permanently failed
+        
+        Args:
+            document_id: The ID of the document
+            error: Description of the final failure
+            worker_id: ID of the claiming worker; the write is skipped if its claim was lost
+            
+        Returns:
+            The updated document, or None if not found or the claim was lost
+        """
+        document = self.get_claimed_document(document_id, worker_id)
+        if document:
+            document.status = "error"
+            document.last_error = error
+            document.next_attempt_at = None
+            document.processing_started_at = None
+            document.worker_id = None
+            publish_status(self.db, document_id, document.status)
+            self.db.commit()
+            self.db.refresh(document)
+            invalidate_document(document_id)
+        return document
+    
+    def requeue_stale_documents(self, timeout_seconds, max_attempts):
+        """Recover documents left in processing by a crashed worker
+        
+        A document is stale when its worker has stopped refreshing
+        heartbeat_at. Stale documents go back to pending, or are
+        dead-lettered if they have already used all their attempts.
+        
+        Args:
+            timeout_seconds: How long a document may stay in processing
+            max_attempts: Maximum number of processing attempts
+            
+        Returns:
+            The number of recovered documents
+        """
+        cutoff = seconds_from_now(-timeout_seconds)
+        stale_documents = (
+            self.db.query(Document)
+            .filter(
+                Document.status == "processing",
+                or_(
+                    Document.heartbeat_at < cutoff,
+                    # Rows claimed before heartbeats were recorded
+                    and_(Document.heartbeat_at.is_(None), Document.processing_started_at < cutoff),
+                    and_(
+                        Document.heartbeat_at.is_(None),
+                        Document.processing_started_at.is_(None),
+                        Document.updated_at < cutoff
+                    )
+                )
+            )
+            .all()
+        )
+        for document in stale_documents:
+            document.status = "error" if document.attempts >= max_attempts else "pending"
+            document.last_error = "Processing timed out"
+            document.next_attempt_at = None
+            document.processing_started_at = None
+            document.worker_id = None
+            publish_status(self.db, document.id, document.status)
+        self.db.commit()
+        for document in stale_documents:
+            invalidate_document(document.id)
+        return len(stale_documents)
+    
+    def update_document_upload_details(self, document_id, original_filename, content_type):
+        """Record the uploader's filename and content type on a document
+        
+        The blob poller can register an API upload before the API does,
+        naming it after the blob; the API calls this when it loses that race.
+        
+        Args:
+            document_id: The ID of the document
+            original_filename: The filename the user uploaded
+            content_type: The content type the user uploaded
+            
+        Returns:
+            The updated document or None if not found
+        """
+        document = self.get_document_by_id(document_id)
+        if document:
+            document.original_filename = original_filename
+            document.content_type = content_type
+            self.db.commit()
+            self.db.refresh(document)
+            invalidate_document(document_id)
+        return document
     
     def update_document_status(self, document_id, status):
         """Update the status of a document
@@ -83,28 +425,60 @@ class DocumentRepository:
         document = self.get_document_by_id(document_id)
         if document:
             document.status = status
+            publish_status(self.db, document_id, document.status)
             self.db.commit()
             self.db.refresh(document)
+            invalidate_document(document_id)
         return document
     
-    def update_document_text_and_summary(self, document_id, extracted_text, summary):
+    def record_document_stage(self, document_id, stage, extracted_text=None, worker_id=None):
+        """Save a completed processing stage so a retry can resume after it
+        
+        Args:
+            document_id: The ID of the document
+            stage: The stage that completed, see STAGES
+            extracted_text: The extracted text, for the "extracted" stage
+            worker_id: ID of the claiming worker; the write is skipped if its claim was lost
+            
+        Returns:
+            The updated document, or None if not found or the claim was lost
+        """
+        document = self.get_claimed_document(document_id, worker_id)
+        if document:
+            document.stage = stage
+            if extracted_text is not None:
+                document.extracted_text = extracted_text
+            self.db.commit()
+            self.db.refresh(document)
+            invalidate_document(document_id)
+        return document
+    
+    def update_document_text_and_summary(self, document_id, extracted_text, summary, worker_id=None):
         """Update the extracted text and summary of a document
         
         Args:
             document_id: The ID of the document
             extracted_text: The extracted text
             summary: The summary
+            worker_id: ID of the claiming worker; the write is skipped if its claim was lost
             
         Returns:
-            The updated document or None if not found
+            The updated document, or None if not found or the claim was lost
         """
-        document = self.get_document_by_id(document_id)
+        document = self.get_claimed_document(document_id, worker_id)
         if document:
             document.extracted_text = extracted_text
             document.summary = summary
+            document.stage = "summarized"
             document.status = "completed"
+            document.last_error = None
+            document.next_attempt_at = None
+            document.processing_started_at = None
+            document.worker_id = None
+            publish_status(self.db, document_id, document.status)
             self.db.commit()
             self.db.refresh(document)
+            invalidate_document(document_id)
         return document
     
     def update_document_summary(self, document_id, summary):
@@ -120,6 +494,256 @@ class DocumentRepository:
         document = self.get_document_by_id(document_id)
         if document:
             document.summary = summary
+            document.stage = "summarized"
+            publish_status(self.db, document_id, document.status)
             self.db.commit()
             self.db.refresh(document)
-        return document 
\ No newline at end of file
+            invalidate_document(document_id)
+        return document 
+
+class ReprocessJobRepository:
+    """Repository for bulk reprocessing job operations"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def create_job(self, filters, re_extract=False, custom_prompt=None, concurrency=4, status="pending", worker_id=None):
+        """Create a reprocessing job for the documents matching filters
+        
+        Without a created_before filter the selection is frozen at the
+        current time, so documents uploaded while the job runs are left to
+        the normal pipeline.
+        
+        Args:
+            filters: Reprocess filters, see DocumentRepository.filter_documents
+            re_extract: Re-run text extraction as well as summarization
+            custom_prompt: Optional custom summary prompt
+            concurrency: Documents processed at once
+            status: Initial status ("running" when the caller runs it directly)
+            worker_id: ID of the process running the job, if any
+            
+        Returns:
+            The created job
+        """
+        filters = dict(filters)
+        if not filters.get("created_before"):
+            filters["created_before"] = self.db.query(func.now()).scalar().replace(tzinfo=None).isoformat()
+        
+        job = ReprocessJob(
+            status=status,
+            filters=filters,
+            re_extract=re_extract,
+            custom_prompt=custom_prompt,
+            concurrency=concurrency,
+            total=DocumentRepository(self.db).filter_documents(filters).count(),
+            worker_id=worker_id,
+            run_started_at=func.now() if status == "running" else None,
+            heartbeat_at=func.now() if status == "running" else None
+        )
+        self.db.add(job)
+        self.db.commit()
+        self.db.refresh(job)
+        return job
+    
+    def get_job(self, job_id):
+        """Get a job by ID
+        
+        Args:
+            job_id: The ID of the job
+            
+        Returns:
+            The job or None if not found
+        """
+        return self.db.query(ReprocessJob).filter(ReprocessJob.id == job_id).first()
+    
+    def get_jobs(self, limit=50):
+        """Get the most recent jobs
+        
+        Args:
+            limit: Maximum number of jobs to return
+            
+        Returns:
+            A list of jobs, newest first
+        """
+        return self.db.query(ReprocessJob).order_by(ReprocessJob.created_at.desc()).limit(limit).all()
+    
+    def claim_job(self, job_id, worker_id):
+        """Atomically move a pending job to running
+        
+        Args:
+            job_id: The ID of the job
+            worker_id: ID of the process that will run the job
+            
+        Returns:
+            The claimed job or None if it was not pending
+        """
+        claimed = (
+            self.db.query(ReprocessJob)
+            .filter(ReprocessJob.id == job_id, ReprocessJob.status == "pending")
+            .update(
+                {
+                    ReprocessJob.status: "running",
+                    ReprocessJob.worker_id: worker_id,
+                    ReprocessJob.run_started_at: func.now(),
+                    ReprocessJob.heartbeat_at: func.now(),
+                    ReprocessJob.run_start_done: ReprocessJob.succeeded + ReprocessJob.failed,
+                },
+                synchronize_session=False
+            )
+        )
+        self.db.commit()
+        if not claimed:
+            return None
+        job = self.get_job(job_id)
+        self.db.refresh(job)
+        return job
+    
+    def claim_next_job(self, worker_id):
+        """Claim the oldest pending job
+        
+        Args:
+            worker_id: ID of the process that will run the job
+            
+        Returns:
+            The claimed job or None if no job is pending
+        """
+        pending = (
+            self.db.query(ReprocessJob.id)
+            .filter(ReprocessJob.status == "pending")
+            .order_by(ReprocessJob.created_at)
+            .all()
+        )
+        for row in pending:
+            job = self.claim_job(row.id, worker_id)
+            if job:
+                return job
+        return None
+    
+    def heartbeat_job(self, job_id, worker_id):
+        """Record that a job's runner is still alive
+        
+        Args:
+            job_id: The ID of the job
+            worker_id: ID of the process running the job
+            
+        Returns:
+            False if the job is no longer running under this worker
+        """
+        updated = self.db.query(ReprocessJob).filter(
+            ReprocessJob.id == job_id,
+            ReprocessJob.status == "running",
+            ReprocessJob.worker_id == worker_id
+        ).update({ReprocessJob.heartbeat_at: func.now()}, synchronize_session=False)
+        self.db.commit()
+        return bool(updated)
+    
+    def record_batch(self, job_id, worker_id, checkpoint_id, succeeded, failed, last_error=None):
+        """Record a finished batch and advance the job's checkpoint
+        
+        Progress is only recorded while the job still belongs to the
+        worker, so a runner whose job was requeued can't double-count.
+        
+        Args:
+            job_id: The ID of the job
+            worker_id: ID of the process running the job
+            checkpoint_id: The last document ID of the batch
+            succeeded: Documents reprocessed in the batch
+            failed: Documents that failed in the batch
+            last_error: The last failure in the batch, if any
+            
+        Returns:
+            False if the job no longer belongs to this worker
+        """
+        values = {
+            ReprocessJob.checkpoint_id: checkpoint_id,
+            ReprocessJob.succeeded: ReprocessJob.succeeded + succeeded,
+            ReprocessJob.failed: ReprocessJob.failed + failed,
+            ReprocessJob.heartbeat_at: func.now(),
+        }
+        if last_error:
+            values[ReprocessJob.last_error] = last_error
+        updated = self.db.query(ReprocessJob).filter(
+            ReprocessJob.id == job_id, ReprocessJob.worker_id == worker_id
+        ).update(values, synchronize_session=False)
+        self.db.commit()
+        return bool(updated)
+    
+    def finish_job(self, job_id, worker_id, status, error=None):
+        """Mark a running job as finished
+        
+        Args:
+            job_id: The ID of the job
+            worker_id: ID of the process running the job
+            status: "completed", "cancelled" or "error"
+            error: Description of the failure, for "error"
+        """
+        values = {ReprocessJob.status: status, ReprocessJob.finished_at: func.now()}
+        if error:
+            values[ReprocessJob.last_error] = error
+        self.db.query(ReprocessJob).filter(
+            ReprocessJob.id == job_id,
+            ReprocessJob.status == "running",
+            ReprocessJob.worker_id == worker_id
+        ).update(values, synchronize_session=False)
+        self.db.commit()
+    
+    def cancel_job(self, job_id):
+        """Stop a pending or running job after its current batch
+        
+        Args:
+            job_id: The ID of the job
+            
+        Returns:
+            The updated job or None if not found
+        """
+        self.db.query(ReprocessJob).filter(
+            ReprocessJob.id == job_id, ReprocessJob.status.in_(["pending", "running"])
+        ).update({ReprocessJob.status: "cancelled", ReprocessJob.finished_at: func.now()}, synchronize_session=False)
+        self.db.commit()
+        job = self.get_job(job_id)
+        if job:
+            self.db.refresh(job)
+        return job
+    
+    def resume_job(self, job_id):
+        """Queue a cancelled or failed job to continue from its checkpoint
+        
+        Args:
+            job_id: The ID of the job
+            
+        Returns:
+            The updated job or None if not found
+        """
+        self.db.query(ReprocessJob).filter(
+            ReprocessJob.id == job_id, ReprocessJob.status.in_(["cancelled", "error"])
+        ).update({ReprocessJob.status: "pending", ReprocessJob.finished_at: None}, synchronize_session=False)
+        self.db.commit()
+        job = self.get_job(job_id)
+        if job:
+            self.db.refresh(job)
+        return job
+    
+    def requeue_stale_jobs(self, timeout_seconds):
+        """Requeue running jobs whose process stopped heartbeating
+        
+        A running job's runner heartbeats on a timer, however long its
+        batch takes, so one that hasn't heartbeated within the timeout was
+        left behind by a crashed process. It resumes from its checkpoint
+        when claimed again.
+        
+        Args:
+            timeout_seconds: How long a job may go without a heartbeat
+            
+        Returns:
+            The number of requeued jobs
+        """
+        cutoff = seconds_from_now(-timeout_seconds)
+        requeued = self.db.query(ReprocessJob).filter(
+            ReprocessJob.status == "running",
+            or_(
+                ReprocessJob.heartbeat_at < cutoff,
+                and_(ReprocessJob.heartbeat_at.is_(None), ReprocessJob.updated_at < cutoff)
+            )
+        ).update({ReprocessJob.status: "pending", ReprocessJob.worker_id: None}, synchronize_session=False)
+        self.db.commit()
+        return requeued
\ No newline at end of file
@@ -0,0 +1,115 @@
+import logging
+from sqlalchemy import inspect, text
+
+from app.db.database import engine, Base
+from app.db.dedupe_documents import count_duplicated_filenames
+from app.models.document import Document
+from app.models.reprocess_job import ReprocessJob
+from app.models.worker_heartbeat import WorkerHeartbeat
+
+# Importing the models registers their tables on Base.metadata
+MODELS = (Document, ReprocessJob, WorkerHeartbeat)
+
+logger = logging.getLogger(__name__)
+
+def add_missing_columns(bind=engine):
+    """Add model columns that are missing from existing tables
+
+    create_all only creates missing tables, so columns added to a model
+    after its table was created are added here. New columns must be
+    nullable or have a server default.
+
+    Args:
+        bind: The engine to migrate
+
+    Returns:
+        A list of "table.column" names that were added
+    """
+    inspector = inspect(bind)
+    added = []
+
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+
+                column_type = column.type.compile(dialect=bind.dialect)
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                if not column.nullable and column.server_default is not None:
+                    ddl += " NOT NULL"
+
+                connection.execute(text(ddl))
+                added.append(f"{table.name}.{column.name}")
+
+    return added
+
+def add_missing_indexes(bind=engine):
+    """Create model indexes that are missing from existing tables
+
+    Args:
+        bind: The engine to migrate
+
+    Returns:
+        A list of the created index names
+    """
+    inspector = inspect(bind)
+    added = []
+
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=bind)
+                added.append(index.name)
+
+    return added
+
+def init_db(bind=engine):
+    """Create tables and add any missing columns and indexes
+
+    Run once per deployment (see start.sh) rather than at import time.
+    Rows are never deleted here: if documents from before blob names were
+    unique still share a filename, the unique index can't be created, so
+    this fails until they are removed with app.db.dedupe_documents.
+
+    Args:
+        bind: The engine to initialize
+
+    Raises:
+        RuntimeError: If duplicate document rows exist
+    """
+    Base.metadata.create_all(bind=bind)
+    for name in add_missing_columns(bind):
+        logger.info(f"Added missing column: {name}")
+    duplicated = count_duplicated_filenames(bind)
+    if duplicated:
+        raise RuntimeError(
+            f"{duplicated} blob names have more than one document row, so the unique index on "
+            f"documents.filename can't be created. Review them with "
+            f"'python -m app.db.dedupe_documents --dry-run', then run it without --dry-run "
+            f"to archive and remove them"
+        )
+    for name in add_missing_indexes(bind):
+        logger.info(f"Added missing index: {name}")
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    try:
+        init_db()
+    except RuntimeError as e:
+        logger.error(str(e))
+        raise SystemExit(1)
+    logger.info("Database schema is up to date")
@@ -1,22 +1,57 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Body
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Body, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
 from sqlalchemy.orm import Session
 import uuid
 import os
+import json
+import logging
+import time
+import traceback
 from typing import List, Optional
+from uuid import UUID
 
-from app.db.database import get_db, engine, Base
+from app.db.database import get_db, SessionLocal, engine
 from app.db.repositories import DocumentRepository
+from app.api import admin
+from app.api.caching import build_payload, conditional_response
+from app.api.compression import CompressionMiddleware
+from app.api.profiling import SlowRequestMiddleware
+from app.api.schemas import DocumentResponse, SummaryRequest, SemanticSearchResult
+from app.api.serialization import dump_document, dump_documents
+from app.core.config import settings
+from app.utils.cache import document_cache, document_key, invalidate_document, DOCUMENT_LIST_KEY
+from app.utils.events import get_event_broker
+from app.utils.profiling import install_profile_signal, instrument_engine
 from app.models.document import Document
-from app.utils.azure_storage import azure_storage_client
-from app.utils.document_intelligence import document_intelligence_service
-from app.utils.summarizer import document_summarizer
+from app.utils.azure_storage import AzureStorageClient, get_azure_storage_client
+from app.utils.summarizer import DocumentSummarizer, get_document_summarizer
+from app.utils.embeddings import chunk_text, get_document_embedder
+from app.utils.vector_index import EmbeddingIndex, get_embedding_index
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Listen for document events for the lifetime of the app"""
+    broker = get_event_broker()
+    # Writes from the worker and other replicas arrive as events
+    broker.add_listener(lambda event: invalidate_document(event["id"]))
+    broker.start()
+    # kill -USR1 <pid> writes a profile; slow requests get database timings
+    install_profile_signal("api")
+    instrument_engine(engine)
+    yield
+    broker.stop()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Document Processing Service",
     description="HIPAA compliant document processing service",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -28,27 +63,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Compress JSON responses (zstd or gzip, whichever the client prefers)
+app.add_middleware(CompressionMiddleware)
 
-# Document model for API responses
-from pydantic import BaseModel
-from datetime import datetime
-from uuid import UUID
-
-class DocumentResponse(BaseModel):
-    id: UUID
-    original_filename: str
-    status: str
-    created_at: datetime
-    updated_at: datetime
-    summary: Optional[str] = None
-    
-    class Config:
-        orm_mode = True
+# Capture timing and stacks for slow requests (outermost, so it covers compression)
+app.add_middleware(SlowRequestMiddleware)
 
-class SummaryRequest(BaseModel):
-    custom_prompt: str
+# Admin endpoints (bulk reprocessing, profiling), guarded by ADMIN_API_TOKEN
+app.include_router(admin.router)
 
 @app.get("/api/health")
 def health_check():
@@ -59,7 +81,9 @@ def health_check():
 async def upload_document(
     file: UploadFile = File(...),
     is_transcript: Optional[bool] = Form(False),
-    db: Session = Depends(get_db)
+    project_id: Optional[str] = Form(None, alias="projectId"),
+    db: Session = Depends(get_db),
+    storage: AzureStorageClient = Depends(get_azure_storage_client)
 ):
     """Upload a document to the service"""
     try:
@@ -75,50 +99,177 @@ async def upload_document(
         metadata = {
             "isTranscript": str(is_transcript).lower()
         }
+        if project_id:
+            metadata["projectId"] = project_id
         
         # Upload file to Azure Blob Storage with metadata
-        upload_result = azure_storage_client.upload_file(
+        upload_result = storage.upload_file(
             file_content, 
             filename, 
             file.content_type,
             metadata=metadata
         )
         
-        # Create document in database
+        # Register the document; the blob poller will find this row instead of creating another
         repo = DocumentRepository(db)
-        document = repo.create_document(
+        document, created = repo.get_or_create_document(
             filename=filename,
             original_filename=file.filename,
             blob_url=upload_result['url'],
-            content_type=file.content_type
+            content_type=file.content_type,
+            etag=upload_result['etag']
         )
+        if not created:
+            # The poller registered the blob first, under the blob's name
+            document = repo.update_document_upload_details(document.id, file.filename, file.content_type)
         
         return document
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def load_document_list_payload(db: Session):
+    """Serialize all documents for the list endpoint"""
+    documents = DocumentRepository(db).get_all_documents()
+    body = dump_documents(documents)
+    return build_payload(body, [(document.id, document.updated_at) for document in documents])
+
+def load_document_payload(db: Session, document_id: UUID):
+    """Serialize a single document, or return None if it doesn't exist"""
+    document = DocumentRepository(db).get_document_by_id(document_id)
+    if not document:
+        return None
+    body = dump_document(document)
+    return build_payload(body, [(document.id, document.updated_at)])
+
 @app.get("/api/documents", response_model=List[DocumentResponse])
-def get_documents(db: Session = Depends(get_db)):
+def get_documents(request: Request, db: Session = Depends(get_db)):
     """Get all documents"""
-    repo = DocumentRepository(db)
-    documents = repo.get_all_documents()
-    return documents
+    payload = document_cache.get_or_load(DOCUMENT_LIST_KEY, lambda: load_document_list_payload(db))
+    return conditional_response(request, payload)
+
+def format_sse(event, name="status"):
+    """Format a document event as a server-sent event"""
+    return f"event: {name}\ndata: {json.dumps(event)}\n\n"
+
+async def stream_events(request: Request, subscription, initial_events=()):
+    """Yield server-sent events until the client disconnects
+    
+    Args:
+        request: The incoming request
+        subscription: The event subscription to drain
+        initial_events: Events to send before live ones
+    """
+    with subscription:
+        # Sent at once so the status line and headers aren't held back until the first event
+        yield ": connected\n\n"
+        for event in initial_events:
+            yield format_sse(event)
+        while not await request.is_disconnected():
+            event = await subscription.get(timeout=settings.sse_heartbeat_seconds)
+            if event is None:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+            else:
+                yield format_sse(event)
+
+def event_stream_response(events):
+    """Wrap an event generator in a streaming response"""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/documents/events")
+async def document_events(request: Request):
+    """Stream status changes for all documents as server-sent events"""
+    subscription = get_event_broker().subscribe()
+    return event_stream_response(stream_events(request, subscription))
+
+@app.get("/api/documents/search/semantic", response_model=List[SemanticSearchResult])
+def semantic_search(
+    q: str = Query(..., min_length=1, description="Natural language query"),
+    k: int = Query(10, ge=1, le=100, description="Maximum number of documents"),
+    db: Session = Depends(get_db),
+    embedder = Depends(get_document_embedder),
+    index: EmbeddingIndex = Depends(get_embedding_index)
+):
+    """Find documents whose content is semantically closest to a query"""
+    hits = index.search(embedder.embed([q])[0], k)
+    documents = {
+        document.id: document
+        for document in DocumentRepository(db).get_documents_by_ids([hit["document_id"] for hit in hits])
+    }
+    
+    results = []
+    for hit in hits:
+        document = documents.get(hit["document_id"])
+        if not document:
+            continue
+        # Chunking is deterministic, so the matching chunk can be rebuilt from the text
+        chunks = chunk_text(document.extracted_text)
+        snippet = chunks[hit["chunk"]] if hit["chunk"] < len(chunks) else None
+        results.append(SemanticSearchResult(
+            document=DocumentResponse.model_validate(document),
+            score=hit["score"],
+            snippet=snippet
+        ))
+    return results
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    """Document read cache statistics"""
+    return document_cache.stats()
 
 @app.get("/api/documents/{document_id}", response_model=DocumentResponse)
-def get_document(document_id: UUID, db: Session = Depends(get_db)):
+def get_document(document_id: UUID, request: Request, db: Session = Depends(get_db)):
     """Get a document by ID"""
-    repo = DocumentRepository(db)
-    document = repo.get_document_by_id(document_id)
-    if not document:
+    payload = document_cache.get_or_load(
+        document_key(document_id),
+        lambda: load_document_payload(db, document_id)
+    )
+    if payload is None:
         raise HTTPException(status_code=404, detail="Document not found")
-    return document
+    return conditional_response(request, payload)
+
+def load_document_status(document_id: UUID):
+    """Read a document's current status as an event, or None if it doesn't exist
+    
+    Uses its own short-lived session so a long-running stream doesn't hold
+    a database connection.
+    """
+    db = SessionLocal()
+    try:
+        document = DocumentRepository(db).get_document_by_id(document_id)
+        if not document:
+            return None
+        return {"id": str(document.id), "status": document.status, "timestamp": time.time()}
+    finally:
+        db.close()
+
+@app.get("/api/documents/{document_id}/events")
+async def document_status_events(document_id: UUID, request: Request):
+    """Stream status changes for a document as server-sent events
+    
+    The current status is sent first, so clients don't miss a transition
+    that happened before they connected.
+    """
+    # Subscribe before reading the current status so no transition falls in between
+    subscription = get_event_broker().subscribe(document_id)
+    current = await run_in_threadpool(load_document_status, document_id)
+    if current is None:
+        subscription.close()
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    return event_stream_response(stream_events(request, subscription, [current]))
 
 @app.post("/api/documents/{document_id}/regenerate-summary", response_model=DocumentResponse)
 def regenerate_summary(
     document_id: UUID, 
     summary_request: SummaryRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    summarizer: DocumentSummarizer = Depends(get_document_summarizer)
 ):
     """Regenerate the summary for a document using a custom prompt"""
     repo = DocumentRepository(db)
@@ -131,7 +282,7 @@ def regenerate_summary(
         raise HTTPException(status_code=400, detail="Document has not been processed yet")
     
     # Generate new summary with custom prompt
-    new_summary = document_summarizer.generate_summary(
+    new_summary = summarizer.generate_summary(
         document.extracted_text,
         custom_prompt=summary_request.custom_prompt
     )
@@ -141,6 +292,75 @@ def regenerate_summary(
     
     return updated_document
 
+def load_document_text(document_id: UUID):
+    """Read a document's extracted text, or None if the document doesn't exist
+    
+    Raises:
+        HTTPException: If the document has not been processed yet
+    """
+    db = SessionLocal()
+    try:
+        document = DocumentRepository(db).get_document_by_id(document_id)
+        if not document:
+            return None
+        if not document.extracted_text:
+            raise HTTPException(status_code=400, detail="Document has not been processed yet")
+        return document.extracted_text
+    finally:
+        db.close()
+
+def save_document_summary(document_id: UUID, summary: str):
+    """Store a generated summary and return the document as JSON"""
+    db = SessionLocal()
+    try:
+        document = DocumentRepository(db).update_document_summary(document_id, summary)
+        return json.loads(dump_document(document)) if document else None
+    finally:
+        db.close()
+
+async def stream_summary_events(summarizer: DocumentSummarizer, document_id: UUID, document_text: str, custom_prompt: str):
+    """Yield summary tokens as server-sent events, then store the summary
+    
+    Sends a "token" event per piece of text, then a "done" event with the
+    updated document once the summary is saved. If generation fails an
+    "error" event is sent and the previous summary is kept. A client that
+    disconnects cancels the stream before anything is saved.
+    """
+    pieces = []
+    try:
+        async for piece in iterate_in_threadpool(summarizer.stream_summary(document_text, custom_prompt)):
+            pieces.append(piece)
+            yield format_sse({"text": piece}, "token")
+        document = await run_in_threadpool(save_document_summary, document_id, "".join(pieces).strip())
+    except Exception as e:
+        logger.error(f"Error streaming summary for {document_id}: {str(e)}")
+        logger.error(traceback.format_exc())
+        yield format_sse({"detail": f"Error generating summary: {str(e)}"}, "error")
+        return
+    if document is None:
+        yield format_sse({"detail": "Document not found"}, "error")
+    else:
+        yield format_sse(document, "done")
+
+@app.post("/api/documents/{document_id}/regenerate-summary/stream")
+async def regenerate_summary_stream(
+    document_id: UUID,
+    summary_request: SummaryRequest,
+    summarizer: DocumentSummarizer = Depends(get_document_summarizer)
+):
+    """Regenerate the summary for a document, streaming it as server-sent events
+    
+    Clients see the first words as soon as the model produces them instead
+    of waiting for the whole summary.
+    """
+    document_text = await run_in_threadpool(load_document_text, document_id)
+    if document_text is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    return event_stream_response(
+        stream_summary_events(summarizer, document_id, document_text, summary_request.custom_prompt)
+    )
+
 # Include worker routes for completeness
 @app.get("/worker/health")
 def worker_health_check():
@@ -4,21 +4,36 @@ import uuid
 
 from app.db.database import Base
 
+# Processing stages in order; each one's output is saved before the next starts
+STAGES = ("downloaded", "extracted", "summarized")
+
 class Document(Base):
     """Model for storing document information"""
     
     __tablename__ = "documents"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    filename = Column(String, nullable=False)
+    filename = Column(String, nullable=False, unique=True, index=True)  # Blob name; one row per blob
     original_filename = Column(String, nullable=False)
     blob_url = Column(String, nullable=False)
+    etag = Column(String, nullable=True)  # Blob ETag when the row was registered
     content_type = Column(String, nullable=False)
-    status = Column(String, nullable=False, default="pending")  # pending, processing, completed, error
+    status = Column(String, nullable=False, default="pending")  # pending, processing, completed, error (dead-lettered)
     extracted_text = Column(Text, nullable=True)
     summary = Column(Text, nullable=True)
+    stage = Column(String, nullable=True)  # Last completed processing stage, see STAGES
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime, nullable=True)  # When a pending retry becomes eligible
+    processing_started_at = Column(DateTime, nullable=True)  # When the current processing attempt started
+    worker_id = Column(String, nullable=True)  # Worker processing the document; only it may record results
+    heartbeat_at = Column(DateTime, nullable=True)  # Refreshed while the document is processed, to detect crashed workers
+    last_error = Column(Text, nullable=True)
     created_at = Column(DateTime, nullable=False, server_default=func.now())
     updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
     
+    def has_reached(self, stage):
+        """Whether the given processing stage has completed"""
+        return self.stage in STAGES and STAGES.index(self.stage) >= STAGES.index(stage)
+    
     def __repr__(self):
         return f"<Document(id={self.id}, filename={self.filename}, status={self.status})>" 
\ No newline at end of file
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, func
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+
+from app.db.database import Base
+
+class ReprocessJob(Base):
+    """Model for bulk reprocessing jobs"""
+    
+    __tablename__ = "reprocess_jobs"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    status = Column(String, nullable=False, default="pending")  # pending, running, completed, cancelled, error
+    filters = Column(JSON, nullable=False)  # Document selection, see DocumentRepository.filter_documents
+    re_extract = Column(Boolean, nullable=False, default=False, server_default="false")
+    custom_prompt = Column(Text, nullable=True)
+    concurrency = Column(Integer, nullable=False)
+    total = Column(Integer, nullable=False, default=0, server_default="0")
+    succeeded = Column(Integer, nullable=False, default=0, server_default="0")
+    failed = Column(Integer, nullable=False, default=0, server_default="0")
+    checkpoint_id = Column(UUID(as_uuid=True), nullable=True)  # Last document of the last finished batch
+    worker_id = Column(String, nullable=True)  # Process running the job; only it may record progress
+    heartbeat_at = Column(DateTime, nullable=True)  # Refreshed while the job runs, to detect crashed runners
+    run_started_at = Column(DateTime, nullable=True)  # Start of the current run, for throughput
+    run_start_done = Column(Integer, nullable=False, default=0, server_default="0")  # Documents done before this run
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<ReprocessJob(id={self.id}, status={self.status}, done={self.succeeded + self.failed}/{self.total})>"
\ No newline at end of file
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, DateTime, func
+
+from app.db.database import Base
+
+class WorkerHeartbeat(Base):
+    """Model for tracking live worker replicas"""
+    
+    __tablename__ = "worker_heartbeats"
+    
+    worker_id = Column(String, primary_key=True)
+    started_at = Column(DateTime, nullable=False, server_default=func.now())
+    last_seen = Column(DateTime, nullable=False, server_default=func.now())
+    
+    def __repr__(self):
+        return f"<WorkerHeartbeat(worker_id={self.worker_id}, last_seen={self.last_seen})>"
\ No newline at end of file
@@ -1,7 +1,9 @@
 import os
 import logging
+from functools import lru_cache
 from azure.storage.blob import BlobServiceClient, ContentSettings
 from app.core.config import settings
+from app.utils.profiling import timed
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
@@ -37,15 +39,16 @@ class AzureStorageClient:
         content_settings = ContentSettings(content_type=content_type)
         
         # Upload the file
-        upload_response = blob_client.upload_blob(
-            file_content, 
-            content_settings=content_settings,
-            metadata=metadata,
-            overwrite=True
-        )
-        
-        # Get blob properties including etag
-        properties = blob_client.get_blob_properties()
+        with timed("azure_storage.upload"):
+            upload_response = blob_client.upload_blob(
+                file_content, 
+                content_settings=content_settings,
+                metadata=metadata,
+                overwrite=True
+            )
+            
+            # Get blob properties including etag
+            properties = blob_client.get_blob_properties()
         etag = properties.etag.strip('"') if properties.etag else None
         
         return {
@@ -73,7 +76,8 @@ class AzureStorageClient:
             The blob content
         """
         blob_client = self.container_client.get_blob_client(blob_name)
-        return blob_client.download_blob().readall()
+        with timed("azure_storage.download"):
+            return blob_client.download_blob().readall()
     
     def delete_blob(self, blob_name):
         """Delete a blob from the container
@@ -117,11 +121,16 @@ class AzureStorageClient:
             logger.error(f"Error getting blob properties for {blob_name}: {str(e)}")
             return None
     
-    def find_unprocessed_blobs(self, processed_etags=None):
+    def find_unprocessed_blobs(self, processed_etags=None, prefix=None, exclude_prefixes=()):
         """Find all PDF blobs that haven't been processed yet
         
+        Properties come from the listing itself, so no extra request is
+        made per blob.
+        
         Args:
             processed_etags: Optional set of already processed blob etags
+            prefix: Only list blobs whose names start with this prefix
+            exclude_prefixes: Skip blobs whose names start with any of these
             
         Returns:
             A list of dictionaries with blob properties
@@ -133,19 +142,26 @@ class AzureStorageClient:
             processed_etags = self._processed_blobs
         
         try:
-            # List all blobs in the container
-            for blob in self.container_client.list_blobs():
+            # List the blobs in the container (or under the prefix)
+            for blob in self.container_client.list_blobs(name_starts_with=prefix, include=["metadata"]):
                 # Only process PDF files
                 if blob.name.lower().endswith('.pdf'):
-                    # Get blob properties
-                    properties = self.get_blob_properties(blob.name)
-                    if not properties:
+                    if exclude_prefixes and blob.name.startswith(tuple(exclude_prefixes)):
                         continue
                     
-                    etag = properties.get('etag')
+                    etag = blob.etag.strip('"') if blob.etag else None
                     if not etag:
                         continue
                     
+                    properties = {
+                        "etag": etag,
+                        "filename": blob.name,
+                        "content_type": blob.content_settings.content_type,
+                        "size": blob.size,
+                        "blob_url": self.container_client.get_blob_client(blob.name).url,
+                        "metadata": blob.metadata or {}
+                    }
+                    
                     # Skip if already processed
                     if etag in processed_etags:
                         continue
@@ -168,5 +184,7 @@ class AzureStorageClient:
             self._processed_blobs.add(etag)
             logger.info(f"Marked blob with etag {etag} as processed")
 
-# Create a singleton instance
-azure_storage_client = AzureStorageClient() 
\ No newline at end of file
+@lru_cache(maxsize=None)
+def get_azure_storage_client():
+    """Get the shared Azure Storage client, creating it on first use"""
+    return AzureStorageClient() 
\ No newline at end of file
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+
+class TTLCache:
+    """Thread-safe in-process cache with per-entry expiry and hit-rate stats"""
+
+    def __init__(self, ttl_seconds, max_entries=1024):
+        """Initialize the cache
+
+        Args:
+            ttl_seconds: How long an entry stays valid (0 disables caching)
+            max_entries: Maximum number of entries before the oldest is evicted
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Get a cached value
+
+        Args:
+            key: The cache key
+
+        Returns:
+            The cached value or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """Store a value
+
+        Args:
+            key: The cache key
+            value: The value to cache
+        """
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key, loader):
+        """Read-through lookup
+
+        Args:
+            key: The cache key
+            loader: Callable producing the value on a miss; None results are not cached
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def invalidate(self, *keys):
+        """Drop entries
+
+        Args:
+            keys: The keys to drop
+        """
+        with self._lock:
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        """Get cache statistics
+
+        Returns:
+            A dictionary with hit/miss counts, hit rate and size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+# Cache for serialized document reads. Writes made through DocumentRepository
+# invalidate it; the TTL bounds staleness from writes made in other processes.
+document_cache = TTLCache(settings.document_cache_ttl_seconds)
+
+DOCUMENT_LIST_KEY = ("documents",)
+
+def document_key(document_id):
+    """Cache key for a single document"""
+    return ("document", str(document_id))
+
+def invalidate_document(document_id=None):
+    """Invalidate cached reads affected by a write to a document
+
+    Args:
+        document_id: The ID of the changed document, if known
+    """
+    if document_id is None:
+        document_cache.invalidate(DOCUMENT_LIST_KEY)
+    else:
+        document_cache.invalidate(DOCUMENT_LIST_KEY, document_key(document_id))
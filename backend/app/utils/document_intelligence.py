@@ -1,41 +1,141 @@
-from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.core.credentials import AzureKeyCredential
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from tenacity import Retrying, stop_after_attempt, wait_exponential
 from app.core.config import settings
+from app.utils.profiling import timed
+
+logger = logging.getLogger(__name__)
+
+def split_pdf(document_content, pages_per_range):
+    """Split a PDF into smaller PDFs of consecutive pages
+
+    Each part is a standalone PDF holding only its own pages, so a range
+    request uploads and parses just those pages.
+
+    Args:
+        document_content: The PDF bytes
+        pages_per_range: Maximum pages in each part
+
+    Returns:
+        A list of (first page number, PDF bytes) pairs in page order. The
+        whole document is returned as one part if it fits in a single
+        range or can't be parsed as a PDF.
+    """
+    try:
+        from pypdf import PdfReader, PdfWriter
+
+        reader = PdfReader(io.BytesIO(document_content))
+        page_count = len(reader.pages)
+        if page_count <= pages_per_range:
+            return [(1, document_content)]
+
+        parts = []
+        for start in range(0, page_count, pages_per_range):
+            writer = PdfWriter()
+            for page in reader.pages[start:start + pages_per_range]:
+                writer.add_page(page)
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            parts.append((start + 1, buffer.getvalue()))
+        return parts
+    except Exception as e:
+        logger.warning(f"Could not split PDF, analyzing as a single request: {str(e)}")
+        return [(1, document_content)]
 
 class DocumentIntelligenceService:
     """Service for Azure Document Intelligence operations"""
-    
-    def __init__(self):
-        """Initialize the Document Intelligence service"""
+
+    def __init__(self, client=None):
+        """Initialize the Document Intelligence service
+
+        Args:
+            client: Optional DocumentIntelligenceClient-compatible client
+        """
+        if client is None:
+            # Imported here so processes that never analyze documents don't pay for the SDK import
+            from azure.ai.documentintelligence import DocumentIntelligenceClient
+            from azure.core.credentials import AzureKeyCredential
+
+            client = DocumentIntelligenceClient(
+                endpoint=settings.azure_document_intelligence_endpoint,
+                credential=AzureKeyCredential(settings.azure_document_intelligence_key)
+            )
+
         self.endpoint = settings.azure_document_intelligence_endpoint
         self.key = settings.azure_document_intelligence_key
-        self.client = DocumentIntelligenceClient(
-            endpoint=self.endpoint, 
-            credential=AzureKeyCredential(self.key)
-        )
-    
+        self.client = client
+        self.pages_per_range = settings.document_intelligence_pages_per_range
+        self.max_concurrency = settings.document_intelligence_max_concurrency
+        self.range_attempts = settings.document_intelligence_range_attempts
+        self.retry_wait = wait_exponential(multiplier=2, max=30)
+
+    def analyze_pages(self, document_content, first_page=1):
+        """Analyze a document or a part of one, retrying failures
+
+        Args:
+            document_content: The content of the document to analyze
+            first_page: The page number of the part's first page in the
+                whole document
+
+        Returns:
+            The analyzed pages, numbered as in the whole document
+        """
+        for attempt in Retrying(
+            stop=stop_after_attempt(self.range_attempts),
+            wait=self.retry_wait,
+            reraise=True
+        ):
+            with attempt:
+                if attempt.retry_state.attempt_number > 1:
+                    logger.warning(f"Retrying pages from {first_page} (attempt {attempt.retry_state.attempt_number})")
+                # Analyze the document using the Layout model
+                poller = self.client.begin_analyze_document("prebuilt-layout", document_content)
+                pages = list(poller.result().pages or [])
+
+        # A part's pages are numbered from 1; shift them to their place in the document
+        for page in pages:
+            page.page_number += first_page - 1
+        return pages
+
     def analyze_document(self, document_content):
         """Analyze a document using Azure Document Intelligence
-        
+
+        Documents longer than one page range are split into smaller PDFs
+        that are analyzed concurrently and merged back in page order. A
+        failed part is retried on its own.
+
         Args:
             document_content: The content of the document to analyze
-            
+
         Returns:
             The extracted text from the document
         """
-        # Analyze the document using the Layout model
-        poller = self.client.begin_analyze_document(
-            "prebuilt-layout", document_content
-        )
-        result = poller.result()
-        
-        # Extract text from the document
-        extracted_text = ""
-        for page in result.pages:
-            for line in page.lines:
-                extracted_text += line.content + "\n"
-        
-        return extracted_text
-
-# Create a singleton instance
-document_intelligence_service = DocumentIntelligenceService() 
\ No newline at end of file
+        with timed("document_intelligence.split"):
+            parts = split_pdf(document_content, self.pages_per_range)
+
+        with timed("document_intelligence.analyze"):
+            if len(parts) == 1:
+                pages = self.analyze_pages(document_content)
+            else:
+                logger.info(f"Analyzing document as {len(parts)} parts of up to {self.pages_per_range} pages")
+                with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(parts))) as executor:
+                    results = executor.map(lambda part: self.analyze_pages(part[1], part[0]), parts)
+                    pages = [page for part_pages in results for page in part_pages]
+
+        with timed("document_intelligence.merge"):
+            # Parts may finish in any order; page numbers are absolute
+            pages.sort(key=lambda page: page.page_number)
+
+            # Extract text from the document
+            return "".join(
+                line.content + "\n"
+                for page in pages
+                for line in (page.lines or [])
+            )
+
+@lru_cache(maxsize=None)
+def get_document_intelligence_service():
+    """Get the shared Document Intelligence service, creating it on first use"""
+    return DocumentIntelligenceService()
@@ -0,0 +1,128 @@
+import hashlib
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.profiling import timed
+from app.utils.summarizer import create_azure_openai_client
+
+def chunk_text(text, chunk_size=None, overlap=None):
+    """Split text into overlapping chunks, preferring whitespace boundaries
+
+    The split is deterministic, so a chunk can be recovered later from the
+    document text and its chunk number.
+
+    Args:
+        text: The text to split
+        chunk_size: Maximum characters per chunk
+        overlap: Characters shared between consecutive chunks
+
+    Returns:
+        A list of chunk strings
+    """
+    chunk_size = chunk_size or settings.embedding_chunk_size
+    overlap = settings.embedding_chunk_overlap if overlap is None else overlap
+    text = (text or "").strip()
+
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            # Break at the last whitespace in the second half of the window
+            boundary = max(text.rfind(" ", start + chunk_size // 2, end), text.rfind("\n", start + chunk_size // 2, end))
+            if boundary > start:
+                end = boundary
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+def normalize(vectors):
+    """Scale rows to unit length so dot products are cosine similarities"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class HashingEmbedder:
+    """Deterministic local embedder based on feature hashing
+
+    Words are hashed into a fixed number of signed buckets. Texts sharing
+    words get similar vectors, which is enough for offline development and
+    benchmarks without Azure OpenAI.
+    """
+
+    def __init__(self, dim=256):
+        """Initialize the embedder
+
+        Args:
+            dim: Embedding dimension
+        """
+        self.dim = dim
+
+    def _embed_one(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r"[a-z0-9]+", text.lower()):
+            digest = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+            vector[digest % self.dim] += 1.0 if digest & (1 << 63) else -1.0
+        return vector
+
+    def embed(self, texts):
+        """Embed texts
+
+        Args:
+            texts: A list of strings
+
+        Returns:
+            A float32 array of shape (len(texts), dim) with unit-length rows
+        """
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return normalize(np.stack([self._embed_one(text) for text in texts]))
+
+class DocumentEmbedder:
+    """Service for embedding text with Azure OpenAI"""
+
+    def __init__(self, client=None, deployment=None, batch_size=None):
+        """Initialize the embedder
+
+        Args:
+            client: Optional AzureOpenAI-compatible client
+            deployment: Embedding deployment name
+            batch_size: Texts sent per embeddings request
+        """
+        self.client = client or create_azure_openai_client()
+        self.deployment = deployment or settings.azure_openai_embedding_deployment
+        self.batch_size = batch_size or settings.embedding_batch_size
+
+    def embed(self, texts):
+        """Embed texts in batches
+
+        Args:
+            texts: A list of strings
+
+        Returns:
+            A float32 array of shape (len(texts), dim) with unit-length rows
+        """
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            with timed("openai.embeddings"):
+                response = self.client.embeddings.create(model=self.deployment, input=batch)
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return normalize(vectors)
+
+@lru_cache(maxsize=None)
+def get_document_embedder():
+    """Get the shared embedder, creating it on first use
+
+    Falls back to the local HashingEmbedder when no Azure OpenAI
+    credentials are configured, like the mocked summaries.
+    """
+    if settings.azure_openai_api_key and settings.azure_openai_endpoint:
+        return DocumentEmbedder()
+    print("No Azure OpenAI credentials found - embeddings will use the local hashing embedder")
+    return HashingEmbedder()
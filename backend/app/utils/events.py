@@ -0,0 +1,227 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from functools import lru_cache
+
+from sqlalchemy import text
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Postgres NOTIFY channel carrying document status changes
+CHANNEL = "document_events"
+
+class Subscription:
+    """A single consumer's queue of document events"""
+
+    def __init__(self, broker, loop, document_id=None, max_queued=1000):
+        """Initialize the subscription
+
+        Args:
+            broker: The broker delivering events
+            loop: The event loop the consumer runs on
+            document_id: Only receive events for this document if given
+            max_queued: Events beyond this are dropped for slow consumers
+        """
+        self.broker = broker
+        self.loop = loop
+        self.document_id = str(document_id) if document_id else None
+        self.queue = asyncio.Queue(maxsize=max_queued)
+
+    def deliver(self, event):
+        """Queue an event for the consumer (called on the broker's thread)"""
+        if self.document_id and event.get("id") != self.document_id:
+            return
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("Dropping document event for slow subscriber")
+
+    async def get(self, timeout=None):
+        """Wait for the next event
+
+        Args:
+            timeout: Seconds to wait before returning None
+
+        Returns:
+            The next event or None on timeout
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        """Stop receiving events"""
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class LocalEventBroker:
+    """In-process event fan-out
+
+    Only reaches subscribers in the publishing process, so it suits tests
+    and single-process development. Use PostgresEventBroker across replicas.
+    """
+
+    def __init__(self):
+        """Initialize the broker"""
+        self._subscriptions = set()
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def publish(self, db, event):
+        """Publish an event
+
+        Args:
+            db: The session making the change (unused locally)
+            event: A JSON-serializable dictionary with at least "id" and "status"
+        """
+        self.dispatch(event)
+
+    def dispatch(self, event):
+        """Deliver an event to every listener and subscription"""
+        with self._lock:
+            listeners = list(self._listeners)
+            subscriptions = list(self._subscriptions)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Error in document event listener: {str(e)}")
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+    def add_listener(self, callback):
+        """Call a function for every event (on the broker's thread)
+
+        Args:
+            callback: Function taking the event dictionary
+        """
+        with self._lock:
+            self._listeners.append(callback)
+
+    def subscribe(self, document_id=None):
+        """Subscribe the running event loop to events
+
+        Args:
+            document_id: Only receive events for this document if given
+
+        Returns:
+            A Subscription, usable as a context manager
+        """
+        subscription = Subscription(self, asyncio.get_running_loop(), document_id)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        self.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscription"""
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def start(self):
+        """Start receiving events (nothing to do locally)"""
+
+    def stop(self):
+        """Stop receiving events (nothing to do locally)"""
+
+class PostgresEventBroker(LocalEventBroker):
+    """Event fan-out across processes and replicas via Postgres LISTEN/NOTIFY
+
+    Events are sent with pg_notify inside the writing transaction, so they
+    are delivered only if, and when, the change commits.
+    """
+
+    def __init__(self, database_url):
+        """Initialize the broker
+
+        Args:
+            database_url: Postgres URL used for the listening connection
+        """
+        super().__init__()
+        self.database_url = database_url.replace("postgresql+psycopg2://", "postgresql://")
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def publish(self, db, event):
+        """Queue a NOTIFY in the session's transaction"""
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {
+            "channel": CHANNEL,
+            "payload": json.dumps(event),
+        })
+
+    def start(self):
+        """Start the listener thread if it isn't running"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._listen_forever, name="document-events", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the listener thread"""
+        self._stopped.set()
+
+    def _listen_forever(self):
+        """Listen for notifications, reconnecting after errors"""
+        import psycopg2
+
+        while not self._stopped.is_set():
+            connection = None
+            try:
+                connection = psycopg2.connect(self.database_url)
+                connection.set_session(autocommit=True)
+                connection.cursor().execute(f"LISTEN {CHANNEL}")
+                logger.info(f"Listening for document events on channel {CHANNEL}")
+
+                while not self._stopped.is_set():
+                    if select.select([connection], [], [], 5) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notification = connection.notifies.pop(0)
+                        self.dispatch(json.loads(notification.payload))
+            except Exception as e:
+                logger.error(f"Document event listener error: {str(e)}")
+                self._stopped.wait(5)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+@lru_cache(maxsize=None)
+def get_event_broker():
+    """Get the shared event broker, chosen by EVENT_BROKER or the database URL"""
+    broker = settings.event_broker or (
+        "postgres" if settings.database_url.startswith("postgres") else "local"
+    )
+    if broker == "postgres":
+        return PostgresEventBroker(settings.database_url)
+    return LocalEventBroker()
+
+def publish_status(db, document_id, status):
+    """Publish a document status change in the current transaction
+
+    Args:
+        db: The session making the change
+        document_id: The ID of the document
+        status: The document's new status
+    """
+    get_event_broker().publish(db, {
+        "id": str(document_id),
+        "status": status,
+        "timestamp": time.time(),
+    })
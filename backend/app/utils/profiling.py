@@ -0,0 +1,442 @@
+import asyncio
+import contextvars
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# How often the watchdog samples stacks while an operation is over its threshold
+SLOW_SAMPLE_INTERVAL = 0.1
+
+# Stacks shown in the log line for a slow operation
+LOG_TOP_STACKS = 3
+
+# Leaf frames (parent, leaf) of threads parked waiting for work
+IDLE_FRAMES = {
+    ("queue:get", "threading:wait"),
+    ("threading:wait", "threading:wait"),
+    ("asyncio.base_events:_run_once", "selectors:select"),
+    ("concurrent.futures.thread:_worker", None),
+}
+
+_current_operation = contextvars.ContextVar("current_operation", default=None)
+
+def frame_names(frame):
+    """Names of the frames in a stack, outermost first, as "module:function" """
+    names = []
+    while frame is not None:
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+def is_idle(names):
+    """Whether a stack belongs to a thread waiting for work"""
+    if not names:
+        return True
+    parent = names[-2] if len(names) > 1 else None
+    return (parent, names[-1]) in IDLE_FRAMES or (names[-1], None) in IDLE_FRAMES
+
+def sample_stacks(skip=()):
+    """Collapse the current stack of every busy thread
+
+    Args:
+        skip: Thread idents to leave out (e.g. the sampling thread)
+
+    Returns:
+        A list of folded stack strings, "thread;module:function;..."
+    """
+    thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+    stacks = []
+    for ident, frame in sys._current_frames().items():
+        if ident in skip:
+            continue
+        names = frame_names(frame)
+        if is_idle(names):
+            continue
+        stacks.append(";".join([thread_names.get(ident, str(ident))] + names))
+    return stacks
+
+def format_folded(counts):
+    """Format stack counts in the folded format read by flamegraph.pl and speedscope"""
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+def write_profile(folded, label):
+    """Write folded stacks to the profile directory
+
+    Args:
+        folded: The folded stack text
+        label: Prefix for the file name
+
+    Returns:
+        The path of the written file
+    """
+    os.makedirs(settings.profile_output_dir, exist_ok=True)
+    safe_label = "".join(character if character.isalnum() or character in "-_" else "_" for character in label)
+    path = os.path.join(
+        settings.profile_output_dir,
+        f"{safe_label}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:6]}.folded"
+    )
+    with open(path, "w") as f:
+        f.write(folded)
+
+    # Keep only the newest files so automatic captures can't fill the disk
+    profiles = sorted(
+        (entry for entry in os.scandir(settings.profile_output_dir) if entry.name.endswith(".folded")),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in profiles[:max(len(profiles) - settings.profile_max_files, 0)]:
+        try:
+            os.unlink(entry.path)
+        except OSError:
+            pass
+    return path
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a profile is requested while another is running"""
+
+class SamplingProfiler:
+    """Statistical profiler that samples every thread's stack
+
+    Nothing runs between profiles; while profiling, a background loop
+    records the stacks of all busy threads at a fixed interval.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, interval=None):
+        """Initialize the profiler
+
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval or settings.profile_sample_interval_ms / 1000
+        self.counts = Counter()
+        self.samples = 0
+
+    def run(self, seconds):
+        """Sample the process for a number of seconds
+
+        Args:
+            seconds: How long to profile
+
+        Returns:
+            The folded stacks
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        try:
+            skip = {threading.get_ident()}
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                self.counts.update(sample_stacks(skip))
+                self.samples += 1
+                time.sleep(self.interval)
+            return format_folded(self.counts)
+        finally:
+            self._lock.release()
+
+def profile_to_file(seconds, label, interval=None):
+    """Profile the process and write the result to the profile directory
+
+    Args:
+        seconds: How long to profile
+        label: Prefix for the file name
+        interval: Seconds between samples
+
+    Returns:
+        (folded stacks, file path, number of samples)
+    """
+    profiler = SamplingProfiler(interval)
+    folded = profiler.run(seconds)
+    path = write_profile(folded, label)
+    logger.info(f"Wrote {profiler.samples} profile samples to {path}")
+    return folded, path, profiler.samples
+
+def install_profile_signal(label, signum=signal.SIGUSR1):
+    """Profile for PROFILE_SIGNAL_SECONDS whenever the process gets a signal
+
+    For example ``kill -USR1 <pid>``. The profile runs on a background
+    thread and is written to the profile directory.
+
+    Args:
+        label: Prefix for profile file names
+        signum: The signal to handle
+    """
+    def start_profile(received, frame):
+        def run():
+            try:
+                profile_to_file(settings.profile_signal_seconds, label)
+            except ProfilerBusy:
+                logger.warning("Ignoring profile signal: a profile is already running")
+            except Exception as e:
+                logger.error(f"Error writing profile: {str(e)}")
+
+        threading.Thread(target=run, name="profile-signal", daemon=True).start()
+
+    try:
+        signal.signal(signum, start_profile)
+    except ValueError:
+        # Signal handlers can only be installed from the main thread
+        logger.warning("Profile signal handler not installed: not running in the main thread")
+
+class Operation:
+    """Timing record for one request, document or event-loop tick"""
+
+    def __init__(self, kind, name, threshold):
+        self.kind = kind
+        self.name = str(name)
+        self.threshold = threshold
+        self.started = time.monotonic()
+        self.deadline = self.started + threshold
+        self.timings = {}
+        self.samples = Counter()
+
+    def add_timing(self, label, seconds):
+        total, calls = self.timings.get(label, (0.0, 0))
+        self.timings[label] = (total + seconds, calls + 1)
+
+    def summary(self, elapsed):
+        """Describe the operation for logs and the admin API"""
+        return {
+            "kind": self.kind,
+            "name": self.name,
+            "seconds": round(elapsed, 3),
+            "threshold_seconds": self.threshold,
+            "timings": {
+                label: {"seconds": round(total, 3), "calls": calls}
+                for label, (total, calls) in sorted(self.timings.items(), key=lambda item: -item[1][0])
+            },
+            "top_stacks": [
+                {"stack": stack, "samples": count}
+                for stack, count in self.samples.most_common(LOG_TOP_STACKS)
+            ],
+        }
+
+class SlowOperationMonitor:
+    """Capture timing and stacks for operations that exceed a threshold
+
+    Operations register on start. A watchdog thread sleeps until the
+    earliest deadline, then samples every thread's stack until the overdue
+    operations finish, so nothing is sampled while everything is fast.
+    Slow operations are logged with their timing breakdown, their folded
+    stacks are written to the profile directory, and the most recent are
+    kept for the admin API.
+    """
+
+    def __init__(self, history=50):
+        """Initialize the monitor
+
+        Args:
+            history: Number of recent slow operations to keep
+        """
+        self._active = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.recent = deque(maxlen=history)
+
+    def _ensure_watchdog(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._watch, name="slow-operation-watchdog", daemon=True)
+                    self._thread.start()
+
+    def _watch(self):
+        skip = {threading.get_ident()}
+        while True:
+            with self._lock:
+                active = list(self._active)
+            now = time.monotonic()
+            overdue = [operation for operation in active if operation.deadline <= now]
+            if overdue:
+                stacks = sample_stacks(skip)
+                for operation in overdue:
+                    operation.samples.update(stacks)
+                timeout = SLOW_SAMPLE_INTERVAL
+            elif active:
+                timeout = min(operation.deadline for operation in active) - now
+            else:
+                timeout = None
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+    def start(self, kind, name, threshold):
+        """Start timing an operation
+
+        Args:
+            kind: What is being timed, e.g. "request" or "document"
+            name: Identifies the operation in logs
+            threshold: Seconds after which it counts as slow; None or 0
+                disables tracking
+
+        Returns:
+            The Operation, or None when tracking is disabled
+        """
+        if not threshold:
+            return None
+        operation = Operation(kind, name, threshold)
+        self._ensure_watchdog()
+        with self._lock:
+            self._active.add(operation)
+        self._wakeup.set()
+        return operation
+
+    def finish(self, operation):
+        """Stop timing an operation, reporting it if it was slow
+
+        Args:
+            operation: The Operation returned by start (may be None)
+
+        Returns:
+            The operation's summary if it was slow, otherwise None
+        """
+        if operation is None:
+            return None
+        with self._lock:
+            if operation not in self._active:
+                return None
+            self._active.discard(operation)
+
+        elapsed = time.monotonic() - operation.started
+        if elapsed < operation.threshold:
+            return None
+
+        summary = operation.summary(elapsed)
+        if operation.samples:
+            try:
+                summary["profile_path"] = write_profile(format_folded(operation.samples), f"slow-{operation.kind}")
+            except Exception as e:
+                logger.error(f"Error writing slow operation profile: {str(e)}")
+        self.recent.append(summary)
+
+        timings = ", ".join(
+            f"{label} {values['seconds']:.2f} s ({values['calls']} calls)"
+            for label, values in summary["timings"].items()
+        )
+        stacks = " | ".join(
+            f"{stack['samples']}x {stack['stack'].split(';')[-1]}" for stack in summary["top_stacks"]
+        )
+        logger.warning(
+            f"Slow {operation.kind} {operation.name}: {elapsed:.2f} s "
+            f"(threshold {operation.threshold:.2f} s); timings: {timings or 'none'}; "
+            f"hot frames: {stacks or 'none'}"
+            + (f"; profile: {summary['profile_path']}" if "profile_path" in summary else "")
+        )
+        return summary
+
+    @contextmanager
+    def track(self, kind, name, threshold):
+        """Time the enclosed block as an operation
+
+        Timings recorded with ``timed`` inside the block (in this context,
+        including threadpool calls that copy it) are attributed to it.
+        """
+        operation = self.start(kind, name, threshold)
+        token = _current_operation.set(operation)
+        try:
+            yield operation
+        finally:
+            _current_operation.reset(token)
+            self.finish(operation)
+
+slow_operations = SlowOperationMonitor()
+
+def set_current_operation(operation):
+    """Attribute timings in this context to an operation
+
+    Returns:
+        A token for reset_current_operation
+    """
+    return _current_operation.set(operation)
+
+def reset_current_operation(token):
+    """Undo set_current_operation"""
+    _current_operation.reset(token)
+
+@contextmanager
+def timed(label):
+    """Add the time spent in the block to the current operation's timings
+
+    Costs one context variable lookup when no operation is tracked.
+    """
+    operation = _current_operation.get()
+    if operation is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        operation.add_timing(label, time.perf_counter() - start)
+
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    if _current_operation.get() is not None:
+        connection.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    operation = _current_operation.get()
+    starts = connection.info.get("query_start")
+    if operation is not None and starts:
+        operation.add_timing("db", time.perf_counter() - starts.pop())
+
+def instrument_engine(engine):
+    """Record database time as the "db" timing of the current operation
+
+    Safe to call more than once for the same engine.
+
+    Args:
+        engine: The SQLAlchemy engine to instrument
+    """
+    for name, listener in (
+        ("before_cursor_execute", _before_cursor_execute),
+        ("after_cursor_execute", _after_cursor_execute),
+    ):
+        if not event.contains(engine, name, listener):
+            event.listen(engine, name, listener)
+
+class EventLoopLagMonitor:
+    """Measure how late the event loop wakes up a sleeping task
+
+    Each tick is tracked as a slow operation whose threshold is the sleep
+    interval plus the allowed lag, so a blocked loop gets its stack
+    sampled by the watchdog while it is blocked.
+    """
+
+    def __init__(self, threshold=None, interval=0.5):
+        """Initialize the monitor
+
+        Args:
+            threshold: Lag in seconds that counts as a stall
+            interval: Seconds between ticks
+        """
+        self.threshold = settings.event_loop_lag_threshold_ms / 1000 if threshold is None else threshold
+        self.interval = interval
+        self.max_lag = 0.0
+        self.stalls = 0
+
+    async def run(self):
+        """Tick forever, logging stalls through slow_operations"""
+        if not self.threshold:
+            return
+        while True:
+            operation = slow_operations.start("event loop", "tick", self.interval + self.threshold)
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = time.monotonic() - start - self.interval
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                self.stalls += 1
+            slow_operations.finish(operation)
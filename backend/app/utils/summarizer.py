@@ -1,21 +1,45 @@
-import openai
 from app.core.config import settings
 import os
-from openai import AzureOpenAI
+from functools import lru_cache
+from app.utils.profiling import timed
+
+def create_azure_openai_client():
+    """Create an Azure OpenAI client from the configured credentials
+    
+    Returns:
+        An AzureOpenAI client, or None if no credentials are configured
+    """
+    if not (settings.azure_openai_api_key and settings.azure_openai_endpoint):
+        return None
+    
+    # Imported here because the SDK is slow to import and only needed once a client exists
+    from openai import AzureOpenAI
+    
+    return AzureOpenAI(
+        api_key=settings.azure_openai_api_key,
+        azure_endpoint=settings.azure_openai_endpoint,
+        api_version=settings.azure_openai_api_version
+    )
+
+MOCK_SUMMARY = "This is a mock summary for local development. Azure OpenAI API credentials are required for actual summaries."
 
 class DocumentSummarizer:
     """Service for summarizing document content using OpenAI"""
     
-    def __init__(self):
-        """Initialize the OpenAI client"""
+    def __init__(self, client=None, deployment=None):
+        """Initialize the OpenAI client
+        
+        Args:
+            client: Optional AzureOpenAI-compatible client (e.g. a local fake)
+            deployment: Deployment name to use with an injected client
+        """
+        if client is not None:
+            self.client = client
+            self.deployment = deployment or settings.azure_openai_deployment
         # Check if we have Azure OpenAI credentials
-        if settings.azure_openai_api_key and settings.azure_openai_endpoint:
+        elif settings.azure_openai_api_key and settings.azure_openai_endpoint:
             try:
-                self.client = AzureOpenAI(
-                    api_key=settings.azure_openai_api_key,
-                    azure_endpoint=settings.azure_openai_endpoint,
-                    api_version=settings.azure_openai_api_version
-                )
+                self.client = create_azure_openai_client()
                 self.deployment = settings.azure_openai_deployment
                 print(f"Successfully initialized Azure OpenAI client with deployment: {self.deployment}")
             except Exception as e:
@@ -28,15 +52,15 @@ class DocumentSummarizer:
             self.deployment = None
             print("No Azure OpenAI credentials found - summaries will be mocked")
     
-    def generate_summary(self, document_text, custom_prompt=None):
-        """Generate a summary for the document
+    def build_messages(self, document_text, custom_prompt=None):
+        """Build the chat messages for summarizing a document
         
         Args:
             document_text: The text content of the document
             custom_prompt: Optional custom prompt to guide the summary
             
         Returns:
-            The generated summary
+            A list of chat messages
         """
         # Create a system prompt that follows HIPAA guidelines
         system_prompt = """
@@ -55,26 +79,82 @@ class DocumentSummarizer:
         else:
             user_prompt = f"Summarize this document:\n\n{document_text[:8000]}"
         
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def generate_summary(self, document_text, custom_prompt=None, raise_errors=False):
+        """Generate a summary for the document
+        
+        Args:
+            document_text: The text content of the document
+            custom_prompt: Optional custom prompt to guide the summary
+            raise_errors: Raise API errors instead of returning them as the
+                summary, so bulk jobs don't overwrite good summaries
+            
+        Returns:
+            The generated summary
+        """
+        messages = self.build_messages(document_text, custom_prompt)
+        
         # If no client is available, return a mock summary for local development
         if not self.client or not self.deployment:
-            return "This is a mock summary for local development. Azure OpenAI API credentials are required for actual summaries."
+            return MOCK_SUMMARY
             
         # Generate the summary
         try:
-            response = self.client.chat.completions.create(
-                model=self.deployment,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=1000,
-                temperature=0.3
-            )
+            with timed("openai.chat"):
+                response = self.client.chat.completions.create(
+                    model=self.deployment,
+                    messages=messages,
+                    max_tokens=1000,
+                    temperature=0.3
+                )
             
             return response.choices[0].message.content.strip()
         except Exception as e:
             print(f"Error generating summary: {e}")
+            if raise_errors:
+                raise
             return f"Error generating summary: {str(e)}"
 
-# Create a singleton instance
-document_summarizer = DocumentSummarizer() 
\ No newline at end of file
+    def stream_summary(self, document_text, custom_prompt=None):
+        """Generate a summary for the document, yielding text as it arrives
+        
+        Unlike generate_summary, API errors are raised: by then part of the
+        summary may already have been sent.
+        
+        Args:
+            document_text: The text content of the document
+            custom_prompt: Optional custom prompt to guide the summary
+            
+        Yields:
+            Pieces of the summary, in order
+        """
+        if not self.client or not self.deployment:
+            # Stream the mock summary word by word so local development exercises the same path
+            for word in MOCK_SUMMARY.split(" "):
+                yield word + " "
+            return
+        
+        with timed("openai.chat_stream"):
+            stream = self.client.chat.completions.create(
+                model=self.deployment,
+                messages=self.build_messages(document_text, custom_prompt),
+                max_tokens=1000,
+                temperature=0.3,
+                stream=True
+            )
+            for chunk in stream:
+                # Azure sends chunks without choices (e.g. content filter results)
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    yield content
+
+@lru_cache(maxsize=None)
+def get_document_summarizer():
+    """Get the shared document summarizer, creating it on first use"""
+    return DocumentSummarizer() 
\ No newline at end of file
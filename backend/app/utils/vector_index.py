@@ -0,0 +1,228 @@
+import fcntl
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.embeddings import normalize
+
+# Rows scored per block, sized to keep each block around 32 MB
+BLOCK_BYTES = 32 * 1024 * 1024
+
+class EmbeddingIndex:
+    """Append-only float32 embedding index, memory-mapped from disk
+
+    Files in the index directory:
+        meta.json    {"dim": <embedding dimension>}
+        vectors.f32  row-major float32 unit vectors
+        ids.u64      document UUID per row, as two little-endian uint64
+        chunks.i32   chunk number within the document per row
+        deleted.u8   1 for rows replaced by a later re-index
+
+    Writers serialize on a lock file; readers never lock and only see rows
+    present in every file, so a half-written append is ignored. Search is an
+    exact, vectorized dot product over the memory-mapped vectors.
+    """
+
+    def __init__(self, path):
+        """Initialize the index
+
+        Args:
+            path: Directory holding the index files (created if missing)
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.dim = self._read_dim()
+        self._rows = 0
+        self._vectors = None
+        self._ids = None
+        self._chunks = None
+        self._deleted = None
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _read_dim(self):
+        try:
+            with open(self._file("meta.json")) as f:
+                return json.load(f)["dim"]
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def _write_lock(self):
+        with open(self._file("lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _row_count(self):
+        """Rows fully present in every file"""
+        if self.dim is None:
+            return 0
+        sizes = []
+        for name, row_bytes in (("vectors.f32", self.dim * 4), ("ids.u64", 16), ("chunks.i32", 4), ("deleted.u8", 1)):
+            try:
+                sizes.append(os.path.getsize(self._file(name)) // row_bytes)
+            except FileNotFoundError:
+                return 0
+        return min(sizes)
+
+    def _refresh(self):
+        """Remap the files if other processes have appended rows"""
+        if self.dim is None:
+            self.dim = self._read_dim()
+        rows = self._row_count()
+        if rows == self._rows and self._vectors is not None:
+            return
+        self._rows = rows
+        if rows == 0:
+            self._vectors = self._ids = self._chunks = self._deleted = None
+            return
+        self._vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(rows, self.dim))
+        self._ids = np.memmap(self._file("ids.u64"), dtype="<u8", mode="r", shape=(rows, 2))
+        self._chunks = np.memmap(self._file("chunks.i32"), dtype="<i4", mode="r", shape=(rows,))
+        self._deleted = np.memmap(self._file("deleted.u8"), dtype=np.uint8, mode="r", shape=(rows,))
+
+    def __len__(self):
+        self._refresh()
+        return self._rows
+
+    def _mark_deleted(self, document_id):
+        """Flag every row of a document as deleted (caller holds the lock)"""
+        self._refresh()
+        if not self._rows:
+            return 0
+        key = np.frombuffer(uuid.UUID(str(document_id)).bytes, dtype="<u8")
+        rows = np.flatnonzero((self._ids[:, 0] == key[0]) & (self._ids[:, 1] == key[1]))
+        if len(rows):
+            deleted = np.memmap(self._file("deleted.u8"), dtype=np.uint8, mode="r+", shape=(self._rows,))
+            deleted[rows] = 1
+            deleted.flush()
+        return len(rows)
+
+    def add(self, document_id, vectors, replace=True):
+        """Index a document's chunk embeddings, replacing any earlier ones
+
+        Args:
+            document_id: The ID of the document
+            vectors: Array of shape (chunks, dim), one row per chunk
+            replace: Flag earlier rows for the document as deleted; bulk
+                loads of new documents can skip this scan
+        """
+        vectors = normalize(vectors)
+        if vectors.ndim != 2 or not len(vectors):
+            return
+
+        with self._write_lock():
+            self.dim = self._read_dim()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self._file("meta.json"), "w") as f:
+                    json.dump({"dim": self.dim}, f)
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dim}")
+
+            if replace:
+                self._mark_deleted(document_id)
+
+            count = len(vectors)
+            key = np.frombuffer(uuid.UUID(str(document_id)).bytes, dtype="<u8")
+            # ids.u64 is written last: readers count rows by the shortest file
+            for name, data in (
+                ("vectors.f32", vectors.astype("<f4", copy=False)),
+                ("chunks.i32", np.arange(count, dtype="<i4")),
+                ("deleted.u8", np.zeros(count, dtype=np.uint8)),
+                ("ids.u64", np.tile(key, (count, 1))),
+            ):
+                with open(self._file(name), "ab") as f:
+                    f.write(np.ascontiguousarray(data).tobytes())
+
+    def delete_document(self, document_id):
+        """Remove a document from search results
+
+        Args:
+            document_id: The ID of the document
+
+        Returns:
+            The number of rows flagged as deleted
+        """
+        with self._write_lock():
+            return self._mark_deleted(document_id)
+
+    def document_ids(self):
+        """Get the IDs of the documents with searchable rows
+
+        Returns:
+            A set of document UUIDs
+        """
+        self._refresh()
+        if not self._rows:
+            return set()
+        live = np.unique(self._ids[self._deleted == 0], axis=0)
+        return {uuid.UUID(bytes=row.tobytes()) for row in live}
+
+    def search(self, query, k=10):
+        """Find the documents whose chunks are most similar to a query
+
+        Args:
+            query: Query embedding of shape (dim,)
+            k: Maximum number of documents to return
+
+        Returns:
+            Up to k dicts with "document_id", "chunk" and "score" (cosine
+            similarity of the best chunk), best first
+        """
+        self._refresh()
+        if not self._rows:
+            return []
+
+        query = normalize(query).reshape(-1)
+        if query.shape[0] != self.dim:
+            raise ValueError(f"Query dimension {query.shape[0]} does not match index dimension {self.dim}")
+
+        # Several chunks can belong to one document, so keep extra candidates
+        candidates = k * 8
+        block_rows = max(1, BLOCK_BYTES // (self.dim * 4))
+        best_rows = []
+        best_scores = []
+        for start in range(0, self._rows, block_rows):
+            stop = min(start + block_rows, self._rows)
+            scores = self._vectors[start:stop] @ query
+            scores[self._deleted[start:stop] != 0] = -np.inf
+            if len(scores) > candidates:
+                top = np.argpartition(scores, -candidates)[-candidates:]
+            else:
+                top = np.arange(len(scores))
+            best_rows.append(top + start)
+            best_scores.append(scores[top])
+
+        rows = np.concatenate(best_rows)
+        scores = np.concatenate(best_scores)
+        order = np.argsort(-scores, kind="stable")
+
+        results = []
+        seen = set()
+        for index in order:
+            if not np.isfinite(scores[index]):
+                break
+            row = rows[index]
+            document_id = uuid.UUID(bytes=self._ids[row].tobytes())
+            if document_id in seen:
+                continue
+            seen.add(document_id)
+            results.append({"document_id": document_id, "chunk": int(self._chunks[row]), "score": float(scores[index])})
+            if len(results) == k:
+                break
+        return results
+
+@lru_cache(maxsize=None)
+def get_embedding_index():
+    """Get the shared embedding index, opening it on first use"""
+    return EmbeddingIndex(settings.embedding_index_path)
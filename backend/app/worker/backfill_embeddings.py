@@ -0,0 +1,76 @@
+"""Embed documents that were processed before semantic search existed
+
+Documents are read in ID order and each one's saved extracted text is
+chunked, embedded and added to the embedding index, so nothing goes
+through Document Intelligence again. Documents already in the index are
+skipped unless --reindex is given, so an interrupted backfill can simply
+be run again:
+
+    python -m app.worker.backfill_embeddings
+    python -m app.worker.backfill_embeddings --reindex
+"""
+import argparse
+import logging
+import traceback
+
+from app.db.database import SessionLocal
+from app.db.repositories import DocumentRepository
+from app.utils.embeddings import chunk_text, get_document_embedder
+from app.utils.vector_index import get_embedding_index
+
+logger = logging.getLogger(__name__)
+
+def backfill_embeddings(embedder, index, session_factory=SessionLocal, reindex=False, batch_size=100):
+    """Index the extracted text of every document missing from the index
+
+    Args:
+        embedder: Text embedder
+        index: The EmbeddingIndex to fill
+        session_factory: Creates database sessions
+        reindex: Re-embed documents that are already indexed
+        batch_size: Documents read per round trip
+
+    Returns:
+        A (indexed, skipped, failed) tuple of document counts
+    """
+    already_indexed = set() if reindex else index.document_ids()
+    indexed = skipped = failed = 0
+    db = session_factory()
+    try:
+        batches = DocumentRepository(db).iter_document_rows({}, ["id", "extracted_text"], batch_size)
+        for batch in batches:
+            for row in batch:
+                chunks = chunk_text(row.extracted_text)
+                if row.id in already_indexed or not chunks:
+                    skipped += 1
+                    continue
+                try:
+                    index.add(row.id, embedder.embed(chunks), replace=reindex)
+                    indexed += 1
+                except Exception as e:
+                    logger.error(f"Error indexing document {row.id}: {str(e)}")
+                    logger.error(traceback.format_exc())
+                    failed += 1
+            logger.info(f"Backfill progress: {indexed} indexed, {skipped} skipped, {failed} failed")
+    finally:
+        db.close()
+    return indexed, skipped, failed
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    parser = argparse.ArgumentParser(description="Add existing documents' extracted text to the embedding index")
+    parser.add_argument("--reindex", action="store_true", help="Re-embed documents that are already indexed")
+    parser.add_argument("--batch-size", type=int, default=100, help="Documents read per database round trip")
+    args = parser.parse_args()
+
+    indexed, skipped, failed = backfill_embeddings(
+        get_document_embedder(), get_embedding_index(), reindex=args.reindex, batch_size=args.batch_size
+    )
+    logger.info(f"Backfill finished: {indexed} indexed, {skipped} skipped, {failed} failed")
+    raise SystemExit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
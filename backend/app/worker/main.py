@@ -4,16 +4,24 @@ import logging
 from sqlalchemy.orm import Session
 import traceback
 import os
-from pathlib import Path
-import tempfile
 import uuid
+import random
+import socket
 
 from app.core.config import settings
-from app.db.database import SessionLocal
-from app.db.repositories import DocumentRepository
-from app.utils.azure_storage import azure_storage_client
-from app.utils.document_intelligence import document_intelligence_service
-from app.utils.summarizer import document_summarizer
+from app.db.database import SessionLocal, engine
+from app.db.repositories import DocumentRepository, ReprocessJobRepository
+from app.utils.azure_storage import get_azure_storage_client
+from app.utils.document_intelligence import get_document_intelligence_service
+from app.utils.summarizer import get_document_summarizer
+from app.utils.embeddings import chunk_text, get_document_embedder
+from app.utils.vector_index import get_embedding_index
+from app.utils.profiling import (
+    EventLoopLagMonitor, install_profile_signal, instrument_engine,
+    reset_current_operation, set_current_operation, slow_operations
+)
+from app.worker.partitions import CATCHALL_PARTITION, PartitionCoordinator
+from app.worker.reprocess import ReprocessRunner
 
 # Configure logging
 logging.basicConfig(
@@ -22,16 +30,138 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def retry_delay_seconds(attempts):
+    """Exponential backoff with jitter for the given attempt number
+    
+    Args:
+        attempts: Number of attempts made so far (1 for the first failure)
+        
+    Returns:
+        The number of seconds to wait before the next attempt
+    """
+    delay = settings.retry_base_delay_seconds * (2 ** max(attempts - 1, 0))
+    delay = min(delay, settings.retry_max_delay_seconds)
+    # Spread retries out so a shared outage doesn't retry in lockstep
+    return delay * random.uniform(0.8, 1.2)
+
 class DocumentProcessingWorker:
     """Worker for processing documents in the background"""
     
-    def __init__(self):
-        """Initialize the worker"""
+    def __init__(self, storage_client=None, document_intelligence=None, summarizer=None,
+                 embedder=None, embedding_index=None, coordinator=None):
+        """Initialize the worker
+        
+        Args:
+            storage_client: Optional Azure Storage client (created lazily if omitted)
+            document_intelligence: Optional Document Intelligence service (created lazily if omitted)
+            summarizer: Optional document summarizer (created lazily if omitted)
+            embedder: Optional text embedder (created lazily if omitted)
+            embedding_index: Optional embedding index (opened lazily if omitted)
+            coordinator: Optional blob partition coordinator (created lazily if omitted)
+        """
         self.poll_interval = settings.poll_interval_seconds
+        # Several heartbeats fit in the stale timeout, so one slow write doesn't lose the claim
+        self.heartbeat_interval = settings.processing_timeout_seconds / 3
+        self._storage_client = storage_client
+        self._document_intelligence = document_intelligence
+        self._summarizer = summarizer
+        self._embedder = embedder
+        self._embedding_index = embedding_index
+        self._coordinator = coordinator
+        # Unique per replica, so blob partitions can be split between workers
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.blob_polls = 0
         # Track processed document ETags
         self.processed_etags = set()
         logger.info(f"Worker initialized with poll interval: {self.poll_interval} seconds")
     
+    @property
+    def storage_client(self):
+        """Azure Storage client, created on first use"""
+        if self._storage_client is None:
+            self._storage_client = get_azure_storage_client()
+        return self._storage_client
+    
+    @property
+    def document_intelligence(self):
+        """Document Intelligence service, created on first use"""
+        if self._document_intelligence is None:
+            self._document_intelligence = get_document_intelligence_service()
+        return self._document_intelligence
+    
+    @property
+    def summarizer(self):
+        """Document summarizer, created on first use"""
+        if self._summarizer is None:
+            self._summarizer = get_document_summarizer()
+        return self._summarizer
+    
+    @property
+    def embedder(self):
+        """Text embedder, created on first use"""
+        if self._embedder is None:
+            self._embedder = get_document_embedder()
+        return self._embedder
+    
+    @property
+    def embedding_index(self):
+        """Embedding index, opened on first use"""
+        if self._embedding_index is None:
+            self._embedding_index = get_embedding_index()
+        return self._embedding_index
+    
+    @property
+    def coordinator(self):
+        """Blob partition coordinator, created on first use"""
+        if self._coordinator is None:
+            self._coordinator = PartitionCoordinator(self.worker_id)
+        return self._coordinator
+    
+    def find_unprocessed_blobs(self):
+        """Find unprocessed blobs in the partitions this worker owns
+        
+        The catch-all partition lists the whole container, so its owner
+        only scans it every few polls.
+        
+        Returns:
+            A list of dictionaries with blob properties
+        """
+        partitions = self.coordinator.acquire()
+        self.blob_polls += 1
+        
+        result = []
+        for partition in partitions:
+            if partition == CATCHALL_PARTITION and (self.blob_polls - 1) % max(settings.blob_catchall_every_polls, 1):
+                continue
+            result.extend(self.storage_client.find_unprocessed_blobs(
+                self.processed_etags, **self.coordinator.listing_args(partition)
+            ))
+        
+        logger.info(f"Scanned blob partitions: {', '.join(partitions) or 'none'}")
+        return result
+    
+    def index_document(self, document_id, extracted_text):
+        """Chunk, embed and index a document's text for semantic search
+        
+        Indexing failures are logged rather than raised: search is secondary
+        to extraction and summarization, and shouldn't send the document
+        back through the retry queue.
+        
+        Args:
+            document_id: The ID of the document
+            extracted_text: The document's extracted text
+        """
+        try:
+            chunks = chunk_text(extracted_text)
+            if not chunks:
+                return
+            vectors = self.embedder.embed(chunks)
+            self.embedding_index.add(document_id, vectors)
+            logger.info(f"Indexed {len(chunks)} chunks for document: {document_id}")
+        except Exception as e:
+            logger.error(f"Error indexing document {document_id}: {str(e)}")
+            logger.error(traceback.format_exc())
+    
     def get_db(self):
         """Get a database session"""
         db = SessionLocal()
@@ -40,6 +170,34 @@ class DocumentProcessingWorker:
         finally:
             db.close()
     
+    def record_failure(self, repo, document_id, error):
+        """Schedule a retry for a failed document or dead-letter it
+        
+        Args:
+            repo: Document repository
+            document_id: The ID of the failed document
+            error: The exception that caused the failure
+        """
+        message = str(error)[:2000]
+        document = repo.get_document_by_id(document_id)
+        if not document:
+            return
+        
+        if document.attempts >= settings.max_processing_attempts:
+            if not repo.dead_letter_document(document_id, message, worker_id=self.worker_id):
+                logger.warning(f"Document {document_id} was claimed by another worker, not recording failure")
+                return
+            logger.error(f"Document {document_id} failed after {document.attempts} attempts, giving up")
+        else:
+            delay = retry_delay_seconds(document.attempts)
+            if not repo.schedule_document_retry(document_id, message, delay, worker_id=self.worker_id):
+                logger.warning(f"Document {document_id} was claimed by another worker, not recording failure")
+                return
+            logger.warning(
+                f"Document {document_id} failed (attempt {document.attempts} of "
+                f"{settings.max_processing_attempts}), retrying in {delay:.0f} seconds"
+            )
+    
     async def process_document(self, document, db: Session):
         """Process a document from the database
         
@@ -47,258 +205,266 @@ class DocumentProcessingWorker:
             document: The document to process
             db: Database session
         """
+        repo = DocumentRepository(db)
+        
+        # Claim the document so no other worker picks it up
+        if not repo.claim_document(document.id, self.worker_id):
+            logger.info(f"Document {document.id} already claimed, skipping")
+            return
+        
+        # Capture timing and stacks if the document is slow. Service calls run in
+        # threads so the event loop (and the other polling loops) keep going.
+        operation = slow_operations.start("document", document.id, settings.slow_document_threshold_seconds)
+        token = set_current_operation(operation)
+        # Keep the claim alive so long documents aren't requeued as stale
+        heartbeat = asyncio.create_task(self.heartbeat_document(document.id))
         try:
-            # Update document status
-            repo = DocumentRepository(db)
-            repo.update_document_status(document.id, "processing")
-            logger.info(f"Processing document: {document.id}")
-            
-            # Download document from blob storage
-            blob_content = azure_storage_client.download_blob(document.filename)
+            # Resume after the last stage a previous attempt saved
+            if document.stage:
+                logger.info(f"Processing document: {document.id} (resuming after {document.stage})")
+            else:
+                logger.info(f"Processing document: {document.id}")
             
-            # Extract text using Document Intelligence
-            extracted_text = document_intelligence_service.analyze_document(blob_content)
-            logger.info(f"Text extracted from document: {document.id}")
+            if document.has_reached("extracted") and document.extracted_text is not None:
+                extracted_text = document.extracted_text
+            else:
+                # Download document from blob storage
+                blob_content = await asyncio.to_thread(self.storage_client.download_blob, document.filename)
+                if not repo.record_document_stage(document.id, "downloaded", worker_id=self.worker_id):
+                    logger.warning(f"Document {document.id} was claimed by another worker, stopping")
+                    return
+                
+                # Extract text using Document Intelligence
+                extracted_text = await asyncio.to_thread(self.document_intelligence.analyze_document, blob_content)
+                if not repo.record_document_stage(document.id, "extracted", extracted_text=extracted_text, worker_id=self.worker_id):
+                    logger.warning(f"Document {document.id} was claimed by another worker, stopping")
+                    return
+                logger.info(f"Text extracted from document: {document.id}")
             
-            # Generate summary
-            summary = document_summarizer.generate_summary(extracted_text)
-            logger.info(f"Summary generated for document: {document.id}")
+            if document.has_reached("summarized") and document.summary is not None:
+                summary = document.summary
+            else:
+                # Generate summary; failures go through the retry queue rather than becoming the summary
+                summary = await asyncio.to_thread(self.summarizer.generate_summary, extracted_text, raise_errors=True)
+                logger.info(f"Summary generated for document: {document.id}")
             
             # Update document with extracted text and summary
-            repo.update_document_text_and_summary(document.id, extracted_text, summary)
+            if not repo.update_document_text_and_summary(document.id, extracted_text, summary, worker_id=self.worker_id):
+                logger.warning(f"Document {document.id} was claimed by another worker, discarding results")
+                return
             logger.info(f"Document processing completed: {document.id}")
             
+            # Make the document searchable
+            await asyncio.to_thread(self.index_document, document.id, extracted_text)
+            
         except Exception as e:
             logger.error(f"Error processing document {document.id}: {str(e)}")
             logger.error(traceback.format_exc())
-            repo.update_document_status(document.id, "error")
+            db.rollback()
+            self.record_failure(repo, document.id, e)
+        finally:
+            heartbeat.cancel()
+            reset_current_operation(token)
+            slow_operations.finish(operation)
     
-    async def process_blob_document(self, blob_properties, temp_file_path=None):
-        """Process a document directly from blob storage
+    async def heartbeat_document(self, document_id):
+        """Refresh a claimed document's heartbeat until cancelled or the claim is lost
         
         Args:
-            blob_properties: The properties of the blob to process
-            temp_file_path: Optional path to temporary file
+            document_id: The ID of the document being processed
         """
-        db = None
-        try:
-            # Get database session
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
             db = self.get_db()
+            try:
+                if not DocumentRepository(db).heartbeat_document(document_id, self.worker_id):
+                    return
+            except Exception as e:
+                logger.error(f"Error refreshing heartbeat for document {document_id}: {str(e)}")
+            finally:
+                db.close()
+    
+    async def register_blob(self, blob_properties):
+        """Register a discovered blob as a document and process it if it's new
+        
+        Blobs uploaded through the API already have a row, so only the
+        ETag is recorded for them; the pending-document poller owns their
+        processing.
+        
+        Args:
+            blob_properties: The properties of the blob to register
+            
+        Returns:
+            The document for the blob
+        """
+        db = self.get_db()
+        try:
             repo = DocumentRepository(db)
             
             # Extract properties
             etag = blob_properties.get('etag')
             filename = blob_properties.get('filename')
-            blob_url = blob_properties.get('blob_url')
-            content_type = blob_properties.get('content_type')
             
-            # Create document record in database
-            original_filename = os.path.basename(filename)
-            document = repo.create_document(filename, original_filename, blob_url, content_type)
-            logger.info(f"Created document record: {document.id} for blob: {filename} (etag: {etag})")
-            
-            # Update document status
-            repo.update_document_status(document.id, "processing")
-            
-            # Process document content
-            if temp_file_path:
-                # If we have a temp file, read it
-                with open(temp_file_path, 'rb') as f:
-                    blob_content = f.read()
-            else:
-                # Otherwise download from blob storage
-                blob_content = azure_storage_client.download_blob(filename)
+            document, created = repo.get_or_create_document(
+                filename,
+                os.path.basename(filename),
+                blob_properties.get('blob_url'),
+                blob_properties.get('content_type'),
+                etag=etag
+            )
             
-            # Extract text using Document Intelligence
-            extracted_text = document_intelligence_service.analyze_document(blob_content)
-            logger.info(f"Text extracted from document: {document.id}")
-            
-            # Generate summary
-            summary = document_summarizer.generate_summary(extracted_text)
-            logger.info(f"Summary generated for document: {document.id}")
+            # The database row now owns retries for this blob
+            self.storage_client.mark_as_processed(etag)
+            self.processed_etags.add(etag)
             
-            # Update document with extracted text and summary
-            repo.update_document_text_and_summary(document.id, extracted_text, summary)
-            logger.info(f"Document processing completed: {document.id}")
+            if not created:
+                logger.info(f"Blob {filename} is already registered as document {document.id}")
+                return document
             
-            # Mark the blob as processed
-            azure_storage_client.mark_as_processed(etag)
-            self.processed_etags.add(etag)
+            logger.info(f"Created document record: {document.id} for blob: {filename} (etag: {etag})")
             
+            # Start right away rather than waiting for the next database poll;
+            # the claim makes sure only one worker processes it
+            await self.process_document(document, db)
             return document
-            
-        except Exception as e:
-            logger.error(f"Error processing blob document: {str(e)}")
-            logger.error(traceback.format_exc())
-            if db:
-                try:
-                    # Try to update document status if it was created
-                    repo = DocumentRepository(db)
-                    # Try to find the document by filename if we have it
-                    if 'filename' in blob_properties:
-                        document = repo.get_document_by_filename(blob_properties['filename'])
-                        if document:
-                            repo.update_document_status(document.id, "error")
-                except Exception:
-                    pass
         finally:
-            if db:
-                db.close()
-            
-            # Clean up temporary file if it exists
-            if temp_file_path and os.path.exists(temp_file_path):
-                try:
-                    os.unlink(temp_file_path)
-                    logger.info(f"Cleaned up temporary file: {temp_file_path}")
-                except Exception as e:
-                    logger.error(f"Error cleaning up temporary file: {str(e)}")
-    
-    async def download_blob_to_temp(self, blob_name):
-        """Download a blob to a temporary file
-        
-        Args:
-            blob_name: Name of the blob to download
-            
-        Returns:
-            Path to the temporary file
-        """
-        try:
-            # Create temp directory if it doesn't exist
-            temp_dir = Path(tempfile.gettempdir()) / "docprocessor"
-            temp_dir.mkdir(exist_ok=True)
-            
-            # Generate a unique temp file name
-            temp_file = temp_dir / f"{uuid.uuid4()}_{os.path.basename(blob_name)}"
-            
-            # Download the blob
-            blob_content = azure_storage_client.download_blob(blob_name)
-            
-            # Write to temp file
-            with open(temp_file, 'wb') as f:
-                f.write(blob_content)
-                
-            logger.info(f"Downloaded blob {blob_name} to {temp_file}")
-            return temp_file
-        except Exception as e:
-            logger.error(f"Error downloading blob to temp file: {str(e)}")
-            return None
+            db.close()
     
     async def load_processed_documents(self):
-        """Load already processed document etags from the database"""
+        """Load the etags of registered blobs from the database"""
+        db = self.get_db()
         try:
-            db = self.get_db()
-            # Query all documents and get their filenames
-            documents = db.query(Document).all()
-            
-            # For each document, get the blob properties and extract the etag
-            for document in documents:
-                try:
-                    properties = azure_storage_client.get_blob_properties(document.filename)
-                    if properties and 'etag' in properties:
-                        etag = properties['etag']
-                        if etag:
-                            self.processed_etags.add(etag)
-                except Exception:
-                    # If we can't get properties, just continue
-                    pass
-                    
+            self.processed_etags.update(DocumentRepository(db).get_document_etags())
             logger.info(f"Loaded {len(self.processed_etags)} processed document etags")
         except Exception as e:
             logger.error(f"Error loading processed documents: {str(e)}")
         finally:
             db.close()
-            
+    
+    async def poll_blobs_once(self):
+        """Register and process the unprocessed blobs in this worker's partitions"""
+        logger.info("Polling for new blobs in Azure Storage...")
+        
+        # Find unprocessed blobs in this worker's partitions
+        unprocessed_blobs = await asyncio.to_thread(self.find_unprocessed_blobs)
+        
+        if not unprocessed_blobs:
+            logger.info("No new blobs found")
+            return
+        
+        logger.info(f"Found {len(unprocessed_blobs)} new documents to process")
+        for blob_properties in unprocessed_blobs:
+            try:
+                await self.register_blob(blob_properties)
+            except Exception as e:
+                # Leave the blob unmarked so the next poll picks it up again
+                logger.error(f"Error registering blob: {str(e)}")
+                logger.error(traceback.format_exc())
+    
     async def poll_for_new_blobs(self):
         """Poll Azure Blob Storage for new documents and process them"""
         await self.load_processed_documents()
         
         while True:
             try:
-                logger.info("Polling for new blobs in Azure Storage...")
-                
-                # Find unprocessed blobs
-                unprocessed_blobs = azure_storage_client.find_unprocessed_blobs(self.processed_etags)
-                
-                if unprocessed_blobs:
-                    logger.info(f"Found {len(unprocessed_blobs)} new documents to process")
-                    
-                    # Process each new document
-                    for blob_properties in unprocessed_blobs:
-                        try:
-                            # Get the filename
-                            filename = blob_properties.get('filename')
-                            
-                            # Download to temp file
-                            temp_file = await self.download_blob_to_temp(filename)
-                            
-                            # Process the document
-                            if temp_file:
-                                await self.process_blob_document(blob_properties, temp_file)
-                            else:
-                                # Try processing without temp file
-                                await self.process_blob_document(blob_properties)
-                                
-                        except Exception as e:
-                            logger.error(f"Error processing blob: {str(e)}")
-                            # Mark as processed anyway to avoid retry loops
-                            etag = blob_properties.get('etag')
-                            if etag:
-                                azure_storage_client.mark_as_processed(etag)
-                                self.processed_etags.add(etag)
-                else:
-                    logger.info("No new blobs found")
-                
-                # Wait before polling again
-                await asyncio.sleep(self.poll_interval)
-                
+                await self.poll_blobs_once()
             except Exception as e:
                 logger.error(f"Error in blob polling loop: {str(e)}")
                 logger.error(traceback.format_exc())
-                await asyncio.sleep(self.poll_interval)
+            
+            # Wait before polling again
+            await asyncio.sleep(self.poll_interval)
+    
+    async def poll_pending_once(self):
+        """Recover stale documents and process the pending ones that are due"""
+        db = self.get_db()
+        try:
+            # Recover documents abandoned by a crashed worker
+            repo = DocumentRepository(db)
+            recovered = repo.requeue_stale_documents(
+                settings.processing_timeout_seconds,
+                settings.max_processing_attempts
+            )
+            if recovered:
+                logger.warning(f"Recovered {recovered} stale processing documents")
+            
+            # Get pending documents
+            pending_documents = repo.get_pending_documents()
+            
+            if pending_documents:
+                logger.info(f"Found {len(pending_documents)} pending documents in database")
+                
+                # Process each document
+                for document in pending_documents:
+                    await self.process_document(document, db)
+        finally:
+            db.close()
     
     async def poll_pending_documents(self):
         """Poll for pending documents in the database and process them"""
         while True:
             try:
-                # Get database session
-                db = self.get_db()
+                await self.poll_pending_once()
+            except Exception as e:
+                logger.error(f"Error in database poll loop: {str(e)}")
+                logger.error(traceback.format_exc())
+            
+            # Wait before polling again
+            await asyncio.sleep(self.poll_interval)
+    
+    async def poll_reprocess_jobs(self):
+        """Run bulk reprocess jobs queued through the admin API or CLI"""
+        runner = ReprocessRunner(self)
+        while True:
+            db = self.get_db()
+            try:
+                jobs = ReprocessJobRepository(db)
                 
-                # Get pending documents
-                repo = DocumentRepository(db)
-                pending_documents = repo.get_pending_documents()
+                # Jobs left running by a crashed worker resume from their checkpoint
+                requeued = jobs.requeue_stale_jobs(settings.processing_timeout_seconds)
+                if requeued:
+                    logger.warning(f"Requeued {requeued} stale reprocess jobs")
                 
-                if pending_documents:
-                    logger.info(f"Found {len(pending_documents)} pending documents in database")
+                job = jobs.claim_next_job(self.worker_id)
+                if job:
+                    # Run in a thread so the polling loops keep going during long jobs
+                    await asyncio.to_thread(runner.run, job.id, self.worker_id)
+                else:
+                    await asyncio.sleep(self.poll_interval)
                     
-                    # Process each document
-                    for document in pending_documents:
-                        await self.process_document(document, db)
-                
-                # Wait before polling again
-                await asyncio.sleep(self.poll_interval)
-                
             except Exception as e:
-                logger.error(f"Error in database poll loop: {str(e)}")
+                logger.error(f"Error in reprocess job loop: {str(e)}")
                 logger.error(traceback.format_exc())
                 await asyncio.sleep(self.poll_interval)
             finally:
                 db.close()
 
-# Import for loading processed documents
-from app.models.document import Document
-
 # Main function to run the worker
 async def run_worker():
     """Run the document processing worker"""
     logger.info("Starting document processing worker")
     worker = DocumentProcessingWorker()
     
-    # Start tasks to poll both the database and blob storage
+    # kill -USR1 <pid> writes a profile; slow documents get database timings
+    install_profile_signal("worker")
+    instrument_engine(engine)
+    lag_monitor = asyncio.create_task(EventLoopLagMonitor().run())
+    
+    # Heartbeat independently of polling, which waits on long documents
+    worker.coordinator.start_heartbeat()
+    
+    # Start tasks to poll the database, blob storage and reprocess jobs
     task1 = asyncio.create_task(worker.poll_pending_documents())
     task2 = asyncio.create_task(worker.poll_for_new_blobs())
+    task3 = asyncio.create_task(worker.poll_reprocess_jobs())
     
-    # Wait for both tasks (they should run indefinitely)
-    await asyncio.gather(task1, task2)
+    # Wait for the tasks (they should run indefinitely)
+    try:
+        await asyncio.gather(task1, task2, task3)
+    finally:
+        lag_monitor.cancel()
+        # Hand this worker's blob partitions to the other replicas right away
+        worker.coordinator.close()
 
 # Start the worker when script is run directly
 if __name__ == "__main__":
@@ -0,0 +1,253 @@
+import hashlib
+import logging
+import threading
+
+from sqlalchemy import func, text
+
+from app.core.config import settings
+from app.db.database import SessionLocal, engine
+from app.db.expressions import seconds_from_now
+from app.models.worker_heartbeat import WorkerHeartbeat
+
+logger = logging.getLogger(__name__)
+
+# Partition for blob names that match none of the configured prefixes
+CATCHALL_PARTITION = "*"
+
+def parse_prefixes(value):
+    """Parse the BLOB_PARTITION_PREFIXES setting
+
+    Args:
+        value: Comma-separated prefixes, or a string of single-character
+            prefixes such as "0123456789abcdef"
+
+    Returns:
+        A list of distinct prefixes, in order
+    """
+    parts = value.split(",") if "," in value else list(value)
+    prefixes = []
+    for part in (part.strip() for part in parts):
+        if part and part not in prefixes:
+            prefixes.append(part)
+    return prefixes
+
+def partition_lock_key(partition):
+    """Postgres advisory lock key (a signed 64-bit integer) for a partition"""
+    digest = hashlib.blake2b(f"blob-partition:{partition}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+def rendezvous_owner(partition, workers):
+    """Pick the worker that owns a partition with rendezvous hashing
+
+    Every worker computes the same owner from the same worker list, and
+    when a worker joins or leaves only its own partitions move.
+
+    Args:
+        partition: The partition name
+        workers: IDs of the live workers
+
+    Returns:
+        The owning worker ID, or None if there are no workers
+    """
+    def weight(worker_id):
+        digest = hashlib.blake2b(f"{partition}:{worker_id}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    return max(workers, key=weight, default=None)
+
+class PartitionCoordinator:
+    """Split blob listing between worker replicas
+
+    Each worker heartbeats a row in worker_heartbeats from a background
+    thread, so a worker busy with a long document stays live. Partitions are
+    assigned to the live workers by rendezvous hashing, so a replica that
+    stops heartbeating loses its partitions to the others within the
+    heartbeat TTL. On Postgres, ownership is also held as a session-level
+    advisory lock so two replicas never scan the same partition while their
+    views of the live workers disagree.
+    """
+
+    def __init__(self, worker_id, prefixes=None, heartbeat_ttl=None, session_factory=SessionLocal, bind=engine):
+        """Initialize the coordinator
+
+        Args:
+            worker_id: Unique ID of this worker replica
+            prefixes: Blob name prefixes, one partition each
+            heartbeat_ttl: Seconds after which a silent worker is considered dead
+            session_factory: Factory for database sessions
+            bind: Engine used for the advisory lock connection
+        """
+        self.worker_id = worker_id
+        self.prefixes = parse_prefixes(settings.blob_partition_prefixes) if prefixes is None else list(prefixes)
+        self.partitions = self.prefixes + [CATCHALL_PARTITION]
+        self.heartbeat_ttl = heartbeat_ttl or settings.worker_heartbeat_ttl_seconds
+        self.session_factory = session_factory
+        self.bind = bind
+        self.use_advisory_locks = bind.dialect.name == "postgresql"
+        self._lock_connection = None
+        self._locked = set()
+        self._heartbeat_thread = None
+        self._stopped = threading.Event()
+
+    def heartbeat(self):
+        """Record that this worker is alive and forget long-dead workers
+
+        Times come from the database clock, so clock skew between replicas
+        can't make a live worker look dead or a dead one look live.
+        """
+        db = self.session_factory()
+        try:
+            updated = db.query(WorkerHeartbeat).filter(
+                WorkerHeartbeat.worker_id == self.worker_id
+            ).update({WorkerHeartbeat.last_seen: func.now()}, synchronize_session=False)
+            if not updated:
+                db.add(WorkerHeartbeat(worker_id=self.worker_id, started_at=func.now(), last_seen=func.now()))
+            db.query(WorkerHeartbeat).filter(
+                WorkerHeartbeat.last_seen < seconds_from_now(-self.heartbeat_ttl * 10)
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def start_heartbeat(self, interval=None):
+        """Heartbeat from a background thread until close()
+
+        Args:
+            interval: Seconds between heartbeats; defaults to a third of the TTL
+        """
+        if self._heartbeat_thread is not None:
+            return
+        interval = interval or self.heartbeat_ttl / 3
+        self._stopped.clear()
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop, args=(interval,), name="worker-heartbeat", daemon=True
+        )
+        self._heartbeat_thread.start()
+
+    def _heartbeat_loop(self, interval):
+        while True:
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.error(f"Error recording worker heartbeat: {str(e)}")
+            if self._stopped.wait(interval):
+                return
+
+    def live_workers(self):
+        """IDs of workers that heartbeated within the TTL, sorted"""
+        db = self.session_factory()
+        try:
+            cutoff = seconds_from_now(-self.heartbeat_ttl)
+            rows = db.query(WorkerHeartbeat.worker_id).filter(WorkerHeartbeat.last_seen >= cutoff).all()
+            workers = sorted(row.worker_id for row in rows)
+        finally:
+            db.close()
+        # Always count ourselves, even if our heartbeat hasn't landed yet
+        if self.worker_id not in workers:
+            workers.append(self.worker_id)
+            workers.sort()
+        return workers
+
+    def assigned_partitions(self, workers):
+        """Partitions this worker should scan given the live workers"""
+        return [
+            partition for partition in self.partitions
+            if rendezvous_owner(partition, workers) == self.worker_id
+        ]
+
+    def _connection(self):
+        if self._lock_connection is None or self._lock_connection.closed:
+            self._lock_connection = self.bind.connect()
+            self._locked = set()
+        return self._lock_connection
+
+    def _try_lock(self, partition):
+        connection = self._connection()
+        locked = connection.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": partition_lock_key(partition)}
+        ).scalar()
+        connection.commit()
+        return bool(locked)
+
+    def _unlock(self, partition):
+        connection = self._connection()
+        connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": partition_lock_key(partition)})
+        connection.commit()
+
+    def acquire(self):
+        """Return the partitions this worker may scan now
+
+        Heartbeats first unless the background heartbeat is running.
+
+        Partitions that moved to another worker are released first. On
+        Postgres, a partition whose lock is still held by its previous
+        owner is skipped until that owner releases it or its session ends.
+
+        Returns:
+            A list of partition names
+        """
+        if self._heartbeat_thread is None:
+            self.heartbeat()
+        assigned = self.assigned_partitions(self.live_workers())
+        if not self.use_advisory_locks:
+            return assigned
+
+        try:
+            for partition in self._locked - set(assigned):
+                self._unlock(partition)
+                self._locked.discard(partition)
+
+            owned = []
+            for partition in assigned:
+                if partition in self._locked or self._try_lock(partition):
+                    self._locked.add(partition)
+                    owned.append(partition)
+                else:
+                    logger.info(f"Partition {partition} is still locked by another worker, skipping")
+            return owned
+        except Exception:
+            # A broken connection drops its locks; start over on the next poll
+            self._reset_connection()
+            raise
+
+    def _reset_connection(self):
+        if self._lock_connection is not None:
+            try:
+                # Invalidate rather than close: a pooled connection would keep its session locks
+                self._lock_connection.invalidate()
+                self._lock_connection.close()
+            except Exception:
+                pass
+        self._lock_connection = None
+        self._locked = set()
+
+    def listing_args(self, partition):
+        """Keyword arguments for AzureStorageClient.find_unprocessed_blobs
+
+        Args:
+            partition: A partition name from acquire()
+
+        Returns:
+            A dict with "prefix" and "exclude_prefixes"
+        """
+        if partition == CATCHALL_PARTITION:
+            return {"prefix": None, "exclude_prefixes": tuple(self.prefixes)}
+        # A longer configured prefix nested under this one is its own partition
+        nested = tuple(other for other in self.prefixes if other != partition and other.startswith(partition))
+        return {"prefix": partition, "exclude_prefixes": nested}
+
+    def close(self):
+        """Stop heartbeating, release partition locks and remove this worker's heartbeat"""
+        if self._heartbeat_thread is not None:
+            self._stopped.set()
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+        self._reset_connection()
+        db = self.session_factory()
+        try:
+            db.query(WorkerHeartbeat).filter(WorkerHeartbeat.worker_id == self.worker_id).delete()
+            db.commit()
+        except Exception as e:
+            logger.error(f"Error removing worker heartbeat: {str(e)}")
+        finally:
+            db.close()
@@ -0,0 +1,272 @@
+"""Bulk reprocessing of existing documents
+
+Jobs re-run summarization (and optionally extraction) for every document
+matching a filter. Documents are processed in ID order, one batch at a
+time with bounded concurrency; after each batch the job's checkpoint moves
+to the batch's last document, so an interrupted job resumes where it left
+off. Jobs queued through the admin API are run by the worker; this module
+can also run one in the foreground:
+
+    python -m app.worker.reprocess --status completed --prompt "..."
+    python -m app.worker.reprocess --resume <job-id>
+"""
+import argparse
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.repositories import DocumentRepository, ReprocessJobRepository
+from app.utils.profiling import slow_operations
+
+logger = logging.getLogger(__name__)
+
+def format_progress(done, total, rate):
+    """Describe job progress with throughput and ETA
+
+    Args:
+        done: Documents finished so far
+        total: Documents selected by the job
+        rate: Documents per second in the current run
+
+    Returns:
+        A progress string
+    """
+    remaining = max(total - done, 0)
+    eta = str(timedelta(seconds=round(remaining / rate))) if rate > 0 else "unknown"
+    return f"{done}/{total} documents, {rate:.2f} docs/sec, ETA {eta}"
+
+class ReprocessRunner:
+    """Runs bulk reprocessing jobs"""
+
+    def __init__(self, worker, session_factory=SessionLocal, batch_size=None, heartbeat_interval=None):
+        """Initialize the runner
+
+        Args:
+            worker: DocumentProcessingWorker whose services are used
+            session_factory: Factory for database sessions
+            batch_size: Documents per checkpointed batch
+            heartbeat_interval: Seconds between job heartbeats
+        """
+        self.worker = worker
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.reprocess_batch_size
+        self.heartbeat_interval = heartbeat_interval or settings.worker_heartbeat_ttl_seconds / 3
+
+    def reprocess_document(self, document_id, re_extract=False, custom_prompt=None):
+        """Re-summarize one document, re-extracting its text if asked
+
+        Args:
+            document_id: The ID of the document
+            re_extract: Download and analyze the blob again first
+            custom_prompt: Optional custom summary prompt
+
+        Returns:
+            None on success, or a description of the failure
+        """
+        with slow_operations.track("reprocess", document_id, settings.slow_document_threshold_seconds):
+            return self._reprocess_document(document_id, re_extract, custom_prompt)
+
+    @contextmanager
+    def _repository(self):
+        """A document repository on a short-lived session"""
+        db = self.session_factory()
+        try:
+            yield DocumentRepository(db)
+        finally:
+            db.close()
+
+    def _reprocess_document(self, document_id, re_extract, custom_prompt):
+        # Sessions are only held around reads and writes, not the service calls
+        # in between, so a pool thread waiting on OpenAI doesn't hold a connection
+        try:
+            with self._repository() as repo:
+                document = repo.get_document_by_id(document_id)
+                if not document:
+                    return f"Document {document_id} no longer exists"
+                filename, extracted_text = document.filename, document.extracted_text
+
+            if re_extract:
+                blob_content = self.worker.storage_client.download_blob(filename)
+                extracted_text = self.worker.document_intelligence.analyze_document(blob_content)
+                # Keep the new text even if summarizing fails, so a rerun skips extraction
+                with self._repository() as repo:
+                    repo.record_document_stage(document_id, "extracted", extracted_text=extracted_text)
+            if not extracted_text:
+                return f"Document {document_id} has no extracted text"
+
+            summary = self.worker.summarizer.generate_summary(
+                extracted_text, custom_prompt=custom_prompt, raise_errors=True
+            )
+
+            with self._repository() as repo:
+                if re_extract:
+                    repo.update_document_text_and_summary(document_id, extracted_text, summary)
+                else:
+                    repo.update_document_summary(document_id, summary)
+            if re_extract:
+                self.worker.index_document(document_id, extracted_text)
+            return None
+        except Exception as e:
+            logger.error(f"Error reprocessing document {document_id}: {str(e)}")
+            return f"Document {document_id}: {str(e)[:1000]}"
+
+    def _heartbeat(self, job_id, worker_id, stopped):
+        """Heartbeat the job until stopped"""
+        while not stopped.wait(self.heartbeat_interval):
+            db = self.session_factory()
+            try:
+                if not ReprocessJobRepository(db).heartbeat_job(job_id, worker_id):
+                    logger.info(f"Reprocess job {job_id} is no longer running here; stopping after this batch")
+            except Exception as e:
+                logger.error(f"Error recording heartbeat for reprocess job {job_id}: {str(e)}")
+            finally:
+                db.close()
+
+    def run(self, job_id, worker_id):
+        """Run a claimed job from its checkpoint until it finishes or is cancelled
+
+        The job is heartbeated from a separate thread so a long batch isn't
+        mistaken for a crashed runner. If the job is requeued and claimed
+        by another worker anyway, this runner stops after its current batch
+        without recording it.
+
+        Args:
+            job_id: The ID of a job in the "running" state
+            worker_id: ID of the process that claimed the job
+
+        Returns:
+            The job's final status, as far as this runner is concerned
+        """
+        db = self.session_factory()
+        jobs = ReprocessJobRepository(db)
+        documents = DocumentRepository(db)
+        started = time.monotonic()
+        done_this_run = 0
+        stopped = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(job_id, worker_id, stopped),
+            name=f"reprocess-heartbeat-{job_id}", daemon=True
+        )
+        heartbeat.start()
+        try:
+            job = jobs.get_job(job_id)
+            logger.info(f"Starting reprocess job {job_id} at checkpoint {job.checkpoint_id or 'start'}")
+            with ThreadPoolExecutor(max_workers=max(job.concurrency, 1)) as executor:
+                while True:
+                    # Pick up cancellation between batches
+                    db.expire_all()
+                    job = jobs.get_job(job_id)
+                    if job.status == "running" and job.worker_id != worker_id:
+                        logger.warning(f"Reprocess job {job_id} was taken over by {job.worker_id}, stopping")
+                        return job.status
+                    if job.status != "running":
+                        logger.info(f"Reprocess job {job_id} is {job.status}, stopping")
+                        return job.status
+
+                    batch = documents.get_document_ids_after(job.filters, job.checkpoint_id, self.batch_size)
+                    db.commit()
+                    if not batch:
+                        jobs.finish_job(job_id, worker_id, "completed")
+                        logger.info(f"Reprocess job {job_id} completed: {job.succeeded} succeeded, {job.failed} failed")
+                        return "completed"
+
+                    errors = list(executor.map(
+                        lambda document_id: self.reprocess_document(document_id, job.re_extract, job.custom_prompt),
+                        batch
+                    ))
+                    failures = [error for error in errors if error]
+                    if not jobs.record_batch(job_id, worker_id, batch[-1], len(batch) - len(failures), len(failures),
+                                             failures[-1] if failures else None):
+                        # Requeued or taken over mid-batch; the checks above stop the loop
+                        continue
+
+                    done_this_run += len(batch)
+                    rate = done_this_run / max(time.monotonic() - started, 1e-9)
+                    done = job.succeeded + job.failed + len(batch)
+                    logger.info(f"Reprocess job {job_id}: {format_progress(done, job.total, rate)}")
+        except BaseException as e:
+            # Including KeyboardInterrupt, so an interrupted CLI run can be resumed
+            logger.error(f"Reprocess job {job_id} stopped: {str(e) or type(e).__name__}")
+            logger.error(traceback.format_exc())
+            db.rollback()
+            status = "error" if isinstance(e, Exception) else "cancelled"
+            jobs.finish_job(job_id, worker_id, status, str(e)[:2000] or type(e).__name__)
+            if isinstance(e, Exception):
+                return status
+            raise
+        finally:
+            stopped.set()
+            heartbeat.join()
+            db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-summarize (and optionally re-extract) existing documents")
+    parser.add_argument("--status", action="append", dest="statuses",
+                        help="Document status to include (repeatable, default: completed)")
+    parser.add_argument("--created-after", help="Only documents created at or after this ISO timestamp")
+    parser.add_argument("--created-before", help="Only documents created before this ISO timestamp")
+    parser.add_argument("--document-id", action="append", dest="document_ids", help="Specific document (repeatable)")
+    parser.add_argument("--re-extract", action="store_true", help="Re-run text extraction as well")
+    parser.add_argument("--prompt", help="Custom summary prompt")
+    parser.add_argument("--concurrency", type=int, default=settings.reprocess_concurrency,
+                        help="Documents processed at once")
+    parser.add_argument("--resume", metavar="JOB_ID", help="Continue a cancelled or failed job from its checkpoint")
+    parser.add_argument("--enqueue", action="store_true", help="Queue the job for the worker instead of running it here")
+    args = parser.parse_args()
+
+    # Imported here: app.worker.main imports this module for its job loop
+    from app.worker.main import DocumentProcessingWorker
+
+    worker_id = f"cli-{socket.gethostname()}-{os.getpid()}"
+    db = SessionLocal()
+    try:
+        jobs = ReprocessJobRepository(db)
+        if args.resume:
+            job = jobs.resume_job(args.resume)
+            if not job or job.status != "pending":
+                parser.error(f"Job {args.resume} not found or not resumable ({job.status if job else 'missing'})")
+            if not args.enqueue:
+                job = jobs.claim_job(job.id, worker_id)
+                if not job:
+                    parser.error(f"Job {args.resume} was claimed by another process")
+        else:
+            filters = {
+                "statuses": args.statuses or ["completed"],
+                "created_after": args.created_after,
+                "created_before": args.created_before,
+                "document_ids": args.document_ids,
+            }
+            job = jobs.create_job(
+                {key: value for key, value in filters.items() if value},
+                re_extract=args.re_extract,
+                custom_prompt=args.prompt,
+                concurrency=args.concurrency,
+                status="pending" if args.enqueue else "running",
+                worker_id=None if args.enqueue else worker_id
+            )
+        job_id = job.id
+        logger.info(f"Reprocess job {job_id}: {job.total} documents selected")
+    finally:
+        db.close()
+
+    if args.enqueue:
+        logger.info(f"Queued reprocess job {job_id} for the worker")
+        return
+
+    try:
+        status = ReprocessRunner(DocumentProcessingWorker()).run(job_id, worker_id)
+    except KeyboardInterrupt:
+        logger.info(f"Interrupted; resume with: python -m app.worker.reprocess --resume {job_id}")
+        raise SystemExit(130)
+    raise SystemExit(0 if status == "completed" else 1)
+
+if __name__ == "__main__":
+    main()
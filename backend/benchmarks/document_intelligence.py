@@ -0,0 +1,53 @@
+"""Measure page-range fan-out latency against a fake Document Intelligence backend
+
+The fake client takes a fixed time per page, finishes parts in random
+order and fails some first attempts. Extraction latency is reported for
+each fan-out level; merge order and retries are covered by
+tests/test_document_intelligence.py.
+
+Usage (from the backend directory):
+    python -m benchmarks.document_intelligence --pages 300 --page-ms 10
+"""
+import argparse
+import time
+
+from tenacity import wait_none
+
+from app.utils.document_intelligence import DocumentIntelligenceService
+from tests.fakes import FakeDocumentIntelligenceClient, expected_text, make_pdf
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=300, help="Pages in the test document")
+    parser.add_argument("--page-ms", type=float, default=10, help="Fake analysis time per page")
+    parser.add_argument("--pages-per-range", type=int, default=25, help="Pages per range")
+    parser.add_argument("--failure-rate", type=float, default=0.2, help="Chance a range fails its first attempt")
+    args = parser.parse_args()
+
+    content = make_pdf(args.pages)
+    expected = expected_text(args.pages)
+    baseline = None
+
+    for fan_out in (1, 2, 4, 8):
+        client = FakeDocumentIntelligenceClient(args.page_ms / 1000, args.failure_rate)
+        service = DocumentIntelligenceService(client=client)
+        service.pages_per_range = args.pages_per_range
+        service.max_concurrency = fan_out
+        # Retry immediately so backoff sleeps don't swamp the latency numbers
+        service.range_attempts = 2
+        service.retry_wait = wait_none()
+
+        start = time.perf_counter()
+        text = service.analyze_document(content)
+        elapsed = time.perf_counter() - start
+
+        assert text == expected, f"pages merged out of order with fan-out {fan_out}"
+        retries = len(client.calls) - len(set(client.calls))
+        baseline = baseline or elapsed
+        print(
+            f"fan-out {fan_out}: {elapsed:6.2f} s  speedup {baseline / elapsed:4.1f}x  "
+            f"calls {len(client.calls)} (retried ranges {retries})  merge order ok"
+        )
+
+if __name__ == "__main__":
+    main()
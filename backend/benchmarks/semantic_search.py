@@ -0,0 +1,131 @@
+"""Benchmark semantic search latency and recall offline
+
+Two corpora are built in a temporary directory, with no Azure access:
+
+* vectors: random unit vectors standing in for chunk embeddings. Queries
+  are noisy copies of indexed chunks, and recall@k is the share of queries
+  whose source document comes back in the top k.
+* text: synthetic clinical notes (topic words, filler and a Zipf-distributed
+  long-tail vocabulary) chunked with chunk_text and embedded with the
+  deterministic HashingEmbedder. Queries are phrases taken from one note,
+  so this also exercises chunking and the embedder.
+
+Usage (from the backend directory):
+    python -m benchmarks.semantic_search --chunks 1000000 --dim 256
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from app.utils.embeddings import HashingEmbedder, chunk_text, normalize
+from app.utils.vector_index import EmbeddingIndex
+
+TOPICS = {
+    "infection": "post-op wound infection risk erythema drainage fever antibiotic cefazolin culture",
+    "cardiac": "chest pain troponin ecg atrial fibrillation anticoagulation cardiology echo",
+    "diabetes": "glucose a1c insulin metformin neuropathy retinopathy diet",
+    "orthopedic": "fracture cast range of motion physical therapy knee replacement",
+    "respiratory": "cough dyspnea inhaler asthma copd spirometry oxygen saturation",
+    "renal": "creatinine gfr dialysis electrolytes potassium nephrology",
+}
+FILLER = "patient seen today reports follow up plan reviewed vitals stable discussed questions answered".split()
+# Long-tail vocabulary (drug names, findings, identifiers) that distinguishes one chart from another
+RARE_TERMS = [f"term{number}" for number in range(20000)]
+
+def time_queries(index, queries, k):
+    """Run queries and return (results, latencies in ms)"""
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(index.search(query, k))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, latencies
+
+def report(name, index, latencies, hits, k):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{name}: {len(index):,} chunks  p50 {statistics.median(latencies):7.1f} ms  "
+        f"p95 {p95:7.1f} ms  recall@{k} {hits / len(latencies):.3f}"
+    )
+
+def vector_benchmark(args, directory):
+    rng = np.random.default_rng(0)
+    index = EmbeddingIndex(directory)
+    documents = []
+    remaining = args.chunks
+    build_start = time.perf_counter()
+    while remaining:
+        count = min(args.chunks_per_document, remaining)
+        document_id = uuid.UUID(int=int(rng.integers(0, 2 ** 63)) << 64 | len(documents))
+        index.add(document_id, rng.standard_normal((count, args.dim), dtype=np.float32), replace=False)
+        documents.append((document_id, count))
+        remaining -= count
+    print(f"Built vector index in {time.perf_counter() - build_start:.1f} s")
+
+    vectors = np.memmap(f"{directory}/vectors.f32", dtype=np.float32, mode="r", shape=(args.chunks, args.dim))
+    starts = np.cumsum([0] + [count for _, count in documents])
+    queries, expected = [], []
+    for _ in range(args.queries):
+        document = int(rng.integers(0, len(documents)))
+        row = int(starts[document] + rng.integers(0, documents[document][1]))
+        noise = rng.standard_normal(args.dim, dtype=np.float32) * args.noise / np.sqrt(args.dim)
+        queries.append(normalize(vectors[row] + noise))
+        expected.append(documents[document][0])
+
+    results, latencies = time_queries(index, queries, args.k)
+    hits = sum(any(hit["document_id"] == target for hit in hits) for hits, target in zip(results, expected))
+    report("vectors", index, latencies, hits, args.k)
+
+def text_benchmark(args, directory):
+    rng = random.Random(0)
+    embedder = HashingEmbedder(args.dim)
+    index = EmbeddingIndex(directory)
+    notes = {}
+    for number in range(args.text_documents):
+        topic = rng.choice(list(TOPICS))
+        words = TOPICS[topic].split()
+        note = " ".join(
+            rng.choice(words) if roll < 0.3 else
+            rng.choice(FILLER) if roll < 0.7 else
+            RARE_TERMS[min(int(rng.paretovariate(1.0)) - 1, len(RARE_TERMS) - 1) * 7919 % len(RARE_TERMS)]
+            for roll in (rng.random() for _ in range(600))
+        )
+        document_id = uuid.UUID(int=number + 1)
+        notes[document_id] = note
+        index.add(document_id, embedder.embed(chunk_text(note, 1500, 200)), replace=False)
+
+    queries, expected = [], []
+    for document_id in rng.sample(list(notes), min(args.queries, len(notes))):
+        words = notes[document_id].split()
+        start = rng.randrange(0, len(words) - 40)
+        queries.append(embedder.embed([" ".join(words[start:start + 40])])[0])
+        expected.append(document_id)
+
+    results, latencies = time_queries(index, queries, args.k)
+    hits = sum(any(hit["document_id"] == target for hit in hits) for hits, target in zip(results, expected))
+    report("text   ", index, latencies, hits, args.k)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=1_000_000, help="Chunks in the vector corpus")
+    parser.add_argument("--chunks-per-document", type=int, default=50, help="Chunks per synthetic document")
+    parser.add_argument("--dim", type=int, default=256, help="Embedding dimension")
+    parser.add_argument("--noise", type=float, default=0.5, help="Query noise relative to a unit vector")
+    parser.add_argument("--text-documents", type=int, default=2000, help="Notes in the text corpus")
+    parser.add_argument("--queries", type=int, default=50, help="Queries per corpus")
+    parser.add_argument("--k", type=int, default=10, help="Documents per query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_benchmark(args, directory)
+    with tempfile.TemporaryDirectory() as directory:
+        text_benchmark(args, directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Compare document list serialization throughput and payload size
+
+Builds realistic document rows (long summaries, mixed statuses) and times
+the previous FastAPI response_model path against the orjson fast path in
+app.api.serialization, then reports raw, gzip and zstd payload sizes.
+
+Usage (from the backend directory):
+    python -m benchmarks.serialization --documents 500 --repeat 20
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.api.compression import compress, zstandard
+from app.api.schemas import DocumentResponse
+from app.api.serialization import dump_documents
+from app.models.document import STAGES
+
+WORDS = (
+    "patient presents with history of hypertension diabetes mellitus type two "
+    "post-operative follow-up wound healing infection risk antibiotic course "
+    "prescribed medication dosage twice daily blood pressure within normal range "
+    "recommend physical therapy referral imaging results unremarkable lab panel "
+    "elevated glucose consult cardiology schedule return visit in two weeks"
+).split()
+
+def make_documents(count, seed=0):
+    """Build fake document rows with realistic field sizes"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    documents = []
+    for index in range(count):
+        created = start + timedelta(minutes=index * 7)
+        summary = " ".join(rng.choice(WORDS) for _ in range(rng.randint(150, 400)))
+        status = rng.choice(("completed", "completed", "completed", "pending", "processing", "error"))
+        documents.append(SimpleNamespace(
+            id=uuid.UUID(int=rng.getrandbits(128)),
+            original_filename=f"chart_{index:06d}.pdf",
+            status=status,
+            stage=STAGES[-1] if status == "completed" else rng.choice((None,) + STAGES[:-1]),
+            created_at=created,
+            updated_at=created + timedelta(seconds=rng.randint(10, 600), microseconds=rng.randint(0, 999999)),
+            summary=summary,
+        ))
+    return documents
+
+def response_model_path(documents):
+    """What FastAPI did for response_model=List[DocumentResponse]"""
+    validated = [DocumentResponse.model_validate(document) for document in documents]
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+_list_adapter = TypeAdapter(List[DocumentResponse])
+
+def pydantic_path(documents):
+    """Pydantic's own JSON serializer over validated models"""
+    return _list_adapter.dump_json(_list_adapter.validate_python(documents, from_attributes=True))
+
+def measure(function, documents, repeat):
+    """Return the best documents/second over several runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(documents)
+        best = min(best, time.perf_counter() - start)
+    return len(documents) / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=500, help="Documents per list")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per path")
+    args = parser.parse_args()
+
+    documents = make_documents(args.documents)
+    paths = (
+        ("response_model", response_model_path),
+        ("pydantic", pydantic_path),
+        ("orjson", dump_documents),
+    )
+
+    # All paths must produce the same JSON
+    expected = json.loads(response_model_path(documents))
+    for name, function in paths:
+        assert json.loads(function(documents)) == expected, f"{name} output differs"
+
+    print(f"Serializing {args.documents} documents (best of {args.repeat})")
+    for name, function in paths:
+        print(f"  {name:<15} {measure(function, documents, args.repeat):>12,.0f} docs/s")
+
+    body = dump_documents(documents)
+    print(f"Payload size for {args.documents} documents")
+    print(f"  {'identity':<15} {len(body):>12,} bytes")
+    encodings = ("gzip", "zstd") if zstandard else ("gzip",)
+    for encoding in encodings:
+        start = time.perf_counter()
+        compressed = compress(body, encoding)
+        elapsed = (time.perf_counter() - start) * 1000
+        ratio = len(body) / len(compressed)
+        print(f"  {encoding:<15} {len(compressed):>12,} bytes  ({ratio:.1f}x, {elapsed:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
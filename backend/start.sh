@@ -13,6 +13,9 @@ echo "AZURE_STORAGE_ACCOUNT_NAME: ${AZURE_STORAGE_ACCOUNT_NAME}"
 echo "AZURE_STORAGE_CONTAINER_NAME: ${AZURE_STORAGE_CONTAINER_NAME}"
 echo "POLL_INTERVAL_SECONDS: ${POLL_INTERVAL_SECONDS}"
 
+# Create or update the database schema before starting the services
+python -m app.db.schema
+
 # Start the API server in the background
 uvicorn app.main:app --host 0.0.0.0 --port 8000 &
 API_PID=$!
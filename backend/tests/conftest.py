@@ -0,0 +1,89 @@
+"""Shared fixtures: a throwaway SQLite database in place of Postgres
+
+Run from the backend directory:
+    python -m pytest -q
+"""
+import os
+import socket
+import tempfile
+import threading
+import time
+
+# Point the app at a throwaway database before it creates its engine
+WORK_DIR = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{WORK_DIR}/documents.db"
+os.environ["EMBEDDING_INDEX_PATH"] = f"{WORK_DIR}/embedding_index"
+os.environ["PROFILE_OUTPUT_DIR"] = f"{WORK_DIR}/profiles"
+os.environ["EVENT_BROKER"] = "local"
+
+import pytest
+import uvicorn
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+
+@compiles(UUID, "sqlite")
+def compile_uuid_for_sqlite(type_, compiler, **kw):
+    # The models use the Postgres UUID type; SQLite stores it as text
+    return "CHAR(36)"
+
+from fastapi.testclient import TestClient
+
+from app.db.database import Base, SessionLocal, engine
+from app.db.schema import init_db
+from app.main import app
+from app.utils.azure_storage import get_azure_storage_client
+from app.utils.cache import document_cache
+from tests.fakes import FakeStorageClient
+
+@pytest.fixture
+def database():
+    """An empty, fully migrated database"""
+    Base.metadata.drop_all(bind=engine)
+    init_db()
+    document_cache.clear()
+    yield engine
+
+@pytest.fixture
+def db(database):
+    """A session on the empty database"""
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def storage():
+    """In-memory blob storage"""
+    return FakeStorageClient()
+
+@pytest.fixture
+def client(database, storage):
+    """An API client whose uploads go to the in-memory storage"""
+    app.dependency_overrides[get_azure_storage_client] = lambda: storage
+    try:
+        with TestClient(app) as test_client:
+            yield test_client
+    finally:
+        app.dependency_overrides.clear()
+
+@pytest.fixture
+def live_server(database):
+    """The API served by uvicorn on a free local port, for streamed responses
+
+    Yields the base URL.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+        app.dependency_overrides.clear()
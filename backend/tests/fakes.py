@@ -0,0 +1,214 @@
+"""In-memory stand-ins for the Azure and OpenAI services"""
+import io
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+
+from pypdf import PdfReader, PdfWriter
+
+from app.worker.partitions import PartitionCoordinator
+
+def make_pdf(page_count):
+    """Build a PDF whose page number is encoded in each page's width"""
+    writer = PdfWriter()
+    for number in range(1, page_count + 1):
+        writer.add_blank_page(width=100 + number, height=792)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+def pdf_page_numbers(content):
+    """Read back the page numbers make_pdf encoded"""
+    return [int(page.mediabox.width) - 100 for page in PdfReader(io.BytesIO(content)).pages]
+
+def expected_text(page_count):
+    """The text FakeDocumentIntelligenceClient extracts from make_pdf(page_count)"""
+    return "".join(
+        f"page {number} line {line}\n"
+        for number in range(1, page_count + 1)
+        for line in range(3)
+    )
+
+class FakePoller:
+    def __init__(self, result):
+        self._result = result
+
+    def result(self):
+        return self._result
+
+class FakeDocumentIntelligenceClient:
+    """Stands in for DocumentIntelligenceClient.begin_analyze_document
+
+    Takes a fixed time per page, varied randomly so requests finish out of
+    order, and can fail the first attempt at some requests. Pages are
+    numbered from 1 within each request, like the real service.
+    """
+
+    def __init__(self, seconds_per_page=0.0, failure_rate=0.0, seed=0):
+        self.seconds_per_page = seconds_per_page
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = []
+        self.failed = set()
+
+    def begin_analyze_document(self, model_id, body, pages=None):
+        assert pages is None, "parts should be split, not selected with pages="
+        numbers = pdf_page_numbers(body)
+        with self.lock:
+            self.calls.append(tuple(numbers))
+            # Fail each request at most once so retries always succeed
+            fail = tuple(numbers) not in self.failed and self.rng.random() < self.failure_rate
+            if fail:
+                self.failed.add(tuple(numbers))
+            jitter = self.rng.uniform(0.5, 1.5)
+
+        time.sleep(len(numbers) * self.seconds_per_page * jitter)
+        if fail:
+            raise RuntimeError(f"Transient failure analyzing pages {numbers[0]}-{numbers[-1]}")
+
+        result_pages = [
+            SimpleNamespace(
+                page_number=relative,
+                lines=[SimpleNamespace(content=f"page {number} line {line}") for line in range(3)],
+            )
+            for relative, number in enumerate(numbers, start=1)
+        ]
+        return FakePoller(SimpleNamespace(pages=result_pages))
+
+class FakeSummarizer:
+    """Summarizes instantly, or after a delay to stand in for a slow model"""
+
+    def __init__(self, seconds=0.0):
+        self.seconds = seconds
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def generate_summary(self, document_text, custom_prompt=None, raise_errors=False):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.seconds)
+        return f"summary of {document_text}"
+
+class FakeStorageClient:
+    """In-memory stand-in for AzureStorageClient"""
+
+    def __init__(self):
+        self.blobs = {}
+        self.lock = threading.Lock()
+        self.on_upload = None
+
+    def put(self, name, content, content_type="application/pdf"):
+        with self.lock:
+            etag = uuid.uuid4().hex
+            self.blobs[name] = {"content": content, "etag": etag, "content_type": content_type}
+        return etag
+
+    def upload_file(self, file_content, filename, content_type, metadata=None):
+        etag = self.put(filename, file_content, content_type)
+        if self.on_upload:
+            self.on_upload(filename)
+        return {"url": f"memory://{filename}", "etag": etag, "filename": filename, "content_type": content_type}
+
+    def download_blob(self, blob_name):
+        return self.blobs[blob_name]["content"]
+
+    def find_unprocessed_blobs(self, processed_etags=None, prefix=None, exclude_prefixes=()):
+        with self.lock:
+            blobs = list(self.blobs.items())
+        return [
+            {
+                "etag": blob["etag"],
+                "filename": name,
+                "content_type": blob["content_type"],
+                "size": len(blob["content"]),
+                "blob_url": f"memory://{name}",
+                "metadata": {},
+            }
+            for name, blob in blobs
+            if (prefix is None or name.startswith(prefix))
+            and not (exclude_prefixes and name.startswith(tuple(exclude_prefixes)))
+            and blob["etag"] not in (processed_etags or ())
+        ]
+
+    def mark_as_processed(self, etag):
+        pass
+
+class CountingDocumentIntelligence:
+    """Records every analysis, keyed by document content"""
+
+    def __init__(self, seconds=0.0):
+        self.seconds = seconds
+        self.calls = Counter()
+        self.lock = threading.Lock()
+
+    def analyze_document(self, document_content):
+        with self.lock:
+            self.calls[document_content] += 1
+        time.sleep(self.seconds)
+        return f"text of {document_content.decode()}"
+
+class ScanEverythingCoordinator(PartitionCoordinator):
+    """Every worker scans every partition, the worst case for duplicates"""
+
+    def acquire(self):
+        return list(self.partitions)
+
+class FakeStreamingClient:
+    """Stand-in for the OpenAI client with model-like latency"""
+
+    def __init__(self, tokens, first_token_seconds=0.0, token_seconds=0.0, error=None):
+        self.tokens = tokens
+        self.first_token_seconds = first_token_seconds
+        self.token_seconds = token_seconds
+        self.error = error
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, stream=False, **kwargs):
+        if stream:
+            return self.stream()
+        time.sleep(self.first_token_seconds + self.token_seconds * (len(self.tokens) - 1))
+        message = SimpleNamespace(content="".join(self.tokens))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def stream(self):
+        # Azure sends content filter results in a chunk without choices first
+        yield SimpleNamespace(choices=[])
+        time.sleep(self.first_token_seconds)
+        for number, token in enumerate(self.tokens):
+            if number:
+                time.sleep(self.token_seconds)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+        if self.error:
+            raise self.error
+
+class FlakyDocumentIntelligence:
+    """Fails the first analysis of the listed documents"""
+
+    def __init__(self, fail_once):
+        self.fail_once = set(fail_once)
+        self.analyses = Counter()
+        self.failures = Counter()
+
+    def analyze_document(self, document_content):
+        if document_content in self.fail_once and not self.failures[document_content]:
+            self.failures[document_content] += 1
+            raise RuntimeError("Document Intelligence timed out")
+        self.analyses[document_content] += 1
+        return f"text of {document_content.decode()}"
+
+class FlakySummarizer:
+    """Fails the first summaries of every document"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = Counter()
+
+    def generate_summary(self, document_text, custom_prompt=None, raise_errors=False):
+        self.calls[document_text] += 1
+        if self.calls[document_text] <= self.failures:
+            raise RuntimeError("OpenAI rate limit exceeded")
+        return f"summary of {document_text}"
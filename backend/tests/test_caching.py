@@ -0,0 +1,79 @@
+from datetime import timedelta
+from email.utils import format_datetime, parsedate_to_datetime
+
+from app.db.repositories import DocumentRepository
+from app.utils.cache import document_cache
+
+def create_document(db, name="scan.pdf", summary="First summary"):
+    repo = DocumentRepository(db)
+    document = repo.create_document(name, name, f"memory://{name}", "application/pdf")
+    return repo.update_document_text_and_summary(document.id, "text", summary)
+
+def test_responses_carry_validators(client, db):
+    document = create_document(db)
+
+    for url in ("/api/documents", f"/api/documents/{document.id}"):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers["etag"].startswith('W/"')
+        assert response.headers["cache-control"] == "private, no-cache"
+        assert parsedate_to_datetime(response.headers["last-modified"]).replace(tzinfo=None) == document.updated_at.replace(microsecond=0)
+
+def test_if_none_match_returns_not_modified(client, db):
+    document = create_document(db)
+    url = f"/api/documents/{document.id}"
+    etag = client.get(url).headers["etag"]
+
+    response = client.get(url, headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert response.headers["vary"] == "Accept-Encoding"
+    # Weak comparison: a strong tag with the same value matches too
+    assert client.get(url, headers={"If-None-Match": f'"other", {etag[2:]}'}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": "*"}).status_code == 304
+
+def test_if_modified_since_returns_not_modified(client, db):
+    create_document(db)
+    last_modified = client.get("/api/documents").headers["last-modified"]
+    earlier = format_datetime(parsedate_to_datetime(last_modified) - timedelta(seconds=1), usegmt=True)
+
+    assert client.get("/api/documents", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/api/documents", headers={"If-Modified-Since": earlier}).status_code == 200
+    assert client.get("/api/documents", headers={"If-Modified-Since": "not a date"}).status_code == 200
+
+def test_if_none_match_takes_precedence(client, db):
+    create_document(db)
+    last_modified = client.get("/api/documents").headers["last-modified"]
+
+    response = client.get("/api/documents", headers={"If-None-Match": 'W/"stale"', "If-Modified-Since": last_modified})
+
+    assert response.status_code == 200
+
+def test_repository_writes_invalidate_cached_reads(client, db):
+    document = create_document(db)
+    url = f"/api/documents/{document.id}"
+    assert client.get(url).json()["summary"] == "First summary"
+    assert client.get("/api/documents").json()[0]["summary"] == "First summary"
+
+    DocumentRepository(db).update_document_summary(document.id, "Second summary")
+
+    assert client.get(url).json()["summary"] == "Second summary"
+    assert client.get("/api/documents").json()[0]["summary"] == "Second summary"
+
+def test_cache_stats_count_hits_and_misses(client, db):
+    document = create_document(db)
+    url = f"/api/documents/{document.id}"
+    document_cache.clear()
+    before = client.get("/api/cache/stats").json()
+
+    client.get(url)
+    client.get(url)
+    client.get(url)
+    after = client.get("/api/cache/stats").json()
+
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 2
+    assert after["size"] == 1
+    assert 0.0 <= after["hit_rate"] <= 1.0
@@ -0,0 +1,135 @@
+import gzip
+import json
+
+import pytest
+import zstandard
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.api import compression
+from app.api.compression import CompressionMiddleware, negotiate_encoding
+
+LARGE = {"documents": [{"id": number, "summary": "patient history and follow-up plan"} for number in range(100)]}
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br, zstd", "zstd"),
+    ("gzip", "gzip"),
+    ("GZIP", "gzip"),
+    ("zstd;q=0.5, gzip;q=0.8", "gzip"),
+    ("zstd; q=0.9, gzip; q=0.8", "zstd"),
+    ("gzip;q=0, zstd;q=0", None),
+    ("*", "zstd"),
+    ("*;q=0.5, zstd;q=0", "gzip"),
+    ("identity;q=0", None),
+    ("gzip;q=0, identity;q=0", None),
+    ("gzip;q=not-a-number", None),
+    ("br, deflate", None),
+    ("", None),
+])
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header) == expected
+
+def test_negotiate_encoding_without_zstandard(monkeypatch):
+    monkeypatch.setattr(compression, "SUPPORTED_ENCODINGS", ("gzip",))
+
+    assert negotiate_encoding("zstd, gzip;q=0.5") == "gzip"
+    assert negotiate_encoding("zstd") is None
+    assert negotiate_encoding("*") == "gzip"
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/large")
+    def large():
+        return JSONResponse(LARGE)
+
+    @app.get("/small")
+    def small():
+        return JSONResponse({"status": "ok"})
+
+    @app.get("/text")
+    def text():
+        return PlainTextResponse("notes " * 500)
+
+    @app.get("/binary")
+    def binary():
+        return Response(b"\x89PNG" * 1000, media_type="image/png")
+
+    @app.get("/encoded")
+    def encoded():
+        return Response(gzip.compress(b"x" * 5000), media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((json.dumps(LARGE).encode() for _ in range(3)), media_type="application/x-ndjson")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter([b"data: " + b"x" * 2000 + b"\n\n"]), media_type="text/event-stream")
+
+    return TestClient(app)
+
+def get_raw(client, url, accept_encoding):
+    """Return the response and its body as sent, without decoding"""
+    with client.stream("GET", url, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+@pytest.mark.parametrize("encoding, decompress", [
+    ("gzip", gzip.decompress),
+    ("zstd", lambda body: zstandard.ZstdDecompressor().decompress(body)),
+])
+def test_large_json_is_compressed(encoding, decompress):
+    response, body = get_raw(make_client(), "/large", encoding)
+
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["content-length"] == str(len(body))
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert json.loads(decompress(body)) == LARGE
+
+def test_text_is_compressed():
+    response, body = get_raw(make_client(), "/text", "gzip")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(body) == ("notes " * 500).encode()
+
+def test_small_bodies_are_sent_as_is():
+    response, body = get_raw(make_client(), "/small", "gzip")
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert json.loads(body) == {"status": "ok"}
+
+def test_identity_client_gets_uncompressed_body_with_vary():
+    response, body = get_raw(make_client(), "/large", "identity")
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["content-length"] == str(len(body))
+    assert json.loads(body) == LARGE
+
+def test_binary_bodies_pass_through():
+    response, body = get_raw(make_client(), "/binary", "zstd, gzip")
+
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
+    assert body == b"\x89PNG" * 1000
+
+def test_already_encoded_bodies_are_not_compressed_again():
+    response, body = get_raw(make_client(), "/encoded", "zstd, gzip")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(body) == b"x" * 5000
+
+def test_streamed_responses_pass_through():
+    client = make_client()
+
+    response, body = get_raw(client, "/stream", "gzip")
+    assert "content-encoding" not in response.headers
+    assert body == json.dumps(LARGE).encode() * 3
+
+    response, body = get_raw(client, "/events", "gzip")
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
+    assert body == b"data: " + b"x" * 2000 + b"\n\n"
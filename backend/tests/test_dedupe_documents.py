@@ -0,0 +1,71 @@
+import json
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app.db.database import Base
+from app.db.dedupe_documents import remove_duplicate_documents
+from app.db.schema import init_db
+from app.models.document import Document
+from app.utils.vector_index import EmbeddingIndex
+
+@pytest.fixture
+def legacy(tmp_path):
+    """A database from before blob names were unique, with one upload registered twice"""
+    legacy = create_engine(f"sqlite:///{tmp_path}/legacy.db")
+    Base.metadata.create_all(bind=legacy)
+    with legacy.begin() as connection:
+        connection.execute(text("DROP INDEX ix_documents_filename"))
+    with Session(legacy) as db:
+        db.add_all([
+            Document(filename="scan.pdf", original_filename="scan.pdf", blob_url="memory://scan.pdf",
+                     content_type="application/pdf", status="pending"),
+            Document(filename="scan.pdf", original_filename="scan.pdf", blob_url="memory://scan.pdf",
+                     content_type="application/pdf", status="completed", summary="kept"),
+            Document(filename="other.pdf", original_filename="other.pdf", blob_url="memory://other.pdf",
+                     content_type="application/pdf", status="completed"),
+        ])
+        db.commit()
+    return legacy
+
+def documents(bind):
+    with Session(bind) as db:
+        return sorted((document.filename, document.status) for document in db.query(Document).all())
+
+def index_names(bind):
+    return {index["name"] for index in inspect(bind).get_indexes("documents")}
+
+def test_init_db_refuses_to_index_duplicates(legacy):
+    with pytest.raises(RuntimeError, match="app.db.dedupe_documents"):
+        init_db(bind=legacy)
+
+    assert len(documents(legacy)) == 3
+    assert "ix_documents_filename" not in index_names(legacy)
+
+def test_dry_run_removes_nothing(legacy, tmp_path):
+    archive = tmp_path / "archive.jsonl"
+
+    assert remove_duplicate_documents(str(archive), bind=legacy, dry_run=True) == 1
+
+    assert len(documents(legacy)) == 3
+    assert not archive.exists()
+
+def test_duplicates_are_archived_and_removed(legacy, tmp_path):
+    archive = tmp_path / "archive.jsonl"
+    index = EmbeddingIndex(str(tmp_path / "index"))
+    with Session(legacy) as db:
+        ids = {document.status: document.id for document in db.query(Document).filter(Document.filename == "scan.pdf")}
+    index.add(ids["pending"], np.ones((1, 4), dtype=np.float32))
+    index.add(ids["completed"], np.ones((1, 4), dtype=np.float32))
+
+    assert remove_duplicate_documents(str(archive), bind=legacy, index=index) == 1
+
+    assert documents(legacy) == [("other.pdf", "completed"), ("scan.pdf", "completed")]
+    archived = [json.loads(line) for line in archive.read_text().splitlines()]
+    assert [(row["id"], row["status"]) for row in archived] == [(str(ids["pending"]), "pending")]
+    assert index.document_ids() == {ids["completed"]}
+
+    init_db(bind=legacy)
+    assert "ix_documents_filename" in index_names(legacy)
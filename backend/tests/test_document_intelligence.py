@@ -0,0 +1,49 @@
+from tenacity import wait_none
+
+from app.utils.document_intelligence import DocumentIntelligenceService, split_pdf
+from tests.fakes import FakeDocumentIntelligenceClient, expected_text, make_pdf, pdf_page_numbers
+
+def make_service(client, pages_per_range=25, max_concurrency=4):
+    service = DocumentIntelligenceService(client=client)
+    service.pages_per_range = pages_per_range
+    service.max_concurrency = max_concurrency
+    service.range_attempts = 2
+    service.retry_wait = wait_none()
+    return service
+
+def test_split_pdf_keeps_only_each_parts_pages():
+    parts = split_pdf(make_pdf(60), 25)
+
+    assert [first for first, _ in parts] == [1, 26, 51]
+    assert [pdf_page_numbers(content) for _, content in parts] == [
+        list(range(1, 26)), list(range(26, 51)), list(range(51, 61))
+    ]
+
+def test_split_pdf_leaves_short_and_unparseable_documents_whole():
+    short = make_pdf(10)
+    assert split_pdf(short, 25) == [(1, short)]
+    assert split_pdf(b"not a pdf", 25) == [(1, b"not a pdf")]
+
+def test_parts_are_merged_in_page_order():
+    client = FakeDocumentIntelligenceClient(seconds_per_page=0.001, seed=3)
+    service = make_service(client, pages_per_range=10, max_concurrency=8)
+
+    assert service.analyze_document(make_pdf(95)) == expected_text(95)
+    # Each page is uploaded exactly once
+    assert sorted(page for call in client.calls for page in call) == list(range(1, 96))
+
+def test_failed_part_is_retried_on_its_own():
+    client = FakeDocumentIntelligenceClient(failure_rate=0.5, seed=1)
+    service = make_service(client, pages_per_range=10)
+
+    assert service.analyze_document(make_pdf(40)) == expected_text(40)
+    assert client.failed, "no request failed; pick another seed"
+    assert len(client.calls) == 4 + len(client.failed)
+    assert all(client.calls.count(part) == 2 for part in client.failed)
+
+def test_short_document_is_sent_as_is():
+    client = FakeDocumentIntelligenceClient()
+    service = make_service(client)
+
+    assert service.analyze_document(make_pdf(5)) == expected_text(5)
+    assert client.calls == [(1, 2, 3, 4, 5)]
@@ -0,0 +1,104 @@
+import uuid
+
+import numpy as np
+import pytest
+
+from app.utils.embeddings import HashingEmbedder, chunk_text
+from app.utils.vector_index import EmbeddingIndex
+
+TEXT = " ".join(f"word{number}" for number in range(2000))
+
+def test_chunk_text_short_and_empty():
+    assert chunk_text(None) == []
+    assert chunk_text("   ") == []
+    assert chunk_text("  a short note  ", chunk_size=100, overlap=10) == ["a short note"]
+
+def test_chunk_text_breaks_at_whitespace_with_overlap():
+    chunks = chunk_text(TEXT, chunk_size=500, overlap=100)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 500 for chunk in chunks)
+    words = set(TEXT.split())
+    # Chunks end at a word boundary, and every word lands whole in some chunk
+    assert all(chunk.split()[-1] in words for chunk in chunks)
+    assert words <= {word for chunk in chunks for word in chunk.split()}
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk[:50] in previous, "consecutive chunks don't overlap"
+    assert chunk_text(TEXT, chunk_size=500, overlap=100) == chunks
+
+def test_chunk_text_splits_text_without_whitespace():
+    chunks = chunk_text("x" * 1050, chunk_size=500, overlap=100)
+
+    assert [len(chunk) for chunk in chunks] == [500, 500, 250]
+
+def unit(dim, *hot):
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[list(hot)] = 1.0
+    return vector
+
+def test_search_ranks_documents_by_best_chunk(tmp_path):
+    index = EmbeddingIndex(str(tmp_path))
+    first, second = uuid.uuid4(), uuid.uuid4()
+    index.add(first, np.stack([unit(8, 0), unit(8, 1)]))
+    index.add(second, np.stack([unit(8, 2), unit(8, 0, 1)]))
+
+    hits = index.search(unit(8, 1), k=10)
+
+    assert [(hit["document_id"], hit["chunk"]) for hit in hits] == [(first, 1), (second, 1)]
+    assert hits[0]["score"] == pytest.approx(1.0)
+    assert hits[1]["score"] == pytest.approx(np.sqrt(0.5))
+    assert len(index) == 4
+    assert index.document_ids() == {first, second}
+
+def test_each_document_is_returned_once(tmp_path):
+    index = EmbeddingIndex(str(tmp_path))
+    documents = [uuid.uuid4() for _ in range(5)]
+    for document_id in documents:
+        index.add(document_id, np.stack([unit(8, 0)] * 4))
+
+    hits = index.search(unit(8, 0), k=3)
+
+    assert len(hits) == 3
+    assert len({hit["document_id"] for hit in hits}) == 3
+
+def test_reindexing_replaces_earlier_rows(tmp_path):
+    index = EmbeddingIndex(str(tmp_path))
+    document_id = uuid.uuid4()
+    index.add(document_id, np.stack([unit(8, 0), unit(8, 1)]))
+
+    index.add(document_id, np.stack([unit(8, 2)]))
+
+    # Only the new row is left, and it doesn't match the old content
+    hits = index.search(unit(8, 0))
+    assert [(hit["document_id"], hit["chunk"], hit["score"]) for hit in hits] == [(document_id, 0, 0.0)]
+    assert index.search(unit(8, 2))[0]["score"] == pytest.approx(1.0)
+    assert index.document_ids() == {document_id}
+
+def test_deleted_documents_are_not_found(tmp_path):
+    index = EmbeddingIndex(str(tmp_path))
+    kept, deleted = uuid.uuid4(), uuid.uuid4()
+    index.add(kept, np.stack([unit(8, 0)]))
+    index.add(deleted, np.stack([unit(8, 0), unit(8, 1)]))
+
+    assert index.delete_document(deleted) == 2
+
+    assert [hit["document_id"] for hit in index.search(unit(8, 0))] == [kept]
+    assert index.document_ids() == {kept}
+
+def test_other_processes_see_appended_rows(tmp_path):
+    reader = EmbeddingIndex(str(tmp_path))
+    assert reader.search(unit(8, 0)) == []
+    document_id = uuid.uuid4()
+
+    EmbeddingIndex(str(tmp_path)).add(document_id, np.stack([unit(8, 0)]))
+
+    assert [hit["document_id"] for hit in reader.search(unit(8, 0))] == [document_id]
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    index = EmbeddingIndex(str(tmp_path))
+    index.add(uuid.uuid4(), HashingEmbedder(dim=16).embed(["some text"]))
+
+    with pytest.raises(ValueError):
+        index.add(uuid.uuid4(), HashingEmbedder(dim=32).embed(["some text"]))
+    with pytest.raises(ValueError):
+        index.search(np.ones(32))
@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.db.repositories import DocumentRepository
+from app.models.document import Document
+from app.utils.events import LocalEventBroker, get_event_broker
+
+def create_document(db, name="scan.pdf"):
+    repo = DocumentRepository(db)
+    return repo.create_document(name, name, f"memory://{name}", "application/pdf")
+
+def test_local_broker_fans_out_to_subscribers_and_listeners():
+    broker = LocalEventBroker()
+    heard = []
+    broker.add_listener(heard.append)
+
+    async def fan_out():
+        with broker.subscribe() as everything, broker.subscribe("doc-1") as one:
+            broker.dispatch({"id": "doc-1", "status": "processing"})
+            broker.dispatch({"id": "doc-2", "status": "completed"})
+            received = (
+                [await everything.get(timeout=1), await everything.get(timeout=1)],
+                [await one.get(timeout=1), await one.get(timeout=0.1)],
+            )
+        # Closed subscriptions stop receiving
+        broker.dispatch({"id": "doc-1", "status": "error"})
+        return received, everything.queue.qsize()
+
+    (everything, one), left_over = asyncio.run(fan_out())
+
+    assert [event["id"] for event in everything] == ["doc-1", "doc-2"]
+    assert one == [{"id": "doc-1", "status": "processing"}, None]
+    assert [event["status"] for event in heard] == ["processing", "completed", "error"]
+    assert left_over == 0
+
+def test_broker_events_invalidate_cached_reads(client, db):
+    document = create_document(db)
+    url = f"/api/documents/{document.id}"
+    assert client.get(url).json()["status"] == "pending"
+
+    # A write from another process: the row changes without this process's repository
+    db.query(Document).update({Document.status: "completed"}, synchronize_session=False)
+    db.commit()
+    assert client.get(url).json()["status"] == "pending"
+
+    get_event_broker().dispatch({"id": str(document.id), "status": "completed"})
+
+    assert client.get(url).json()["status"] == "completed"
+
+class EventReader:
+    """Reads a server-sent event stream on a thread, recording (seconds, line) pairs"""
+
+    def __init__(self, url):
+        self.lines = []
+        self.connected = threading.Event()
+        self.status_code = None
+        self.stopped = threading.Event()
+        self.start = time.perf_counter()
+        self.thread = threading.Thread(target=self.read, args=(url,), daemon=True)
+        self.thread.start()
+
+    def read(self, url):
+        try:
+            with httpx.Client(timeout=10) as client, client.stream("GET", url) as response:
+                self.status_code = response.status_code
+                self.connected.set()
+                for line in response.iter_lines():
+                    self.lines.append((time.perf_counter() - self.start, line))
+                    if self.stopped.is_set():
+                        return
+        except httpx.HTTPError:
+            pass
+
+    def close(self):
+        """Disconnect at the next line, so the server isn't left holding the stream"""
+        self.stopped.set()
+        self.thread.join(5)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def wait_for(self, text, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            for seconds, line in self.lines:
+                if text in line:
+                    return seconds
+            time.sleep(0.02)
+        raise AssertionError(f"{text!r} not received; got {[line for _, line in self.lines]}")
+
+@pytest.fixture
+def heartbeat(monkeypatch):
+    """Shorten the keep-alive interval so closed streams are noticed quickly"""
+    monkeypatch.setattr(settings, "sse_heartbeat_seconds", 0.2)
+    return 0.2
+
+def test_collection_stream_connects_at_once_and_relays_changes(live_server, db, monkeypatch):
+    # Long enough that waiting for the first keep-alive would show
+    monkeypatch.setattr(settings, "sse_heartbeat_seconds", 2)
+    document = create_document(db)
+    with EventReader(f"{live_server}/api/documents/events") as reader:
+        assert reader.connected.wait(2), "no response headers before the first event"
+        assert reader.status_code == 200
+        assert reader.wait_for(": connected") < 1
+
+        DocumentRepository(db).update_document_status(document.id, "processing")
+
+        reader.wait_for(f'"id": "{document.id}", "status": "processing"')
+
+def test_document_stream_sends_current_status_first(live_server, db, heartbeat):
+    document = create_document(db)
+    other = create_document(db, "other.pdf")
+    with EventReader(f"{live_server}/api/documents/{document.id}/events") as reader:
+        reader.wait_for('"status": "pending"')
+
+        DocumentRepository(db).update_document_status(other.id, "processing")
+        DocumentRepository(db).update_document_status(document.id, "completed")
+
+        reader.wait_for('"status": "completed"')
+    assert not any(str(other.id) in line for _, line in reader.lines)
+
+def test_idle_stream_sends_keep_alives(live_server, heartbeat):
+    with EventReader(f"{live_server}/api/documents/events") as reader:
+        reader.wait_for(": keep-alive", timeout=2)
+
+def test_missing_document_stream_is_not_found(client):
+    response = client.get("/api/documents/00000000-0000-0000-0000-000000000000/events")
+
+    assert response.status_code == 404
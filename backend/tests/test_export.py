@@ -0,0 +1,93 @@
+import gzip
+import json
+import tracemalloc
+import uuid
+
+import httpx
+import pytest
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.models.document import Document
+
+HEADERS = {"X-Admin-Token": "export-check"}
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setattr(settings, "admin_api_token", "export-check")
+
+def add_documents(engine, count):
+    rows = []
+    for number in range(count):
+        filename = f"{uuid.uuid4()}_export-{number}.pdf"
+        rows.append({
+            "id": uuid.uuid4(),
+            "filename": filename,
+            "original_filename": f"export-{number}.pdf",
+            "blob_url": f"memory://{filename}",
+            "content_type": "application/pdf",
+            "status": "completed" if number % 10 else "error",
+            "summary": f"Summary {number}: " + "patient history and follow-up plan " * 10,
+        })
+    with engine.begin() as connection:
+        connection.execute(insert(Document), rows)
+
+def export(client, url):
+    """Return the number of exported lines and the peak traced bytes"""
+    tracemalloc.reset_peak()
+    lines = 0
+    with client.stream("GET", url, headers={**HEADERS, "Accept-Encoding": "identity"}) as response:
+        assert response.status_code == 200, response.read()
+        for line in response.iter_lines():
+            if line:
+                lines += 1
+    return lines, tracemalloc.get_traced_memory()[1]
+
+def test_export_memory_stays_flat_as_the_result_grows(live_server, database, monkeypatch):
+    monkeypatch.setattr(settings, "export_batch_size", 500)
+    url = f"{live_server}/api/admin/documents/export"
+    tracemalloc.start()
+    try:
+        with httpx.Client(timeout=120) as client:
+            add_documents(database, 2000)
+            small_lines, small_peak = export(client, url)
+            add_documents(database, 6000)
+            large_lines, large_peak = export(client, url)
+    finally:
+        tracemalloc.stop()
+
+    assert (small_lines, large_lines) == (2000, 8000)
+    assert large_peak < small_peak * 1.5, "export memory grows with the number of documents"
+
+def test_export_applies_filters_and_fields(client, database):
+    add_documents(database, 100)
+
+    response = client.get(
+        "/api/admin/documents/export",
+        params={"status": "error", "fields": "id,status"},
+        headers=HEADERS
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 10
+    assert all(row == {"id": row["id"], "status": "error"} for row in rows)
+
+def test_gzip_export_matches_plain_export(client, database):
+    add_documents(database, 100)
+    url = "/api/admin/documents/export"
+
+    plain = client.get(url, headers={**HEADERS, "Accept-Encoding": "identity"})
+    with client.stream("GET", url, headers={**HEADERS, "Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        compressed = b"".join(response.iter_raw())
+
+    assert gzip.decompress(compressed) == plain.content
+    assert len(plain.text.splitlines()) == 100
+
+def test_export_rejects_unknown_fields_and_missing_token(client):
+    url = "/api/admin/documents/export"
+
+    assert client.get(url, params={"fields": "id,password"}, headers=HEADERS).status_code == 400
+    assert client.get(url).status_code == 401
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import uuid
+from collections import Counter
+
+from app.models.document import Document
+from app.utils.embeddings import HashingEmbedder
+from app.utils.vector_index import EmbeddingIndex
+from app.worker.main import DocumentProcessingWorker
+from tests.fakes import CountingDocumentIntelligence, FakeSummarizer, ScanEverythingCoordinator
+
+def make_worker(storage, document_intelligence, index_path):
+    worker = DocumentProcessingWorker(
+        storage_client=storage,
+        document_intelligence=document_intelligence,
+        summarizer=FakeSummarizer(),
+        embedder=HashingEmbedder(),
+        embedding_index=EmbeddingIndex(index_path),
+    )
+    worker._coordinator = ScanEverythingCoordinator(worker.worker_id)
+    return worker
+
+async def poll_rounds(worker, rounds):
+    await worker.load_processed_documents()
+    for _ in range(rounds):
+        await worker.poll_blobs_once()
+        await worker.poll_pending_once()
+
+def run_workers(workers, rounds):
+    threads = [
+        threading.Thread(target=lambda worker=worker: asyncio.run(poll_rounds(worker, rounds)))
+        for worker in workers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def upload(client, filename, content):
+    response = client.post("/api/documents", files={"file": (filename, content, "application/pdf")})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_every_blob_is_registered_and_analyzed_once(client, storage, db, tmp_path):
+    document_intelligence = CountingDocumentIntelligence()
+    workers = [make_worker(storage, document_intelligence, str(tmp_path / "index")) for _ in range(3)]
+
+    for number in range(10):
+        upload(client, f"upload-{number}.pdf", f"api upload {number}".encode())
+    for number in range(10):
+        storage.put(f"{uuid.uuid4()}_direct-{number}.pdf", f"direct blob {number}".encode())
+
+    run_workers(workers, rounds=3)
+
+    documents = db.query(Document).all()
+    assert sorted(document.filename for document in documents) == sorted(storage.blobs)
+    assert set(document_intelligence.calls) == {blob["content"] for blob in storage.blobs.values()}
+    assert set(document_intelligence.calls.values()) == {1}, "a blob was analyzed more than once"
+    assert Counter(document.status for document in documents) == {"completed": len(storage.blobs)}
+
+def test_upload_keeps_its_filename_when_the_poller_registers_it_first(client, storage, db, tmp_path):
+    document_intelligence = CountingDocumentIntelligence()
+    worker = make_worker(storage, document_intelligence, str(tmp_path / "index"))
+    # The blob poller finds the blob before the API inserts its row
+    storage.on_upload = lambda filename: run_workers([worker], 1)
+
+    uploaded = upload(client, "raced.pdf", b"raced upload")
+
+    documents = db.query(Document).all()
+    assert [document.filename for document in documents] == list(storage.blobs)
+    assert (documents[0].id.hex, documents[0].original_filename) == (uuid.UUID(uploaded["id"]).hex, "raced.pdf")
+    assert uploaded["original_filename"] == "raced.pdf"
+    assert document_intelligence.calls == {b"raced upload": 1}
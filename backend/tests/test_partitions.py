@@ -0,0 +1,55 @@
+import time
+
+from sqlalchemy import func
+
+from app.db.expressions import seconds_from_now
+from app.models.worker_heartbeat import WorkerHeartbeat
+from app.worker.partitions import CATCHALL_PARTITION, PartitionCoordinator
+
+def test_partitions_are_split_between_live_workers(database):
+    first = PartitionCoordinator("worker-a", prefixes="0123456789abcdef", heartbeat_ttl=60)
+    second = PartitionCoordinator("worker-b", prefixes="0123456789abcdef", heartbeat_ttl=60)
+    first.heartbeat()
+    second.heartbeat()
+
+    owned_first, owned_second = first.acquire(), second.acquire()
+
+    assert owned_first and owned_second
+    assert not set(owned_first) & set(owned_second)
+    assert sorted(owned_first + owned_second) == sorted(list("0123456789abcdef") + [CATCHALL_PARTITION])
+
+def test_busy_worker_keeps_heartbeating(database):
+    busy = PartitionCoordinator("busy-worker", heartbeat_ttl=1)
+    other = PartitionCoordinator("other-worker", heartbeat_ttl=1)
+    busy.start_heartbeat(interval=0.2)
+    try:
+        # The busy worker doesn't poll for longer than the TTL
+        time.sleep(1.5)
+        assert "busy-worker" in other.live_workers()
+    finally:
+        busy.close()
+
+    assert "busy-worker" not in other.live_workers()
+    assert busy._heartbeat_thread is None
+
+def test_liveness_uses_the_database_clock(db):
+    coordinator = PartitionCoordinator("worker-a", heartbeat_ttl=60)
+    coordinator.heartbeat()
+    # A peer whose last heartbeat is past the TTL by the database's clock
+    db.add(WorkerHeartbeat(worker_id="worker-dead", started_at=func.now(), last_seen=seconds_from_now(-120)))
+    db.add(WorkerHeartbeat(worker_id="worker-b", started_at=func.now(), last_seen=seconds_from_now(-30)))
+    db.commit()
+
+    assert coordinator.live_workers() == ["worker-a", "worker-b"]
+    row = db.get(WorkerHeartbeat, "worker-a")
+    database_now = db.query(seconds_from_now(0)).scalar()
+    assert abs((database_now - row.last_seen).total_seconds()) <= 1
+
+    # Long-dead peers are forgotten on the next heartbeat
+    db.query(WorkerHeartbeat).filter(WorkerHeartbeat.worker_id == "worker-dead").update(
+        {WorkerHeartbeat.last_seen: seconds_from_now(-6000)}, synchronize_session=False
+    )
+    db.commit()
+    coordinator.heartbeat()
+    db.expire_all()
+    assert db.get(WorkerHeartbeat, "worker-dead") is None
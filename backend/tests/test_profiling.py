@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import httpx
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.api.profiling import SlowRequestMiddleware
+from app.core.config import settings
+from app.utils.profiling import slow_operations
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(SlowRequestMiddleware, threshold_ms=100)
+
+    async def idle_then(chunk, seconds=0.4):
+        await asyncio.sleep(seconds)
+        yield chunk
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(idle_then(": keep-alive\n\n"), media_type="text/event-stream")
+
+    @app.get("/slow")
+    def slow():
+        return StreamingResponse(idle_then(b"{}"), media_type="application/json")
+
+    return TestClient(app)
+
+@pytest.fixture
+def recent():
+    slow_operations.recent.clear()
+    return slow_operations.recent
+
+def test_idle_event_stream_is_not_a_slow_request(recent):
+    response = make_client().get("/events")
+
+    assert response.status_code == 200
+    assert not recent
+
+def test_slow_first_byte_is_recorded(recent):
+    make_client().get("/slow")
+
+    assert [operation["name"] for operation in recent] == ["GET /slow"]
+
+def test_idle_document_events_connection_is_not_profiled(live_server, recent, monkeypatch):
+    monkeypatch.setattr(settings, "sse_heartbeat_seconds", 0.5)
+    idle_for = settings.slow_request_threshold_ms / 1000 + 0.5
+
+    with httpx.Client(timeout=10) as client, client.stream("GET", f"{live_server}/api/documents/events") as response:
+        started = time.monotonic()
+        for line in response.iter_lines():
+            if time.monotonic() - started > idle_for:
+                break
+
+    assert not [operation for operation in recent if "/api/documents/events" in operation["name"]]
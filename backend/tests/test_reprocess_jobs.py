@@ -0,0 +1,156 @@
+import threading
+import time
+
+from app.db.database import SessionLocal
+from app.db.expressions import seconds_from_now
+from app.db.repositories import DocumentRepository, ReprocessJobRepository
+from app.models.reprocess_job import ReprocessJob
+from app.utils.embeddings import HashingEmbedder
+from app.utils.vector_index import EmbeddingIndex
+from app.worker.main import DocumentProcessingWorker
+from app.worker.reprocess import ReprocessRunner
+from tests.fakes import CountingDocumentIntelligence, FakeSummarizer
+
+def create_documents(db, count):
+    repo = DocumentRepository(db)
+    for number in range(count):
+        document = repo.create_document(f"doc-{number}.pdf", f"doc-{number}.pdf", "memory://", "application/pdf")
+        repo.update_document_text_and_summary(document.id, f"text {number}", "old summary")
+
+def make_runner(summarizer, batch_size=2, heartbeat_interval=0.2):
+    worker = DocumentProcessingWorker(summarizer=summarizer)
+    return ReprocessRunner(worker, batch_size=batch_size, heartbeat_interval=heartbeat_interval)
+
+def load_job(job_id):
+    db = SessionLocal()
+    try:
+        return ReprocessJobRepository(db).get_job(job_id)
+    finally:
+        db.close()
+
+def test_stale_runner_cannot_record_progress(db):
+    create_documents(db, 2)
+    jobs = ReprocessJobRepository(db)
+    job = jobs.create_job({"statuses": ["completed"]}, status="running", worker_id="worker-a")
+    db.query(ReprocessJob).update({ReprocessJob.heartbeat_at: seconds_from_now(-3600)}, synchronize_session=False)
+    db.commit()
+
+    assert jobs.requeue_stale_jobs(timeout_seconds=1800) == 1
+    assert jobs.claim_job(job.id, "worker-b")
+
+    assert not jobs.heartbeat_job(job.id, "worker-a")
+    assert not jobs.record_batch(job.id, "worker-a", None, 2, 0)
+    jobs.finish_job(job.id, "worker-a", "error", "stale runner")
+    db.expire_all()
+    job = jobs.get_job(job.id)
+    assert (job.status, job.worker_id, job.succeeded) == ("running", "worker-b", 0)
+
+    assert jobs.record_batch(job.id, "worker-b", None, 2, 0)
+    jobs.finish_job(job.id, "worker-b", "completed")
+    db.expire_all()
+    assert (jobs.get_job(job.id).status, jobs.get_job(job.id).succeeded) == ("completed", 2)
+
+def test_long_batch_keeps_job_alive(db):
+    create_documents(db, 4)
+    jobs = ReprocessJobRepository(db)
+    job = jobs.create_job({"statuses": ["completed"]}, concurrency=1, status="running", worker_id="worker-a")
+    # Each batch takes longer than the stale timeout
+    runner = make_runner(FakeSummarizer(seconds=1.5), batch_size=2)
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(status=runner.run(job.id, "worker-a")))
+    thread.start()
+
+    requeued = 0
+    while thread.is_alive():
+        time.sleep(0.5)
+        requeued += ReprocessJobRepository(db).requeue_stale_jobs(timeout_seconds=2)
+    thread.join()
+
+    assert requeued == 0
+    assert result["status"] == "completed"
+    job = load_job(job.id)
+    assert (job.status, job.succeeded, job.failed) == ("completed", 4, 0)
+
+def test_runner_stops_when_job_is_taken_over(db):
+    create_documents(db, 6)
+    jobs = ReprocessJobRepository(db)
+    job = jobs.create_job({"statuses": ["completed"]}, concurrency=1, status="running", worker_id="worker-a")
+    summarizer = FakeSummarizer(seconds=0.3)
+    runner = make_runner(summarizer, batch_size=2)
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(status=runner.run(job.id, "worker-a")))
+    thread.start()
+
+    # Another worker takes the job over during the first batch
+    time.sleep(0.2)
+    db.query(ReprocessJob).filter(ReprocessJob.id == job.id).update(
+        {ReprocessJob.worker_id: "worker-b"}, synchronize_session=False
+    )
+    db.commit()
+    thread.join()
+
+    assert result["status"] == "running"
+    assert summarizer.calls == 2, "the runner started another batch after losing the job"
+    job = load_job(job.id)
+    assert (job.status, job.worker_id, job.succeeded, job.checkpoint_id) == ("running", "worker-b", 0, None)
+
+class CountingSessions:
+    """Session factory that tracks how many sessions are open"""
+
+    def __init__(self):
+        self.open = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        session = SessionLocal()
+        close = session.close
+
+        def tracked_close():
+            with self.lock:
+                self.open -= 1
+            close()
+
+        session.close = tracked_close
+        with self.lock:
+            self.open += 1
+        return session
+
+class SessionCheckingSummarizer(FakeSummarizer):
+    """Records the number of open sessions while summarizing"""
+
+    def __init__(self, sessions):
+        super().__init__()
+        self.sessions = sessions
+        self.open_during_call = []
+
+    def generate_summary(self, document_text, custom_prompt=None, raise_errors=False):
+        self.open_during_call.append(self.sessions.open)
+        return super().generate_summary(document_text, custom_prompt, raise_errors)
+
+def test_no_session_is_held_during_service_calls(db, storage, tmp_path):
+    repo = DocumentRepository(db)
+    storage.put("scan.pdf", b"scanned document")
+    document = repo.create_document("scan.pdf", "scan.pdf", "memory://scan.pdf", "application/pdf")
+    repo.update_document_text_and_summary(document.id, "old text", "old summary")
+    sessions = CountingSessions()
+    summarizer = SessionCheckingSummarizer(sessions)
+    document_intelligence = CountingDocumentIntelligence()
+    worker = DocumentProcessingWorker(
+        storage_client=storage,
+        document_intelligence=document_intelligence,
+        summarizer=summarizer,
+        embedder=HashingEmbedder(),
+        embedding_index=EmbeddingIndex(str(tmp_path / "index")),
+    )
+    runner = ReprocessRunner(worker, session_factory=sessions)
+
+    assert runner.reprocess_document(document.id, re_extract=True) is None
+    assert runner.reprocess_document(document.id) is None
+
+    assert summarizer.open_during_call == [0, 0]
+    assert sessions.open == 0
+    db.expire_all()
+    document = repo.get_document_by_id(document.id)
+    assert (document.extracted_text, document.summary) == (
+        "text of scanned document", "summary of text of scanned document"
+    )
@@ -0,0 +1,188 @@
+import asyncio
+import threading
+import time
+
+from sqlalchemy import create_engine, inspect, text
+
+from app.core.config import settings
+from app.db.expressions import seconds_from_now
+from app.db.database import SessionLocal
+from app.db.repositories import DocumentRepository
+from app.db.schema import init_db
+from app.models.document import Document
+from app.worker.main import DocumentProcessingWorker
+from tests.fakes import CountingDocumentIntelligence, FakeStorageClient, FakeSummarizer
+
+def create_document(repo, name="scan.pdf"):
+    return repo.create_document(name, name, f"memory://{name}", "application/pdf")
+
+def fail(worker, repo, document_id, message="Document Intelligence timed out"):
+    assert repo.claim_document(document_id, worker.worker_id), "document was not claimable"
+    worker.record_failure(repo, document_id, RuntimeError(message))
+    return repo.get_document_by_id(document_id)
+
+def pending_ids(repo):
+    return {document.id for document in repo.get_pending_documents()}
+
+def test_failure_schedules_retry_after_backoff(db):
+    repo = DocumentRepository(db)
+    document = create_document(repo)
+
+    document = fail(DocumentProcessingWorker(), repo, document.id)
+
+    assert document.status == "pending"
+    assert document.attempts == 1
+    assert document.last_error == "Document Intelligence timed out"
+    assert document.processing_started_at is None
+    assert document.next_attempt_at > db.query(seconds_from_now(0)).scalar()
+    assert document.id not in pending_ids(repo), "retry ran before its backoff elapsed"
+
+    repo.schedule_document_retry(document.id, "due now", 0)
+    assert document.id in pending_ids(repo)
+
+def test_failure_on_last_attempt_dead_letters(db, monkeypatch):
+    monkeypatch.setattr(settings, "max_processing_attempts", 2)
+    repo = DocumentRepository(db)
+    worker = DocumentProcessingWorker()
+    document = create_document(repo)
+
+    fail(worker, repo, document.id)
+    repo.schedule_document_retry(document.id, "due now", 0)
+    document = fail(worker, repo, document.id, "still failing")
+
+    assert document.status == "error"
+    assert document.attempts == 2
+    assert document.last_error == "still failing"
+    assert document.next_attempt_at is None
+    assert not pending_ids(repo)
+    assert repo.claim_document(document.id) is None
+
+def test_requeue_stale_documents(db):
+    repo = DocumentRepository(db)
+    stale = create_document(repo, "stale.pdf")
+    exhausted = create_document(repo, "exhausted.pdf")
+    running = create_document(repo, "running.pdf")
+    for document in (stale, exhausted, running):
+        repo.claim_document(document.id)
+    db.query(Document).filter(Document.id.in_([stale.id, exhausted.id])).update(
+        {Document.processing_started_at: seconds_from_now(-3600), Document.heartbeat_at: seconds_from_now(-3600)},
+        synchronize_session=False
+    )
+    db.query(Document).filter(Document.id == exhausted.id).update({Document.attempts: 5}, synchronize_session=False)
+    db.commit()
+
+    assert repo.requeue_stale_documents(timeout_seconds=1800, max_attempts=5) == 2
+
+    db.expire_all()
+    assert repo.get_document_by_id(stale.id).status == "pending"
+    assert repo.get_document_by_id(stale.id).last_error == "Processing timed out"
+    assert repo.get_document_by_id(exhausted.id).status == "error"
+    assert repo.get_document_by_id(running.id).status == "processing"
+    assert pending_ids(repo) == {stale.id}
+
+def make_worker(storage, summarizer, tmp_path):
+    from app.utils.embeddings import HashingEmbedder
+    from app.utils.vector_index import EmbeddingIndex
+
+    worker = DocumentProcessingWorker(
+        storage_client=storage,
+        document_intelligence=CountingDocumentIntelligence(),
+        summarizer=summarizer,
+        embedder=HashingEmbedder(),
+        embedding_index=EmbeddingIndex(str(tmp_path / "index")),
+    )
+    worker.heartbeat_interval = 0.2
+    return worker
+
+def process_in_thread(worker, document_id):
+    def run():
+        db = SessionLocal()
+        try:
+            document = DocumentRepository(db).get_document_by_id(document_id)
+            asyncio.run(worker.process_document(document, db))
+        finally:
+            db.close()
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+def test_stale_worker_cannot_record_results(db):
+    repo = DocumentRepository(db)
+    document = create_document(repo)
+    assert repo.claim_document(document.id, "worker-a")
+    db.query(Document).update({Document.heartbeat_at: seconds_from_now(-3600)}, synchronize_session=False)
+    db.commit()
+
+    assert repo.requeue_stale_documents(timeout_seconds=1800, max_attempts=5) == 1
+    assert repo.claim_document(document.id, "worker-b")
+
+    assert not repo.heartbeat_document(document.id, "worker-a")
+    assert repo.record_document_stage(document.id, "extracted", "stale text", worker_id="worker-a") is None
+    assert repo.update_document_text_and_summary(document.id, "stale text", "stale", worker_id="worker-a") is None
+    assert repo.schedule_document_retry(document.id, "stale failure", 0, worker_id="worker-a") is None
+    db.expire_all()
+    document = repo.get_document_by_id(document.id)
+    assert (document.status, document.worker_id, document.summary, document.stage) == ("processing", "worker-b", None, None)
+
+    assert repo.update_document_text_and_summary(document.id, "text", "summary", worker_id="worker-b")
+    assert (document.status, document.summary, document.worker_id) == ("completed", "summary", None)
+
+def test_long_document_keeps_its_claim(db, storage, tmp_path):
+    repo = DocumentRepository(db)
+    storage.put("slow.pdf", b"slow document")
+    document = create_document(repo, "slow.pdf")
+    # Summarizing takes longer than the stale timeout
+    worker = make_worker(storage, FakeSummarizer(seconds=2.5), tmp_path)
+    thread = process_in_thread(worker, document.id)
+
+    requeued = 0
+    while thread.is_alive():
+        time.sleep(0.5)
+        requeued += DocumentRepository(db).requeue_stale_documents(timeout_seconds=2, max_attempts=5)
+    thread.join()
+
+    assert requeued == 0
+    db.expire_all()
+    assert repo.get_document_by_id(document.id).status == "completed"
+
+def test_requeued_document_keeps_the_new_workers_result(db, storage, tmp_path):
+    repo = DocumentRepository(db)
+    storage.put("slow.pdf", b"slow document")
+    document = create_document(repo, "slow.pdf")
+    first = make_worker(storage, FakeSummarizer(seconds=1.0), tmp_path)
+    thread = process_in_thread(first, document.id)
+
+    # The first worker is taken for dead and the document is processed again
+    time.sleep(0.5)
+    db.query(Document).update({Document.heartbeat_at: seconds_from_now(-3600)}, synchronize_session=False)
+    db.commit()
+    assert repo.requeue_stale_documents(timeout_seconds=1800, max_attempts=5) == 1
+    assert repo.claim_document(document.id, "worker-b")
+    thread.join()
+
+    db.expire_all()
+    document = repo.get_document_by_id(document.id)
+    assert (document.status, document.worker_id, document.summary) == ("processing", "worker-b", None)
+
+def test_init_db_adds_retry_columns_to_existing_table(tmp_path):
+    legacy = create_engine(f"sqlite:///{tmp_path}/legacy.db")
+    with legacy.begin() as connection:
+        # The documents table as it was before the retry queue
+        connection.execute(text(
+            "CREATE TABLE documents (id CHAR(36) PRIMARY KEY, filename VARCHAR NOT NULL, "
+            "original_filename VARCHAR NOT NULL, blob_url VARCHAR NOT NULL, content_type VARCHAR NOT NULL, "
+            "status VARCHAR NOT NULL, extracted_text TEXT, summary TEXT, "
+            "created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+            "updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        connection.execute(text(
+            "INSERT INTO documents (id, filename, original_filename, blob_url, content_type, status) "
+            "VALUES ('0123456789abcdef0123456789abcdef', 'old.pdf', 'old.pdf', 'memory://old.pdf', 'application/pdf', 'pending')"
+        ))
+
+    init_db(bind=legacy)
+
+    columns = {column["name"] for column in inspect(legacy).get_columns("documents")}
+    assert {"attempts", "next_attempt_at", "processing_started_at", "last_error"} <= columns
+    with legacy.connect() as connection:
+        assert connection.execute(text("SELECT attempts FROM documents")).scalar() == 0
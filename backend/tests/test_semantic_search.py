@@ -0,0 +1,79 @@
+import pytest
+
+from app.db.repositories import DocumentRepository
+from app.main import app
+from app.utils.embeddings import HashingEmbedder, chunk_text, get_document_embedder
+from app.utils.vector_index import EmbeddingIndex, get_embedding_index
+from app.worker.backfill_embeddings import backfill_embeddings
+
+TEXTS = {
+    "ankle.pdf": "Patient presented with a sprained ankle after a fall. Ice and rest advised.",
+    "cardio.pdf": "Cardiology consult for chest pain. Echocardiogram and stress test scheduled.",
+    "glucose.pdf": "Lab panel shows elevated glucose. Diabetes follow-up and diet counselling.",
+}
+
+@pytest.fixture
+def index(tmp_path):
+    return EmbeddingIndex(str(tmp_path / "index"))
+
+@pytest.fixture
+def search(client, index):
+    """Search the test index through the API"""
+    app.dependency_overrides[get_embedding_index] = lambda: index
+    app.dependency_overrides[get_document_embedder] = lambda: HashingEmbedder()
+
+    def run(query, k=10):
+        response = client.get("/api/documents/search/semantic", params={"q": query, "k": k})
+        assert response.status_code == 200, response.text
+        return response.json()
+    return run
+
+def create_documents(db):
+    repo = DocumentRepository(db)
+    documents = {}
+    for name, text in TEXTS.items():
+        document = repo.create_document(name, name, f"memory://{name}", "application/pdf")
+        documents[name] = repo.update_document_text_and_summary(document.id, text, f"summary of {name}")
+    return documents
+
+def test_backfill_indexes_saved_text_once(db, index):
+    documents = create_documents(db)
+    repo = DocumentRepository(db)
+    repo.create_document("unprocessed.pdf", "unprocessed.pdf", "memory://unprocessed.pdf", "application/pdf")
+
+    assert backfill_embeddings(HashingEmbedder(), index, batch_size=2) == (3, 1, 0)
+    assert index.document_ids() == {document.id for document in documents.values()}
+    rows = len(index)
+
+    # Already indexed documents are skipped on a second run
+    assert backfill_embeddings(HashingEmbedder(), index) == (0, 4, 0)
+    assert len(index) == rows
+    assert backfill_embeddings(HashingEmbedder(), index, reindex=True) == (3, 1, 0)
+    assert index.document_ids() == {document.id for document in documents.values()}
+
+def test_semantic_search_returns_documents_with_snippets(db, index, search):
+    documents = create_documents(db)
+    backfill_embeddings(HashingEmbedder(), index)
+
+    results = search("sprained ankle")
+
+    assert results[0]["document"]["id"] == str(documents["ankle.pdf"].id)
+    assert results[0]["document"]["summary"] == "summary of ankle.pdf"
+    assert results[0]["snippet"] == chunk_text(TEXTS["ankle.pdf"])[0]
+    assert [result["score"] for result in results] == sorted((result["score"] for result in results), reverse=True)
+    assert len(search("glucose", k=1)) == 1
+
+def test_semantic_search_skips_documents_missing_from_the_database(db, index, search):
+    documents = create_documents(db)
+    backfill_embeddings(HashingEmbedder(), index)
+    db.delete(documents["ankle.pdf"])
+    db.commit()
+
+    results = search("sprained ankle")
+
+    assert str(documents["ankle.pdf"].id) not in {result["document"]["id"] for result in results}
+
+def test_semantic_search_validates_the_query(client, search):
+    assert search("anything") == []
+    assert client.get("/api/documents/search/semantic", params={"q": ""}).status_code == 422
+    assert client.get("/api/documents/search/semantic", params={"q": "x", "k": 0}).status_code == 422
@@ -0,0 +1,40 @@
+import asyncio
+from collections import Counter
+
+from app.core.config import settings
+from app.db.repositories import DocumentRepository
+from app.models.document import Document
+from app.utils.embeddings import HashingEmbedder
+from app.utils.vector_index import EmbeddingIndex
+from app.worker.main import DocumentProcessingWorker
+from tests.fakes import FakeStorageClient, FlakyDocumentIntelligence, FlakySummarizer
+
+def test_retries_resume_after_the_last_saved_stage(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "retry_base_delay_seconds", 0)
+    storage = FakeStorageClient()
+    contents = [f"document {number}".encode() for number in range(10)]
+    # Extraction fails once for half the documents, summarization twice for all of them
+    document_intelligence = FlakyDocumentIntelligence(contents[::2])
+    worker = DocumentProcessingWorker(
+        storage_client=storage,
+        document_intelligence=document_intelligence,
+        summarizer=FlakySummarizer(failures=2),
+        embedder=HashingEmbedder(),
+        embedding_index=EmbeddingIndex(str(tmp_path / "index")),
+    )
+    repo = DocumentRepository(db)
+    for number, content in enumerate(contents):
+        filename = f"document-{number}.pdf"
+        storage.put(filename, content)
+        repo.create_document(filename, filename, f"memory://{filename}", "application/pdf")
+
+    for _ in range(settings.max_processing_attempts):
+        asyncio.run(worker.poll_pending_once())
+
+    db.expire_all()
+    documents = db.query(Document).all()
+    assert Counter(document.status for document in documents) == {"completed": 10}
+    assert Counter(document.stage for document in documents) == {"summarized": 10}
+    assert Counter(document.attempts for document in documents) == {4: 5, 3: 5}
+    assert set(document_intelligence.analyses.values()) == {1}, "a retry extracted a document again"
+    assert all(document.summary.startswith("summary of text of ") for document in documents)
@@ -0,0 +1,86 @@
+import json
+import time
+
+import httpx
+
+from app.db.repositories import DocumentRepository
+from app.main import app
+from app.utils.summarizer import DocumentSummarizer, get_document_summarizer
+from tests.fakes import FakeStreamingClient
+
+TOKENS = [f"word{number} " for number in range(50)]
+EXPECTED = "".join(TOKENS).strip()
+
+def use_model(fake_client):
+    summarizer = DocumentSummarizer(client=fake_client, deployment="fake")
+    app.dependency_overrides[get_document_summarizer] = lambda: summarizer
+
+def create_document(db):
+    repo = DocumentRepository(db)
+    document = repo.create_document("check.pdf", "check.pdf", "memory://check.pdf", "application/pdf")
+    repo.update_document_text_and_summary(document.id, "Patient presented with a sprained ankle.", "Old summary")
+    return document.id
+
+def read_summary(db, document_id):
+    db.expire_all()
+    return DocumentRepository(db).get_document_by_id(document_id).summary
+
+def stream_events(client, url):
+    """Return the (event, data) pairs and the seconds until the first token"""
+    start = time.perf_counter()
+    first_token = None
+    events = []
+    with client.stream("POST", url, json={"custom_prompt": "Summarize briefly"}) as response:
+        assert response.status_code == 200, response.read()
+        event = None
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                if event == "token" and first_token is None:
+                    first_token = time.perf_counter() - start
+                events.append((event, json.loads(line[len("data: "):])))
+    return events, first_token
+
+def test_first_token_arrives_before_the_full_summary(live_server, db):
+    use_model(FakeStreamingClient(TOKENS, first_token_seconds=0.2, token_seconds=0.01))
+    document_id = create_document(db)
+    url = f"{live_server}/api/documents/{document_id}/regenerate-summary"
+
+    with httpx.Client(timeout=60) as client:
+        start = time.perf_counter()
+        response = client.post(url, json={"custom_prompt": "Summarize briefly"})
+        blocking = time.perf_counter() - start
+        assert response.status_code == 200, response.text
+
+        events, first_token = stream_events(client, f"{url}/stream")
+
+    text = "".join(data["text"] for event, data in events if event == "token")
+    assert text.strip() == EXPECTED
+    assert events[-1][0] == "done" and events[-1][1]["summary"] == EXPECTED
+    assert read_summary(db, document_id) == EXPECTED
+    assert first_token < blocking / 2, "first token arrived no sooner than the blocking response"
+
+def test_failed_stream_keeps_the_previous_summary(live_server, db, caplog):
+    use_model(FakeStreamingClient(TOKENS[:3], error=RuntimeError("model went away")))
+    document_id = create_document(db)
+
+    with httpx.Client(timeout=60) as client:
+        events, _ = stream_events(client, f"{live_server}/api/documents/{document_id}/regenerate-summary/stream")
+
+    assert [event for event, _ in events] == ["token", "token", "token", "error"]
+    assert "model went away" in events[-1][1]["detail"]
+    assert read_summary(db, document_id) == "Old summary"
+    assert f"Error streaming summary for {document_id}" in caplog.text
+    assert "Traceback" in caplog.text
+
+def test_missing_document_is_not_found(live_server):
+    use_model(FakeStreamingClient(TOKENS))
+
+    with httpx.Client(timeout=60) as client:
+        response = client.post(
+            f"{live_server}/api/documents/00000000-0000-0000-0000-000000000000/regenerate-summary/stream",
+            json={"custom_prompt": "Summarize briefly"}
+        )
+
+    assert response.status_code == 404, response.text
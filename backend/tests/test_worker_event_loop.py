@@ -0,0 +1,36 @@
+import asyncio
+
+from app.db.repositories import DocumentRepository
+from app.utils.embeddings import HashingEmbedder
+from app.utils.profiling import EventLoopLagMonitor
+from app.utils.vector_index import EmbeddingIndex
+from app.worker.main import DocumentProcessingWorker
+from tests.fakes import CountingDocumentIntelligence, FakeStorageClient, FakeSummarizer
+
+def test_processing_a_document_does_not_stall_the_event_loop(db, tmp_path):
+    storage = FakeStorageClient()
+    storage.put("slow.pdf", b"slow document")
+    document = DocumentRepository(db).create_document("slow.pdf", "slow.pdf", "memory://slow.pdf", "application/pdf")
+    worker = DocumentProcessingWorker(
+        storage_client=storage,
+        document_intelligence=CountingDocumentIntelligence(seconds=0.5),
+        summarizer=FakeSummarizer(seconds=0.5),
+        embedder=HashingEmbedder(),
+        embedding_index=EmbeddingIndex(str(tmp_path / "index")),
+    )
+    monitor = EventLoopLagMonitor(threshold=0.2, interval=0.05)
+
+    async def process_while_monitoring():
+        ticking = asyncio.create_task(monitor.run())
+        await asyncio.sleep(0)
+        try:
+            await worker.process_document(document, db)
+            # Let the monitor measure the tick that was pending during processing
+            await asyncio.sleep(monitor.interval * 2)
+        finally:
+            ticking.cancel()
+
+    asyncio.run(process_while_monitoring())
+
+    assert DocumentRepository(db).get_document_by_id(document.id).status == "completed"
+    assert monitor.stalls == 0, f"event loop stalled for {monitor.max_lag:.2f} s"
@@ -47,6 +47,18 @@ export async function POST(
       body: JSON.stringify(body),
     });
     
+    // Pass server-sent event streams through as they arrive instead of buffering them
+    if (response.headers.get('content-type')?.startsWith('text/event-stream')) {
+      return new Response(response.body, {
+        status: response.status,
+        headers: {
+          'Content-Type': 'text/event-stream',
+          'Cache-Control': 'no-cache',
+          'X-Accel-Buffering': 'no',
+        },
+      });
+    }
+    
     const data = await response.json();
     return NextResponse.json(data);
   } catch (error) {
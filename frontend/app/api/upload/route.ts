@@ -1,38 +1,9 @@
 import { NextRequest, NextResponse } from 'next/server';
-import { BlobServiceClient, ContainerClient } from '@azure/storage-blob';
-import { v4 as uuidv4 } from 'uuid';
 
-// Helper function to ensure container exists
-async function ensureContainerExists(blobServiceClient: BlobServiceClient, containerName: string): Promise<void> {
-  try {
-    const containerClient = blobServiceClient.getContainerClient(containerName);
-    const exists = await containerClient.exists();
-    
-    if (!exists) {
-      console.log(`Creating container ${containerName}`);
-      await containerClient.create({ access: 'blob' });
-      console.log(`Container ${containerName} created successfully`);
-    } else {
-      console.log(`Container ${containerName} already exists`);
-    }
-  } catch (error) {
-    console.error(`Error creating container ${containerName}:`, error);
-    throw error;
-  }
-}
+// Get the API URL from environment variable
+const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://backend:8000';
 
-// Helper function to check if blob exists
-async function checkIfBlobExists(containerClient: ContainerClient, blobName: string): Promise<boolean> {
-  try {
-    const blobClient = containerClient.getBlobClient(blobName);
-    const exists = await blobClient.exists();
-    return exists;
-  } catch (error) {
-    return false;
-  }
-}
-
-// POST: Upload a file to Azure Blob Storage
+// POST: Upload a file through the backend, which stores the blob and registers the document once
 export async function POST(req: NextRequest) {
   try {
     // Process the form data
@@ -45,92 +16,53 @@ export async function POST(req: NextRequest) {
       return NextResponse.json({ error: 'No file provided' }, { status: 400 });
     }
 
-    // Get Azure Storage configuration from environment
-    const accountName = process.env.AZURE_STORAGE_ACCOUNT_NAME;
-    const accountKey = process.env.AZURE_STORAGE_ACCOUNT_KEY;
-    const containerName = process.env.AZURE_STORAGE_CONTAINER_NAME || 'hipaadocs';
-    
-    if (!accountName || !accountKey) {
-      console.error('Missing required Azure Storage environment variables');
+    // Forward the file to the backend upload endpoint
+    const backendForm = new FormData();
+    backendForm.append('file', file, file.name);
+    backendForm.append('is_transcript', isTranscript ? 'true' : 'false');
+    backendForm.append('projectId', projectId);
+
+    const fileSizeMB = (file.size / (1024 * 1024)).toFixed(2);
+    console.log(`Uploading ${file.name} (${fileSizeMB} MB) to ${API_URL}/api/documents`);
+    const startTime = Date.now();
+
+    const response = await fetch(`${API_URL}/api/documents`, {
+      method: 'POST',
+      body: backendForm,
+    });
+
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      console.error(`Backend upload failed: ${response.status}`, errorData);
       return NextResponse.json(
-        { error: 'Storage configuration error' },
-        { status: 500 }
+        { error: 'Failed to upload file', details: errorData.detail || response.statusText },
+        { status: response.status }
       );
     }
 
-    // Create connection string
-    const connectionString = `DefaultEndpointsProtocol=https;AccountName=${accountName};AccountKey=${accountKey};EndpointSuffix=core.windows.net`;
-    
-    // Create the blob service client
-    const blobServiceClient = BlobServiceClient.fromConnectionString(connectionString);
-    
-    try {
-      // Ensure container exists
-      await ensureContainerExists(blobServiceClient, containerName);
-      
-      // Get container client
-      const containerClient = blobServiceClient.getContainerClient(containerName);
-      
-      // Create a unique blob name by adding a timestamp prefix to the original filename
-      const timestamp = new Date().toISOString().replace(/[-:]/g, '').replace(/\..+/g, '');
-      const uniqueId = uuidv4().substring(0, 8); // Take first 8 chars of a UUID for brevity
-      const blobName = `${timestamp}_${uniqueId}_${file.name}`;
-      
-      // Create blob client with the unique name
-      const blockBlobClient = containerClient.getBlockBlobClient(blobName);
-      
-      // Upload the file
-      const fileSizeMB = (file.size / (1024 * 1024)).toFixed(2);
-      console.log(`Uploading ${file.name} (${fileSizeMB} MB) to container ${containerName}`);
-      const startTime = Date.now();
-      
-      // Convert file to ArrayBuffer
-      const arrayBuffer = await file.arrayBuffer();
-      
-      // Upload the file with content type and metadata
-      const uploadResponse = await blockBlobClient.uploadData(arrayBuffer, {
-        blobHTTPHeaders: {
-          blobContentType: file.type || 'application/pdf'
-        },
-        metadata: {
-          projectId: projectId,
-          isTranscript: isTranscript ? 'true' : 'false'
-        }
-      });
-      
-      // Calculate upload stats
-      const elapsedTime = (Date.now() - startTime) / 1000;
-      const uploadSpeed = file.size / (1024 * 1024 * elapsedTime);
-      console.log(`Successfully uploaded ${blobName} in ${elapsedTime.toFixed(2)} seconds (${uploadSpeed.toFixed(2)} MB/s)`);
-      
-      // Get the URL to the blob
-      const blobUrl = blockBlobClient.url;
-      
-      // Get the ETag from the upload response (remove quotes if present)
-      const etag = uploadResponse.etag?.replace(/"/g, '') || '';
-      
-      // Return success response
-      return NextResponse.json({ 
-        success: true,
-        id: etag,
-        documentId: etag,
-        filename: file.name,
-        blobUrl: blobUrl,
-        blobName: blobName,
-        fileSize: file.size,
-        projectId: projectId,
-        isTranscript: isTranscript,
-        uploadDate: new Date().toISOString(),
-        status: 'processing',
-        summary: null,
-        extractedText: null,
-        elapsedTime: elapsedTime,
-        uploadSpeed: uploadSpeed
-      }, { status: 201 });
-    } catch (azureError) {
-      console.error('Azure blob storage error:', azureError);
-      throw azureError;
-    }
+    const document = await response.json();
+
+    // Calculate upload stats
+    const elapsedTime = (Date.now() - startTime) / 1000;
+    const uploadSpeed = file.size / (1024 * 1024 * elapsedTime);
+    console.log(`Successfully uploaded ${file.name} as document ${document.id} in ${elapsedTime.toFixed(2)} seconds (${uploadSpeed.toFixed(2)} MB/s)`);
+
+    // Return success response
+    return NextResponse.json({
+      success: true,
+      id: document.id,
+      documentId: document.id,
+      filename: document.original_filename,
+      fileSize: file.size,
+      projectId: projectId,
+      isTranscript: isTranscript,
+      uploadDate: document.created_at,
+      status: document.status,
+      summary: document.summary,
+      extractedText: null,
+      elapsedTime: elapsedTime,
+      uploadSpeed: uploadSpeed
+    }, { status: 201 });
   } catch (error) {
     console.error('Error uploading file:', error);
     return NextResponse.json(
@@ -138,4 +70,4 @@ export async function POST(req: NextRequest) {
       { status: 500 }
     );
   }
-} 
\ No newline at end of file
+}
@@ -3,7 +3,7 @@
 import { useState } from 'react';
 import { Button } from '@/components/ui/button';
 import { RefreshCw } from 'lucide-react';
-import { regenerateSummary } from '@/lib/api';
+import { regenerateSummaryStream } from '@/lib/api';
 import { useRouter } from 'next/navigation';
 
 interface RegenerateSummaryButtonProps {
@@ -13,18 +13,22 @@ interface RegenerateSummaryButtonProps {
 export function RegenerateSummaryButton({ documentId }: RegenerateSummaryButtonProps) {
   const [isRegenerating, setIsRegenerating] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [streamedSummary, setStreamedSummary] = useState('');
   const router = useRouter();
 
   const handleRegenerate = async () => {
     setIsRegenerating(true);
     setError(null);
+    setStreamedSummary('');
     
     try {
-      // Call the API to regenerate the summary
+      // Call the API to regenerate the summary, showing the text as it is generated
       // Using an empty prompt to use the default system prompt
-      await regenerateSummary(documentId, '');
+      await regenerateSummaryStream(documentId, '', (text) => {
+        setStreamedSummary((summary) => summary + text);
+      });
       
-      // Refresh the page to show the new summary
+      // Refresh the page to show the saved summary
       router.refresh();
     } catch (err) {
       console.error('Error regenerating summary:', err);
@@ -55,6 +59,12 @@ export function RegenerateSummaryButton({ documentId }: RegenerateSummaryButtonP
         )}
       </Button>
       
+      {isRegenerating && streamedSummary && (
+        <div className="text-sm whitespace-pre-wrap rounded-md border p-3">
+          {streamedSummary}
+        </div>
+      )}
+      
       {error && (
         <div className="text-sm text-red-500">
           {error}
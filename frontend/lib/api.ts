@@ -128,6 +128,69 @@ export async function regenerateSummary(documentId: string, prompt: string): Pro
   return result;
 }
 
+/**
+ * Regenerate a document summary, calling onToken with each piece of text as it is generated
+ */
+export async function regenerateSummaryStream(
+  documentId: string,
+  prompt: string,
+  onToken: (text: string) => void
+): Promise<{ summary: string }> {
+  const url = getBaseUrl(`documents/${documentId}/regenerate-summary/stream`);
+  console.log(`Making streaming regenerate summary request to: ${url}`, { documentId, prompt });
+  
+  const response = await fetch(url, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ custom_prompt: prompt }),
+  });
+  
+  if (!response.ok || !response.body) {
+    const errorText = await response.text().catch(() => 'Unknown error');
+    console.error(`Failed to regenerate summary: ${response.status}`, errorText);
+    throw new Error(`Failed to regenerate summary: ${response.status}`);
+  }
+  
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  
+  // Server-sent events are separated by a blank line
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const message = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      
+      let event = 'message';
+      let data = '';
+      for (const line of message.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice('event: '.length);
+        else if (line.startsWith('data: ')) data += line.slice('data: '.length);
+      }
+      if (!data) continue;
+      
+      const payload = JSON.parse(data);
+      if (event === 'token') {
+        onToken(payload.text);
+      } else if (event === 'done') {
+        console.log('Summary regenerated successfully:', payload);
+        return payload;
+      } else if (event === 'error') {
+        throw new Error(payload.detail);
+      }
+    }
+  }
+  
+  throw new Error('Summary stream ended before the summary was saved');
+}
+
 /**
  * Transform document from backend format to frontend format
  */